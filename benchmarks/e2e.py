@@ -0,0 +1,159 @@
+"""Offline end-to-end benchmark of the actor against a synthetic site served by the local stand-in client.
+
+Each scenario runs in its own subprocess, so the peak RSS is measured for that scenario only.
+Run with `python -m benchmarks.e2e [--scenarios NAME ...] [--output PATH]`, the results are written as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient, run_actor_locally
+from benchmarks.synthetic import SITE_URL, make_synthetic_site
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+DEFAULT_OUTPUT = 'benchmark-results.json'
+
+# name: (pages, simulated request latency in seconds, actor input overrides)
+SCENARIOS: dict[str, tuple[int, float, dict]] = {
+    '1k-serial': (1_000, 0.005, {'htmlFetchConcurrency': 1, 'htmlParserExecutor': 'inline'}),
+    '1k': (1_000, 0.005, {}),
+    '10k': (10_000, 0.005, {}),
+    '100k': (100_000, 0.005, {}),
+}
+DEFAULT_SCENARIOS = ('1k-serial', '1k', '10k')
+
+# functions timed as the stages of the actor, by the module they are looked up from
+STAGES = {
+    'crawler_wait': ('src.main', 'wait_for_crawler_run'),
+    'processing': ('src.main', 'process_dataset_items'),
+    'kv_fetch': ('src.pipeline', 'get_html_from_kvstore'),
+    # the backend function is resolved by `ItemProcessor`, so the parsing is timed around its executor call
+    'parse': ('src.pipeline', 'parse_html'),
+    'clean': ('src.main', 'clean_llms_data'),
+    'render': ('src.main', 'render_llms_txt'),
+}
+
+
+def timed(stage_secs: dict[str, float], stage: str, func: Callable) -> Callable:
+    """Wraps the function to add its duration to the stage, the durations of concurrent calls are summed."""
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stage_secs[stage] += time.perf_counter() - start
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stage_secs[stage] += time.perf_counter() - start
+
+    return wrapper
+
+
+def run_scenario(name: str) -> dict:
+    """Runs the scenario in the current process and returns its results."""
+    pages, latency_secs, input_overrides = SCENARIOS[name]
+    items, records = make_synthetic_site(pages)
+    client = LocalApifyClient(LocalRunClient(items, records, latency_secs=latency_secs))
+    # parsing in worker processes cannot be timed from this process
+    actor_input = {'startUrl': SITE_URL, 'htmlParserExecutor': 'thread', **input_overrides}
+
+    stage_secs: dict[str, float] = defaultdict(float)
+    patches = []
+    for stage, (module_name, func_name) in STAGES.items():
+        module = importlib.import_module(module_name)
+        patches.append(patch.object(module, func_name, timed(stage_secs, stage, getattr(module, func_name))))
+
+    for stage_patch in patches:
+        stage_patch.start()
+    try:
+        start = time.perf_counter()
+        asyncio.run(run_actor_locally(actor_input, client))
+        total_secs = time.perf_counter() - start
+    finally:
+        for stage_patch in patches:
+            stage_patch.stop()
+
+    return {
+        'scenario': name,
+        'pages': pages,
+        'input': actor_input,
+        'latency_secs': latency_secs,
+        'total_secs': round(total_secs, 3),
+        'pages_per_sec': round(pages / total_secs, 1),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stage_secs': {stage: round(stage_secs[stage], 3) for stage in STAGES},
+        'kv_requests': client.run_client.key_value_store().requests_count,
+    }
+
+
+def run_scenario_subprocess(name: str) -> dict:
+    """Runs the scenario in a subprocess with its own local storage and returns its results."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        # logging every processed page would measure the terminal instead of the actor
+        env = {**os.environ, 'CRAWLEE_STORAGE_DIR': storage_dir, 'APIFY_LOG_LEVEL': 'WARNING'}
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, '-m', 'benchmarks.e2e', '--run-scenario', name],
+            check=True,
+            stdout=subprocess.PIPE,
+            env=env,
+            text=True,
+        )
+    scenario_result: dict = json.loads(result.stdout.strip().splitlines()[-1])
+    return scenario_result
+
+
+def main() -> None:
+    """Runs the selected scenarios and writes their results into the output JSON file."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(DEFAULT_SCENARIOS))
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Path of the JSON file with the results')
+    parser.add_argument('--run-scenario', choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario)))
+        return
+
+    results = []
+    for name in args.scenarios:
+        result = run_scenario_subprocess(name)
+        print(
+            f'{name:>10}: {result["pages_per_sec"]:>8} pages/s, {result["total_secs"]:>8} s,'
+            f' peak RSS {result["peak_rss_mib"]} MiB, stages {result["stage_secs"]}'
+        )
+        results.append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': sys.version, 'results': results}, f, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
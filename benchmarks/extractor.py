@@ -0,0 +1,57 @@
+"""Micro-benchmark of the HTML parser backends against the BeautifulSoup helpers.
+
+Run with `python -m benchmarks.extractor`.
+"""
+
+from __future__ import annotations
+
+import timeit
+from functools import partial
+from typing import TYPE_CHECKING
+
+from src.helpers import get_description_from_html, get_h1_from_html
+from src.parsers import get_available_parser_backends, get_parser_backend
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+REPEAT = 5
+
+
+def make_page(paragraphs: int) -> str:
+    """Creates a documentation-like page with the metadata at the top and a large body."""
+    body = ''.join(
+        f'<div class="section"><h2>Section {i}</h2><p>Lorem <a href="/page{i}">ipsum</a> dolor sit amet, '
+        f'consectetur <code>adipiscing</code> elit.</p></div>'
+        for i in range(paragraphs)
+    )
+    return (
+        '<html><head><title>Page</title><meta name="description" content="Page description"></head>'
+        f'<body><nav><a href="/">Home</a></nav><main><h1>Page title</h1>{body}</main></body></html>'
+    )
+
+
+def bs4_helpers(html: str) -> tuple[str | None, str | None]:
+    """Extracts the metadata with two full BeautifulSoup parses, the way main() used to."""
+    return get_h1_from_html(html), get_description_from_html(html)
+
+
+def main() -> None:
+    """Prints the time per page for the helpers and the installed parser backends and several page sizes.
+
+    The pages without the description cannot be cut short by the streaming stdlib parser.
+    """
+    extractors: list[tuple[str, Callable[[str], object]]] = [('bs4 helpers', bs4_helpers)]
+    extractors += [(f'{backend} backend', get_parser_backend(backend)) for backend in get_available_parser_backends()]
+    for paragraphs in (10, 1_000, 10_000):
+        page = make_page(paragraphs)
+        number = max(1, 2_000 // paragraphs)
+        for description, html in (('with', page), ('without', page.replace('name="description"', 'name="other"'))):
+            print(f'page size {len(html) / 1024:.0f} KiB {description} description, {number} iterations')
+            for name, func in extractors:
+                best = min(timeit.repeat(partial(func, html), number=number, repeat=REPEAT)) / number
+                print(f'  {name:<24} {best * 1000:10.3f} ms/page')
+
+
+if __name__ == '__main__':
+    main()
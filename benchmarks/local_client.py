@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Mapping, Sequence
+
+LOCAL_RUN_ID = 'local-crawler-run'
+
+
+class LocalListPage:
+    """Page of the dataset items with the attributes of `apify_client` `ListPage` used by the actor."""
+
+    def __init__(self, items: list[dict], offset: int, limit: int, total: int) -> None:
+        self.items = items
+        self.offset = offset
+        self.limit = limit
+        self.count = len(items)
+        self.total = total
+
+
+class LocalKeyValueStoreClient:
+    """Local stand-in for `KeyValueStoreClientAsync` serving the HTML records of a crawler run."""
+
+    def __init__(self, records: Mapping[str, str], latency_secs: float = 0.0) -> None:
+        """Creates the store client.
+
+        :param records: HTML records by their key, may be a lazy mapping generating the records on demand
+        :param latency_secs: Simulated latency of each request
+        """
+        self.records = records
+        self.latency_secs = latency_secs
+        self.requests_count = 0
+
+    async def get_record(self, key: str) -> dict | None:
+        """Returns the record like `KeyValueStoreClientAsync.get_record`."""
+        self.requests_count += 1
+        if self.latency_secs:
+            await asyncio.sleep(self.latency_secs)
+        if (value := self.records.get(key)) is None:
+            return None
+        return {'key': key, 'value': value, 'content_type': 'text/html; charset=utf-8'}
+
+
+class LocalDatasetClient:
+    """Local stand-in for `DatasetClientAsync` serving the items visible at the moment of the request."""
+
+    def __init__(self, run: LocalRunClient, latency_secs: float = 0.0) -> None:
+        self.run = run
+        self.latency_secs = latency_secs
+        self.requests_count = 0
+
+    async def list_items(self, *, offset: int = 0, limit: int | None = None, **_kwargs: Any) -> LocalListPage:
+        """Returns the page of the items like `DatasetClientAsync.list_items`."""
+        self.requests_count += 1
+        if self.latency_secs:
+            await asyncio.sleep(self.latency_secs)
+        visible_items = self.run.visible_items_count()
+        end = visible_items if limit is None else min(visible_items, offset + limit)
+        items = list(self.run.items[offset:end])
+        return LocalListPage(items, offset, limit or 0, visible_items)
+
+    async def iterate_items(self, *, offset: int = 0, limit: int | None = None, **_kwargs: Any) -> AsyncIterator[dict]:
+        """Iterates over the items in pages like `DatasetClientAsync.iterate_items`."""
+        page_size = 1000
+        read_items = 0
+        while limit is None or read_items < limit:
+            effective_limit = page_size if limit is None else min(page_size, limit - read_items)
+            page = await self.list_items(offset=offset + read_items, limit=effective_limit)
+            for item in page.items:
+                yield item
+            read_items += page.count
+            if page.count < effective_limit:
+                break
+
+
+class LocalRunClient:
+    """Local stand-in for `RunClientAsync` of a crawler run.
+
+    The run is `READY` for `queued_secs` after it is created, then `RUNNING` for `duration_secs` and its dataset
+    items become visible gradually during that time, the way a real crawler pushes them. A graceful abort keeps
+    the run `ABORTING` for `aborting_secs` while it still pushes the items of the pages in progress.
+    """
+
+    def __init__(
+        self,
+        items: Sequence[dict],
+        records: Mapping[str, str],
+        duration_secs: float = 0.0,
+        latency_secs: float = 0.0,
+        run_id: str = LOCAL_RUN_ID,
+        status_messages: Sequence[str] = (),
+        start_url: str | None = None,
+        queued_secs: float = 0.0,
+        aborting_secs: float = 0.0,
+    ) -> None:
+        """Creates the run client.
+
+        :param items: Dataset items of the run
+        :param records: HTML records of the run by their key
+        :param duration_secs: How long the run is running
+        :param latency_secs: Simulated latency of the dataset and key-value store requests
+        :param run_id: ID of the run
+        :param status_messages: Status messages shown one after another while the run is running
+        :param start_url: Start URL of the crawler input the run is used for, any if None
+        :param queued_secs: How long the run waits for the memory before it starts running
+        :param aborting_secs: How long the run keeps pushing the items after a graceful abort
+        """
+        self.id = run_id
+        self.items = items
+        self.duration_secs = duration_secs
+        self.status_messages = status_messages
+        self.start_url = start_url
+        self.queued_secs = queued_secs
+        self.aborting_secs = aborting_secs
+        self.started_at = time.monotonic()
+        self.api_calls = 0
+        self.is_aborted = False
+        # running time the run finishes at and the number of its items without an abort
+        self._finish_secs = duration_secs
+        self._planned_items_count = len(items)
+        self._dataset = LocalDatasetClient(self, latency_secs)
+        self._key_value_store = LocalKeyValueStoreClient(records, latency_secs)
+
+    def is_queued(self) -> bool:
+        """Returns whether the run is still waiting for the memory to start."""
+        return time.monotonic() - self.started_at < self.queued_secs
+
+    def running_secs(self) -> float:
+        """Returns how long the run has been running, without the time it was queued."""
+        return max(0.0, time.monotonic() - self.started_at - self.queued_secs)
+
+    def is_finished(self) -> bool:
+        """Returns whether the run has reached a terminal status."""
+        return not self.is_queued() and self.running_secs() >= self._finish_secs
+
+    def elapsed_fraction(self) -> float:
+        """Returns the part of the run duration that has already elapsed."""
+        if self.is_queued():
+            return 0.0
+        if self.duration_secs <= 0:
+            return 1.0
+        return min(1.0, self.running_secs() / self.duration_secs)
+
+    def visible_items_count(self) -> int:
+        """Returns the number of the items already pushed by the run."""
+        if self.is_finished():
+            return len(self.items)
+        return min(int(self._planned_items_count * self.elapsed_fraction()), len(self.items))
+
+    def get_status(self) -> str:
+        """Returns the status of the run in the format of the Apify API."""
+        if self.is_queued():
+            return 'READY'
+        if self.is_finished():
+            return 'ABORTED' if self.is_aborted else 'SUCCEEDED'
+        return 'ABORTING' if self.is_aborted else 'RUNNING'
+
+    def to_dict(self) -> dict:
+        """Returns the run details in the format of the Apify API."""
+        status = self.get_status()
+        status_message = None
+        if self.status_messages:
+            index = min(int(self.elapsed_fraction() * len(self.status_messages)), len(self.status_messages) - 1)
+            status_message = self.status_messages[index]
+        started_at = datetime.now(timezone.utc).isoformat()
+        return {
+            'id': self.id,
+            'actId': 'local-website-content-crawler',
+            'userId': 'local-user',
+            'startedAt': started_at,
+            'finishedAt': started_at if self.is_finished() else None,
+            'status': status,
+            'statusMessage': status_message,
+            'meta': {'origin': 'API'},
+            'stats': {'inputBodyLen': 0, 'restartCount': 0, 'resurrectCount': 0, 'computeUnits': 0},
+            'options': {'build': 'latest', 'timeoutSecs': 0, 'memoryMbytes': 2048, 'diskMbytes': 4096},
+            'buildId': 'local-build',
+            'defaultKeyValueStoreId': f'{self.id}-key-value-store',
+            'defaultDatasetId': f'{self.id}-dataset',
+            'defaultRequestQueueId': f'{self.id}-request-queue',
+            'containerUrl': 'http://localhost',
+        }
+
+    async def get(self) -> dict | None:
+        """Returns the run details like `RunClientAsync.get`."""
+        self.api_calls += 1
+        return self.to_dict()
+
+    async def wait_for_finish(self, *, wait_secs: int | None = None) -> dict | None:
+        """Waits for the run to finish at most `wait_secs` like `RunClientAsync.wait_for_finish`."""
+        self.api_calls += 1
+        remaining = max(0.0, self.started_at + self.queued_secs + self._finish_secs - time.monotonic())
+        await asyncio.sleep(remaining if wait_secs is None else min(remaining, wait_secs))
+        return self.to_dict()
+
+    async def abort(self, *, gracefully: bool | None = None) -> dict:
+        """Finishes the run with the items pushed until it stops like `RunClientAsync.abort`.
+
+        The gracefully aborted run stops after `aborting_secs`, the other runs at once.
+        """
+        self.api_calls += 1
+        if not self.is_finished():
+            self._finish_secs = min(self._finish_secs, self.running_secs() + (self.aborting_secs if gracefully else 0))
+            pushed_fraction = 1.0 if self.duration_secs <= 0 else min(1.0, self._finish_secs / self.duration_secs)
+            self.items = self.items[: int(self._planned_items_count * pushed_fraction)]
+            self.is_aborted = True
+        return self.to_dict()
+
+    def dataset(self) -> LocalDatasetClient:
+        """Returns the default dataset client of the run."""
+        return self._dataset
+
+    def key_value_store(self) -> LocalKeyValueStoreClient:
+        """Returns the default key-value store client of the run."""
+        return self._key_value_store
+
+
+class LocalActorClient:
+    """Local stand-in for `ActorClientAsync` whose `call` starts the next prepared crawler run."""
+
+    def __init__(self, runs: Sequence[LocalRunClient]) -> None:
+        self.runs = runs
+        self.run_inputs: list[Any] = []
+        self.started_runs: list[LocalRunClient] = []
+        self.max_running = 0
+
+    async def call(self, *, run_input: Any = None, **_kwargs: Any) -> dict | None:
+        """Starts the first not started run for the start URL and returns its details like `ActorClientAsync.call`."""
+        self.run_inputs.append(run_input)
+        start_urls = [start_url['url'] for start_url in (run_input or {}).get('startUrls', [])]
+        for run in self.runs:
+            if run not in self.started_runs and (run.start_url is None or run.start_url in start_urls):
+                break
+        else:
+            raise ValueError(f'No prepared run for the start URLs {start_urls}!')
+
+        run.started_at = time.monotonic()
+        self.started_runs.append(run)
+        self.max_running = max(self.max_running, sum(not started.is_finished() for started in self.started_runs))
+        return run.to_dict()
+
+
+class LocalApifyClient:
+    """Local stand-in for `ApifyClientAsync` with prepared crawler runs, used for offline runs of the actor.
+
+    Only the parts of the client used by the actor are implemented.
+    """
+
+    def __init__(self, run: LocalRunClient, *other_runs: LocalRunClient) -> None:
+        """Creates the client, the runs are started in the given order by the crawler actor calls."""
+        self.run_client = run
+        self.run_clients = {run.id: run for run in (run, *other_runs)}
+        self.actor_client = LocalActorClient(list(self.run_clients.values()))
+
+    def actor(self, _actor_id: str) -> LocalActorClient:
+        """Returns the client of the crawler actor."""
+        return self.actor_client
+
+    def run(self, run_id: str) -> LocalRunClient:
+        """Returns the client of the crawler run."""
+        if run_id not in self.run_clients:
+            raise ValueError(f'Unknown run "{run_id}"!')
+        return self.run_clients[run_id]
+
+
+async def run_actor_locally(actor_input: dict, client: LocalApifyClient) -> None:
+    """Runs the actor with the given input against the local stand-in client instead of the Apify API.
+
+    The outputs are stored into the local storage of the actor, see the `CRAWLEE_STORAGE_DIR` environment variable.
+    """
+    # imported here, the main module is not needed by the users of the stand-in clients only
+    from src.main import main
+
+    try:
+        await main(actor_input, client)  # type: ignore[arg-type]
+    # the actor exits the process when it finishes outside of tests
+    except SystemExit as exc:
+        if exc.code not in {0, None}:
+            raise RuntimeError(f'The actor failed with exit code {exc.code}!') from exc
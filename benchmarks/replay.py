@@ -0,0 +1,197 @@
+"""Records a crawler run into a local archive and replays the actor against it without the network.
+
+The archive keeps the dataset items and the HTML records of a real crawler run, so a slow production site
+can be processed locally again, e.g. to time the processing or to compare the outputs of two versions.
+
+Record with `APIFY_TOKEN=... python -m benchmarks.replay record RUN_ID ARCHIVE`, where RUN_ID is the ID of
+a finished Website Content Crawler run. Replay with `python -m benchmarks.replay replay ARCHIVE [--input JSON]`,
+the outputs are saved into the local storage, see `--storage-dir`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from collections.abc import Mapping
+from contextlib import aclosing
+from functools import partial
+from typing import TYPE_CHECKING
+
+from apify_client import ApifyClientAsync
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient, run_actor_locally
+from src.cache import get_content_hash
+from src.helpers import get_html_record_key
+from src.options import GeneratorOptions
+from src.pipeline import DEFAULT_FETCH_CONCURRENCY, fetch_item_html, iter_ordered
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+logger = logging.getLogger('apify')
+
+ARCHIVE_VERSION = 1
+# members of the archive, each HTML record is a member of its own, so the records are read only when needed
+ARCHIVE_RUN_MEMBER = 'run.json'
+ARCHIVE_ITEMS_MEMBER = 'items.jsonl'
+ARCHIVE_RECORDS_PREFIX = 'records/'
+# the crawler input is saved in the INPUT record of the crawler run
+CRAWLER_INPUT_KEY = 'INPUT'
+DEFAULT_STORAGE_DIR = 'storage'
+
+
+class ArchiveRecords(Mapping[str, str]):
+    """HTML records of the recorded crawler run, read from the archive on demand."""
+
+    def __init__(self, archive: zipfile.ZipFile) -> None:
+        self.archive = archive
+        self.keys_by_name = {
+            name[len(ARCHIVE_RECORDS_PREFIX) :]: name
+            for name in archive.namelist()
+            if name.startswith(ARCHIVE_RECORDS_PREFIX)
+        }
+
+    def __getitem__(self, key: str) -> str:
+        """Reads the record from the archive."""
+        return self.archive.read(self.keys_by_name[key]).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the keys of the records."""
+        return iter(self.keys_by_name)
+
+    def __len__(self) -> int:
+        """Returns the number of the records."""
+        return len(self.keys_by_name)
+
+
+async def record_crawler_run(
+    client: ApifyClientAsync, run_id: str, path: str, concurrency: int = DEFAULT_FETCH_CONCURRENCY
+) -> dict:
+    """Downloads the dataset items and the HTML records of the crawler run into the archive, returns its summary.
+
+    Only one HTML record is held in memory at a time, the items are buffered in a temporary file.
+
+    :param client: `ApifyClientAsync` or its local stand-in with the crawler run
+    :param run_id: ID of the finished crawler run
+    :param path: Path of the archive, overwritten if it exists
+    :param concurrency: Maximum number of the HTML records downloaded at the same time
+    """
+    run_client = client.run(run_id)
+    if (run := await run_client.get()) is None:
+        raise ValueError(f'Crawler run "{run_id}" not found!')
+    kvstore = run_client.key_value_store()
+    crawler_input = (await kvstore.get_record(CRAWLER_INPUT_KEY) or {}).get('value') or {}
+    start_urls = [start_url['url'] for start_url in crawler_input.get('startUrls', []) if 'url' in start_url]
+
+    items_count, records_count = 0, 0
+    with (
+        zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive,
+        tempfile.TemporaryFile('w+') as items_file,
+    ):
+        fetch_html = partial(fetch_item_html, kvstore)
+        async with aclosing(iter_ordered(run_client.dataset().iterate_items(), fetch_html, concurrency)) as results:
+            async for item, html in results:
+                items_file.write(json.dumps(item) + '\n')
+                items_count += 1
+                if html is not None:
+                    archive.writestr(f'{ARCHIVE_RECORDS_PREFIX}{get_html_record_key(item["htmlUrl"])}', html)
+                    records_count += 1
+        items_file.seek(0)
+        with archive.open(ARCHIVE_ITEMS_MEMBER, 'w') as items_member:
+            for line in items_file:
+                items_member.write(line.encode())
+
+        summary = {
+            'version': ARCHIVE_VERSION,
+            'runId': run['id'],
+            'status': run.get('status'),
+            'startUrl': start_urls[0] if start_urls else None,
+            'crawlerInput': crawler_input,
+            'itemsCount': items_count,
+            'recordsCount': records_count,
+        }
+        archive.writestr(ARCHIVE_RUN_MEMBER, json.dumps(summary, indent=2))
+    logger.info(f'Recorded {items_count} items and {records_count} HTML records of the run "{run_id}" into "{path}"')
+    return summary
+
+
+def load_recorded_run(archive: zipfile.ZipFile, latency_secs: float = 0.0) -> tuple[LocalRunClient, dict]:
+    """Returns the local stand-in of the recorded crawler run and the summary of the archive.
+
+    :param archive: The archive opened for reading, the HTML records are read from it until it is closed
+    :param latency_secs: Simulated latency of the dataset and key-value store requests
+    """
+    summary = json.loads(archive.read(ARCHIVE_RUN_MEMBER))
+    if summary.get('version') != ARCHIVE_VERSION:
+        raise ValueError(f'Unsupported version {summary.get("version")} of the recorded crawler run archive!')
+    with archive.open(ARCHIVE_ITEMS_MEMBER) as items_member:
+        items = [json.loads(line) for line in items_member]
+    run = LocalRunClient(items, ArchiveRecords(archive), latency_secs=latency_secs, run_id=summary['runId'])
+    return run, summary
+
+
+def check_replay_input(actor_input: dict) -> None:
+    """Raises if the actor input needs the network, which the replay does not provide."""
+    options = GeneratorOptions.from_input(actor_input)
+    if actor_input.get('startUrls'):
+        raise ValueError('The replay supports only a single site, use the "startUrl" input!')
+    if options.is_builtin_crawler or options.discovery_mode == 'sitemap' or options.partial_html_fetch:
+        raise ValueError('The built-in crawler, sitemap discovery and partial HTML fetch need the network!')
+
+
+async def replay_crawler_run(path: str, actor_input: dict | None = None, latency_secs: float = 0.0) -> dict:
+    """Runs the actor against the recorded crawler run, returns the summary of the archive.
+
+    The outputs are stored into the local storage of the actor, see the `CRAWLEE_STORAGE_DIR` environment variable.
+
+    :param path: Path of the archive
+    :param actor_input: Input of the actor, the recorded start URL is used if it has none
+    :param latency_secs: Simulated latency of the dataset and key-value store requests
+    """
+    with zipfile.ZipFile(path) as archive:
+        run, summary = load_recorded_run(archive, latency_secs)
+        actor_input = {'startUrl': summary['startUrl'], **(actor_input or {})}
+        check_replay_input(actor_input)
+        await run_actor_locally(actor_input, LocalApifyClient(run))
+    return summary
+
+
+def main() -> None:
+    """Records the crawler run or replays the actor against the recorded run, depending on the command."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='Record the crawler run into the archive')
+    record_parser.add_argument('run_id', help='ID of the finished crawler run')
+    record_parser.add_argument('archive', help='Path of the archive')
+    record_parser.add_argument('--concurrency', type=int, default=DEFAULT_FETCH_CONCURRENCY)
+    replay_parser = commands.add_parser('replay', help='Run the actor against the recorded crawler run')
+    replay_parser.add_argument('archive', help='Path of the archive')
+    replay_parser.add_argument('--input', default='{}', help='Input of the actor as JSON')
+    replay_parser.add_argument('--latency', type=float, default=0.0, help='Simulated request latency in seconds')
+    replay_parser.add_argument('--storage-dir', default=DEFAULT_STORAGE_DIR, help='Local storage of the outputs')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        client = ApifyClientAsync(os.environ.get('APIFY_TOKEN'))
+        summary = asyncio.run(record_crawler_run(client, args.run_id, args.archive, args.concurrency))
+        print(json.dumps(summary, indent=2))
+        return
+
+    os.environ['CRAWLEE_STORAGE_DIR'] = args.storage_dir
+    started_at = time.perf_counter()
+    asyncio.run(replay_crawler_run(args.archive, json.loads(args.input), args.latency))
+    elapsed_secs = time.perf_counter() - started_at
+    output_path = os.path.join(args.storage_dir, 'key_value_stores', 'default', 'llms.txt')
+    with open(output_path) as f:
+        output_hash = get_content_hash(f.read())
+    print(f'Replayed in {elapsed_secs:.3f} s, the output "{output_path}" has the hash {output_hash}')
+
+
+if __name__ == '__main__':
+    main()
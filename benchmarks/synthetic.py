@@ -0,0 +1,80 @@
+"""Synthetic documentation site with realistic HTML sizes for the offline benchmarks."""
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator, Mapping
+
+RECORDS_URL = 'https://api.apify.com/v2/key-value-stores/synthetic/records/'
+SITE_URL = 'https://docs.example.com'
+
+# log-normal page sizes with the median around 60 KiB, typical for documentation pages with inlined assets
+HTML_SIZE_MU = 11.0
+HTML_SIZE_SIGMA = 0.8
+HTML_MIN_SIZE = 4 * 1024
+HTML_MAX_SIZE = 3 * 1024 * 1024
+
+_FILLER_CHUNK = (
+    '<div class="section"><h2>Section</h2><p>Lorem <a href="/docs/page">ipsum</a> dolor sit amet, consectetur '
+    '<code>adipiscing</code> elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.</p></div>'
+)
+_FILLER = _FILLER_CHUNK * (HTML_MAX_SIZE // len(_FILLER_CHUNK) + 1)
+
+
+def get_page_path(index: int) -> str:
+    """Returns the path of the page, pages are spread into sections and subsections of various sizes."""
+    if index == 0:
+        return '/docs'
+    section = index % 20
+    subsection = (index // 20) % (section + 1)
+    if subsection == 0:
+        return f'/docs/section-{section}/page-{index}'
+    return f'/docs/section-{section}/sub-{subsection}/page-{index}'
+
+
+def make_page_html(index: int) -> str:
+    """Returns the HTML of the page, the same index always gives the same page."""
+    rng = random.Random(index)
+    size = min(HTML_MAX_SIZE, max(HTML_MIN_SIZE, int(rng.lognormvariate(HTML_SIZE_MU, HTML_SIZE_SIGMA))))
+    return (
+        f'<!DOCTYPE html><html><head><title>Page {index} | Docs</title>'
+        f'<meta name="description" content="Description of the page {index}.">'
+        '<script>window.__DATA__ = {"theme": "light"};</script></head>'
+        '<body><nav><a href="/docs">Docs</a><a href="/docs/section-1">Section 1</a></nav>'
+        f'<main><h1>Page {index}</h1>{_FILLER[:size]}</main></body></html>'
+    )
+
+
+class SyntheticRecords(Mapping[str, str]):
+    """Lazy mapping of the HTML records of the synthetic site, the pages are generated on access."""
+
+    def __init__(self, pages: int) -> None:
+        self.pages = pages
+
+    def __getitem__(self, key: str) -> str:
+        """Generates the HTML of the page with the `page-<index>` key."""
+        index = int(key.removeprefix('page-'))
+        if not 0 <= index < self.pages:
+            raise KeyError(key)
+        return make_page_html(index)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the keys of all pages."""
+        return (f'page-{index}' for index in range(self.pages))
+
+    def __len__(self) -> int:
+        """Returns the number of pages."""
+        return self.pages
+
+
+def make_synthetic_site(pages: int) -> tuple[list[dict], SyntheticRecords]:
+    """Returns the dataset items and the HTML records of the synthetic site with the given number of pages."""
+    items = [
+        {
+            'url': f'{SITE_URL}{get_page_path(index)}',
+            'htmlUrl': f'{RECORDS_URL}page-{index}',
+            'metadata': {'title': f'Page {index} | Docs', 'description': None},
+        }
+        for index in range(pages)
+    ]
+    return items, SyntheticRecords(pages)
@@ -3,4 +3,6 @@ import asyncio
 from .main import main
 
 # Execute the llms.txt generator actor entry point.
-asyncio.run(main())
+# The guard prevents the worker processes of the HTML parser from running the actor again.
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import sys
+from typing import TYPE_CHECKING
+
+from src.fulltext import get_item_content
+from src.helpers import is_description_suitable, parse_url
+from src.mytypes import LinkRecord, SectionRecord
+from src.spill import SpilledSections
+from src.trie import PathTrie, get_section_dir_title_from_trie
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from src.extractor import HtmlMetadata
+    from src.fulltext import PageContents
+    from src.mytypes import LinkDict, LLMSData
+
+logger = logging.getLogger('apify')
+
+
+class LLMSDataBuilder:
+    """Builds the LLMS data from the crawled pages, one dataset item at a time.
+
+    Sections and links are stored as the slotted `SectionRecord` and `LinkRecord` with interned paths
+    and hosts to keep the memory usage low for sites with hundreds of thousands of pages.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        require_html: bool = True,
+        spill_threshold: int | None = None,
+        contents: PageContents | None = None,
+    ) -> None:
+        """Creates the builder for the site crawled from the start `url`.
+
+        :param url: Start URL of the crawl
+        :param require_html: Skip the dataset items without the `htmlUrl` attribute
+        :param spill_threshold: Number of links above which the sections and page titles are moved
+            into `SpilledSections` on the local disk, kept in memory if None
+        :param contents: Stores the markdown or text of the dataset items for the llms-full.txt if provided
+        """
+        parsed_url = parse_url(url)
+        self.url_normalized = parsed_url.normalized
+        # hostname is used as the title of the llms.txt
+        root_title = parsed_url.hostname
+        self.data: LLMSData = {'title': root_title or url, 'description': None, 'details': None, 'sections': {}}
+        # titles of the pages by their path, used to resolve the titles of the sections
+        self.path_titles: PathTrie[str] = PathTrie()
+        self.items_count = 0
+        self.require_html = require_html
+        self.links_count = 0
+        self.spill_threshold = spill_threshold
+        self.spilled: SpilledSections | None = None
+        # pages added since the last checkpoint, tracked only if not None
+        self.new_pages: list[tuple[str, str, str | None]] | None = None
+        self.contents = contents
+        self._sections_to_fill_title: list[str] = []
+
+    def add_item(self, item: dict, html_metadata: HtmlMetadata | None) -> None:
+        """Adds the dataset item of the crawler with the metadata extracted from its HTML."""
+        self.items_count += 1
+        if (item_url := item.get('url')) is None:
+            logger.warning('Missing "url" attribute in dataset item!')
+            return
+        logger.info(f'Processing page: {item_url}')
+        if self.require_html and item.get('htmlUrl') is None:
+            logger.warning('Missing "htmlUrl" attribute in dataset item!')
+            return
+
+        metadata = item.get('metadata', {})
+        description = metadata.get('description') or (html_metadata.description if html_metadata else None)
+        title = (html_metadata.title if html_metadata else None) or metadata.get('title')
+        self.add_page(item_url, title, description)
+        if self.contents is not None and (content := get_item_content(item)):
+            self.contents.add(item_url, content)
+
+    def skip_item(self) -> None:
+        """Counts the dataset item without adding it, e.g. a duplicate of an already added page."""
+        self.items_count += 1
+
+    def add_page(self, url: str, title: str, description: str | None) -> None:
+        """Adds the page with the already resolved title and description."""
+        if self.new_pages is not None:
+            self.new_pages.append((url, title, description))
+        if self.spilled is not None:
+            self._add_spilled_page(self.spilled, url, title, description)
+            return
+        sections = self.data['sections']
+        parsed_url = parse_url(url)
+        self.path_titles[parsed_url.path] = title
+
+        # handle input root url separately
+        is_root = parsed_url.normalized == self.url_normalized
+        if is_root:
+            self.data['description'] = description if is_description_suitable(description) else None
+            return
+
+        section_dir = sys.intern(parsed_url.path_dir)
+        section_title = self.path_titles.get(section_dir)
+        if section_dir not in sections:
+            sections[section_dir] = SectionRecord(section_title or section_dir)
+            if section_title is None:
+                self._sections_to_fill_title.append(section_dir)
+
+        sections[section_dir]['links'].append(
+            LinkRecord(url, title, description if is_description_suitable(description) else None)
+        )
+        self.links_count += 1
+        if self.spill_threshold is not None and self.links_count > self.spill_threshold:
+            self.spilled = SpilledSections()
+            self.spilled.load(self.data, self.path_titles)
+            self.path_titles = PathTrie()
+
+    def _add_spilled_page(self, spilled: SpilledSections, url: str, title: str, description: str | None) -> None:
+        """Adds the page into the spilled sections, the same way as `add_page` into the memory."""
+        parsed_url = parse_url(url)
+        spilled.set_path_title(parsed_url.path, title)
+
+        if parsed_url.normalized == self.url_normalized:
+            self.data['description'] = description if is_description_suitable(description) else None
+            return
+
+        section_dir = parsed_url.path_dir
+        if section_dir not in spilled.sections:
+            section_title = spilled.get_path_title(section_dir)
+            spilled.add_section(section_dir, section_title or section_dir)
+            if section_title is None:
+                self._sections_to_fill_title.append(section_dir)
+
+        spilled.add_link(section_dir, url, title, description if is_description_suitable(description) else None)
+        self.links_count += 1
+
+    def get_path_title(self, path: str) -> str | None:
+        """Returns the title of the page with the path."""
+        if self.spilled is not None:
+            return self.spilled.get_path_title(path)
+        return self.path_titles.get(path)
+
+    def iter_links(self) -> Iterator[LinkDict | LinkRecord]:
+        """Yields the links of all the sections added so far."""
+        if self.spilled is not None:
+            yield from self.spilled.iter_links()
+            return
+        for section in self.data['sections'].values():
+            yield from section['links']
+
+    def iter_sections(self, data: LLMSData) -> Iterator[tuple[str, Iterable[LinkDict | LinkRecord]]]:
+        """Yields the titles of the sections of the built data with their links, in the order of the llms.txt."""
+        if self.spilled is not None:
+            yield from self.spilled.iter_sections()
+            return
+        for section_dir in sorted(data['sections']):
+            section = data['sections'][section_dir]
+            yield section['title'], section['links']
+
+    def build(self) -> LLMSData:
+        """Resolves the titles of the sections that were created before their parent page was processed.
+
+        The sections of the spilled data stay in the `spilled` sections, the returned data have none.
+        """
+        if self.spilled is not None:
+            for section_dir in self._sections_to_fill_title:
+                self.spilled.set_section_title(section_dir, self.spilled.get_section_dir_title(section_dir))
+            self._sections_to_fill_title.clear()
+            return self.data
+
+        sections = self.data['sections']
+        for section_dir in self._sections_to_fill_title:
+            sections[section_dir]['title'] = get_section_dir_title_from_trie(section_dir, self.path_titles)
+        self._sections_to_fill_title.clear()
+        return self.data
+
+    def close(self) -> None:
+        """Deletes the spilled sections and the page contents from the disk."""
+        if self.spilled is not None:
+            self.spilled.close()
+        if self.contents is not None:
+            self.contents.close()
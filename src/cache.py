@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import TYPE_CHECKING
+
+from src.extractor import HtmlMetadata
+from src.renderer import render_llms_txt_section
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from apify.storages import KeyValueStore
+
+    from src.mytypes import LinkDict, LinkRecord
+
+logger = logging.getLogger('apify')
+
+DEFAULT_CACHE_MAX_ENTRIES = 100_000
+DEFAULT_CACHE_MAX_AGE_RUNS = 10
+
+
+def get_content_hash(content: str) -> str:
+    """Returns a short hash of the content used to detect changed pages."""
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def get_cache_key(url: str) -> str:
+    """Returns the key of the cache record for the site crawled from the start `url`."""
+    return f'EXTRACTION_CACHE-{get_content_hash(url)}'
+
+
+class ExtractionCache:
+    """Cache of the metadata extracted from the crawled pages that is kept between the runs.
+
+    Each URL maps to a compact `[content_hash, title, description, last_seen_run]` entry,
+    so the HTML of a page is parsed again only if its content has changed.
+    """
+
+    def __init__(
+        self,
+        entries: dict[str, list] | None = None,
+        run_number: int = 0,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        max_age_runs: int = DEFAULT_CACHE_MAX_AGE_RUNS,
+    ) -> None:
+        """Creates the cache.
+
+        :param entries: Entries loaded from the previous runs
+        :param run_number: Number of the current run, used to evict the entries not seen for a while
+        :param max_entries: Maximum number of entries kept, the least recently seen are evicted first
+        :param max_age_runs: Entries not seen in this many runs are evicted
+        """
+        self.entries = entries if entries is not None else {}
+        self.run_number = run_number
+        self.max_entries = max_entries
+        self.max_age_runs = max_age_runs
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str, content_hash: str) -> HtmlMetadata | None:
+        """Returns the cached metadata of the page if its content has not changed."""
+        entry = self.entries.get(url)
+        if entry is None or entry[0] != content_hash:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[3] = self.run_number
+        return HtmlMetadata(title=entry[1], description=entry[2])
+
+    def put(self, url: str, content_hash: str, metadata: HtmlMetadata) -> None:
+        """Stores the metadata extracted from the page content with the given hash."""
+        self.entries[url] = [content_hash, metadata.title, metadata.description, self.run_number]
+
+    def evict(self) -> int:
+        """Evicts the stale entries and the entries over the size limit, returns the number of evicted entries."""
+        count = len(self.entries)
+        min_run_number = self.run_number - self.max_age_runs + 1
+        self.entries = {url: entry for url, entry in self.entries.items() if entry[3] >= min_run_number}
+
+        if len(self.entries) > self.max_entries:
+            # sort is stable, so the insertion order decides among the entries seen in the same run
+            by_last_seen = sorted(self.entries.items(), key=lambda url_entry: url_entry[1][3], reverse=True)
+            self.entries = dict(by_last_seen[: self.max_entries])
+
+        return count - len(self.entries)
+
+    @classmethod
+    async def load(
+        cls,
+        store: KeyValueStore,
+        key: str,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        max_age_runs: int = DEFAULT_CACHE_MAX_AGE_RUNS,
+    ) -> ExtractionCache:
+        """Loads the cache saved by the previous run from the key-value store."""
+        record = await store.get_value(key) or {}
+        cache = cls(
+            entries=record.get('entries', {}),
+            run_number=record.get('runNumber', 0) + 1,
+            max_entries=max_entries,
+            max_age_runs=max_age_runs,
+        )
+        logger.info(f'Loaded {len(cache.entries)} cached pages from the key-value store!')
+        return cache
+
+    async def save(self, store: KeyValueStore, key: str) -> None:
+        """Evicts the stale entries and saves the cache into the key-value store."""
+        evicted = self.evict()
+        await store.set_value(key, {'runNumber': self.run_number, 'entries': self.entries})
+        logger.info(
+            f'Saved {len(self.entries)} cached pages into the key-value store'
+            f' ({self.hits} hits, {self.misses} misses, {evicted} evicted)!'
+        )
+
+
+def get_render_cache_key(url: str) -> str:
+    """Returns the key of the render cache record for the site crawled from the start `url`."""
+    return f'RENDER_CACHE-{get_content_hash(url)}'
+
+
+def get_section_hash(title: str, links: Iterable[LinkDict | LinkRecord]) -> str:
+    """Returns a hash of the section title and its links, the links are hashed one at a time."""
+    section_hash = hashlib.blake2b(title.encode(), digest_size=16)
+    for link in links:
+        # the separators cannot appear in the fields, so different links never hash the same
+        section_hash.update(f"\x1e{link['url']}\x1f{link['title']}\x1f{link.get('description') or ''}".encode())
+    return section_hash.hexdigest()
+
+
+class SectionRenderCache:
+    """Rendered sections of the llms.txt file and the hash of the whole output, kept between the runs.
+
+    Each section hash maps to the rendered section, so only the sections whose title or links have changed
+    are rendered again. Only the sections rendered in the current run are saved, the removed ones are dropped.
+    """
+
+    def __init__(self, entries: dict[str, str] | None = None, output_hash: str | None = None) -> None:
+        """Creates the cache.
+
+        :param entries: Rendered sections of the previous run by their hashes
+        :param output_hash: Hash of the llms.txt file of the previous run
+        """
+        self.entries = entries if entries is not None else {}
+        self.output_hash = output_hash
+        self.rendered: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def removed_count(self) -> int:
+        """Number of the sections of the previous run that are not in the current output."""
+        return len(self.entries.keys() - self.rendered.keys())
+
+    def render_section(self, title: str, links: Iterable[LinkDict | LinkRecord]) -> str:
+        """Returns the rendered section, rendered again only if it has changed since the previous run.
+
+        :param title: Title of the section
+        :param links: Links of the section, iterated twice if the section has changed
+        """
+        section_hash = get_section_hash(title, links)
+        if (section := self.rendered.get(section_hash) or self.entries.get(section_hash)) is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            section = render_llms_txt_section(title, links)
+        self.rendered[section_hash] = section
+        return section
+
+    def is_output_changed(self, output: str) -> bool:
+        """Checks if the output differs from the output of the previous run."""
+        return get_content_hash(output) != self.output_hash
+
+    @classmethod
+    async def load(cls, store: KeyValueStore, key: str) -> SectionRenderCache:
+        """Loads the cache saved by the previous run from the key-value store."""
+        record = await store.get_value(key) or {}
+        cache = cls(record.get('entries', {}), record.get('outputHash'))
+        logger.info(f'Loaded {len(cache.entries)} rendered sections from the key-value store!')
+        return cache
+
+    async def save(self, store: KeyValueStore, key: str, output: str) -> None:
+        """Saves the sections rendered in this run and the hash of the output into the key-value store."""
+        await store.set_value(key, {'outputHash': get_content_hash(output), 'entries': self.rendered})
+        logger.info(
+            f'Saved {len(self.rendered)} rendered sections into the key-value store'
+            f' ({self.hits} unchanged, {self.misses} rendered, {self.removed_count} removed)!'
+        )
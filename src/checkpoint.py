@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from apify import Actor, Event
+
+if TYPE_CHECKING:
+    from apify.storages import KeyValueStore
+
+    from src.builder import LLMSDataBuilder
+    from src.dedup import PageDeduplicator
+
+logger = logging.getLogger('apify')
+
+CHECKPOINT_RECORD_KEY = 'CHECKPOINT'
+
+
+class ProcessingCheckpoint:
+    """Progress of the crawler run processing saved in the key-value store, a restarted actor run resumes from it.
+
+    The checkpoint consists of the head record with the crawler run ID and the number of the processed dataset
+    items and of the chunk records with the pages added to the builder and the changes of the deduplicator state.
+    Each save writes only the chunk of the pages added since the previous save, so its cost does not grow with the size
+    of the site. The pages are replayed into a new builder on restore, which rebuilds its sections and page titles
+    in the original order, and the changes into the deduplicator, so the pages processed before the restart are still
+    recognized as the originals of their duplicates.
+    """
+
+    def __init__(
+        self,
+        store: KeyValueStore,
+        builder: LLMSDataBuilder,
+        key: str = CHECKPOINT_RECORD_KEY,
+        dedup: PageDeduplicator | None = None,
+    ) -> None:
+        """Creates the checkpoint of the builder and starts tracking the pages added to it.
+
+        :param store: Key-value store of the actor run, it is kept when the run is migrated or restarted
+        :param builder: Builder of the LLMS data, no pages may be added to it yet
+        :param key: Key of the head record, the chunk records have the `-<index>` suffix
+        :param dedup: Deduplicator of the pages, no pages may be checked by it yet
+        """
+        self.store = store
+        self.builder = builder
+        self.key = key
+        self.dedup = dedup
+        self.run_id: str | None = None
+        self.unchanged_pages_count = 0
+        self.chunks_count = 0
+        self._saved_head: dict | None = None
+        self._lock = asyncio.Lock()
+        builder.new_pages = []
+        if dedup is not None:
+            dedup.changes = []
+
+    @property
+    def is_restored(self) -> bool:
+        """Whether the crawler run of the checkpoint was already started by a previous actor run."""
+        return self.run_id is not None
+
+    async def restore(self) -> bool:
+        """Replays the saved pages into the builder and the deduplicator, returns False if no checkpoint was saved."""
+        if not (head := await self.store.get_value(self.key)):
+            return False
+        for index in range(head['chunksCount']):
+            chunk = await self.store.get_value(f'{self.key}-{index}') or {}
+            for url, title, description in chunk.get('pages', []):
+                self.builder.add_page(url, title, description)
+            if self.dedup is not None:
+                self.dedup.apply_changes(chunk.get('dedup', []))
+        self.builder.items_count = head['itemsCount']
+        self.builder.new_pages = []
+        self.run_id = head['runId']
+        self.unchanged_pages_count = head['unchangedPagesCount']
+        self.chunks_count = head['chunksCount']
+        self._saved_head = head
+        logger.info(f'Restored the checkpoint of the crawler run "{self.run_id}" at item {self.builder.items_count}')
+        return True
+
+    async def save(self) -> None:
+        """Saves the pages and the deduplicator changes added since the previous save and the current progress."""
+        async with self._lock:
+            # read together without awaiting, so the pages and changes match the number of the processed items
+            pages, self.builder.new_pages = self.builder.new_pages or [], []
+            dedup_changes: list[list] = []
+            if self.dedup is not None:
+                dedup_changes, self.dedup.changes = self.dedup.changes or [], []
+            chunk = {'pages': pages, 'dedup': dedup_changes} if pages or dedup_changes else None
+            head = {
+                'runId': self.run_id,
+                'itemsCount': self.builder.items_count,
+                'unchangedPagesCount': self.unchanged_pages_count,
+                'chunksCount': self.chunks_count + bool(chunk),
+            }
+            if chunk:
+                await self.store.set_value(f'{self.key}-{self.chunks_count}', chunk)
+                self.chunks_count += 1
+            if head != self._saved_head:
+                await self.store.set_value(self.key, head)
+                self._saved_head = head
+
+    async def delete(self) -> None:
+        """Deletes the checkpoint records once the processing has finished."""
+        async with self._lock:
+            for index in range(self.chunks_count):
+                await self.store.set_value(f'{self.key}-{index}', None)
+            if self._saved_head is not None:
+                await self.store.set_value(self.key, None)
+            self.chunks_count = 0
+            self._saved_head = None
+
+    def attach(self) -> None:
+        """Saves the checkpoint whenever the platform asks the actor to persist its state or migrates it."""
+        Actor.on(Event.PERSIST_STATE, self._on_event)
+        Actor.on(Event.MIGRATING, self._on_event)
+
+    def detach(self) -> None:
+        """Stops saving the checkpoint on the platform events."""
+        Actor.off(Event.PERSIST_STATE, self._on_event)
+        Actor.off(Event.MIGRATING, self._on_event)
+
+    async def _on_event(self, _event_data: object) -> None:
+        await self.save()
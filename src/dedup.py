@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import logging
+from collections import deque
+from urllib.parse import urlparse
+
+logger = logging.getLogger('apify')
+
+# record with the list of the collapsed duplicate pages
+DUPLICATES_RECORD_KEY = 'DUPLICATES'
+# directory index files served under the same URL as their directory
+INDEX_FILE_NAMES = frozenset({'index.html', 'index.htm', 'index.php'})
+
+
+def get_canonical_url(url: str) -> str:
+    """Returns the URL shared by the aliases of the page.
+
+    The scheme and host are lowercased, the query, fragment, directory index file and trailing slash are removed,
+    e.g. `https://Example.com/docs/index.html?ref=nav` becomes `https://example.com/docs`.
+    """
+    parsed_url = urlparse(url.strip())
+    path = parsed_url.path
+    if (file_name := path.rpartition('/')[2]).lower() in INDEX_FILE_NAMES:
+        path = path[: -len(file_name)]
+    return parsed_url._replace(
+        scheme=parsed_url.scheme.lower(),
+        netloc=parsed_url.netloc.lower(),
+        path=path.rstrip('/'),
+        params='',
+        query='',
+        fragment='',
+    ).geturl()
+
+
+class PageDeduplicator:
+    """Collapses the pages served under several URLs, only the first one in the crawl order is kept.
+
+    The pages are duplicates if they share the canonical URL, either the one declared by the crawler
+    in the `metadata.canonicalUrl` of the dataset item or the one derived from the page URL, or if they
+    have the same HTML content. The canonical URLs are checked before the HTML is downloaded and the
+    content hashes before it is parsed.
+
+    Once `changes` is set to a list, the changes of the state are appended to it as they are committed,
+    so the checkpoint can save them together with the pages and `apply_changes` can restore them.
+    """
+
+    def __init__(self) -> None:
+        # first URL of each canonical URL and content hash that was kept
+        self.canonical_urls: dict[str, str] = {}
+        self.content_hashes: dict[str, str] = {}
+        # content hashes of the downloaded pages that were not accepted or rejected yet
+        self._pending_hashes: dict[str, str] = {}
+        self.duplicates: list[dict] = []
+        self.url_duplicates_count = 0
+        self.content_duplicates_count = 0
+        # committed changes not saved yet, not tracked if None
+        self.changes: list[list] | None = None
+        # changes of the URL checks, which run ahead of the processing, by the page URL until the page is processed
+        self._uncommitted_changes: dict[str, deque[list[list]]] = {}
+
+    def is_duplicate_url(self, url: str | None, canonical_url: str | None = None) -> bool:
+        """Checks if the page has the same canonical URL as an earlier page, must be called in the crawl order.
+
+        :param url: URL of the page
+        :param canonical_url: Canonical URL declared by the page, derived from its URL if None
+        """
+        if url is None:
+            return False
+        keys = [get_canonical_url(url)]
+        if canonical_url and (canonical_key := get_canonical_url(canonical_url)) != keys[0]:
+            keys.append(canonical_key)
+        changes: list[list] = []
+        if self.changes is not None:
+            self._uncommitted_changes.setdefault(url, deque()).append(changes)
+        for key in keys:
+            if (first_url := self.canonical_urls.get(key)) is not None:
+                self._add_duplicate(url, first_url, 'url', changes)
+                return True
+        for key in keys:
+            self.canonical_urls[key] = url
+            changes.append(['url', key, url])
+        return False
+
+    def is_duplicate_item(self, item: dict) -> bool:
+        """Checks if the dataset item has the canonical URL of an earlier item, must be called in the crawl order."""
+        return self.is_duplicate_url(item.get('url'), (item.get('metadata') or {}).get('canonicalUrl'))
+
+    def check_content(self, url: str, content_hash: str) -> bool:
+        """Records the content hash of the downloaded page, returns True if an accepted page has the same content.
+
+        The pages with the content of an already accepted page do not need to be parsed.
+        """
+        self._pending_hashes[url] = content_hash
+        return content_hash in self.content_hashes
+
+    def accept_content(self, url: str) -> bool:
+        """Accepts the page unless its content was already accepted, must be called in the crawl order.
+
+        The changes of the URL check of the page are committed too, so it must be called for each processed page
+        that is not a duplicate URL.
+        """
+        self.commit(url)
+        if (content_hash := self._pending_hashes.pop(url, None)) is None:
+            return True
+        if (first_url := self.content_hashes.get(content_hash)) is not None:
+            self._add_duplicate(url, first_url, 'content', self.changes)
+            return False
+        self.content_hashes[content_hash] = url
+        if self.changes is not None:
+            self.changes.append(['content', content_hash, url])
+        return True
+
+    def commit(self, url: str) -> None:
+        """Commits the changes of the URL check of the page once it is processed, must be called in the crawl order."""
+        if (url_changes := self._uncommitted_changes.get(url)) is None:
+            return
+        if self.changes is not None:
+            self.changes.extend(url_changes.popleft())
+        if not url_changes:
+            del self._uncommitted_changes[url]
+
+    def apply_changes(self, changes: list[list]) -> None:
+        """Restores the state from the committed changes saved by a previous actor run."""
+        for change in changes:
+            match change:
+                case ['url', key, url]:
+                    self.canonical_urls[key] = url
+                case ['content', content_hash, url]:
+                    self.content_hashes[content_hash] = url
+                case ['duplicate', url, first_url, reason]:
+                    self._add_duplicate(url, first_url, reason, log=False)
+
+    def _add_duplicate(
+        self, url: str, first_url: str, reason: str, changes: list[list] | None = None, *, log: bool = True
+    ) -> None:
+        if log:
+            logger.info(f'Skipping page "{url}", duplicate of "{first_url}" by {reason}')
+        if reason == 'url':
+            self.url_duplicates_count += 1
+        else:
+            self.content_duplicates_count += 1
+        self.duplicates.append({'url': url, 'duplicateOf': first_url, 'reason': reason})
+        if changes is not None:
+            changes.append(['duplicate', url, first_url, reason])
+
+    @property
+    def report(self) -> dict:
+        """Report of the collapsed duplicate pages."""
+        return {
+            'urlDuplicates': self.url_duplicates_count,
+            'contentDuplicates': self.content_duplicates_count,
+            'duplicates': self.duplicates,
+        }
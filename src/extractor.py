@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+# elements without end tag, they are never open, so their end tags are ignored
+VOID_ELEMENTS = frozenset(
+    {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+)
+# text inside these elements is not a part of the h1 text, like in BeautifulSoup `get_text`
+HIDDEN_TEXT_ELEMENTS = frozenset({'script', 'style', 'template'})
+
+
+class HtmlMetadata(NamedTuple):
+    """Metadata extracted from the HTML content of a single page."""
+
+    title: str | None
+    description: str | None
+
+
+class _ParsingFinishedError(Exception):
+    """Raised from the parser callbacks to stop the parsing once all metadata is collected."""
+
+
+class HtmlMetadataParser(HTMLParser):
+    """Streaming HTML parser that collects the first h1 text and the meta description.
+
+    Produces the same results as `get_h1_from_html` and `get_description_from_html`,
+    but reads the document only once and stops as soon as both values are known.
+    The parser can be fed incrementally, `is_complete` tells whether more data can change the result.
+    """
+
+    def __init__(self, *, stop_at_fallback_description: bool = False) -> None:
+        """Creates the parser.
+
+        :param stop_at_fallback_description: Complete once the h1 and meta name="Description" are found,
+            a later meta name="description" is then not read, unlike in `get_description_from_html`
+        """
+        super().__init__(convert_charrefs=True)
+        self.stop_at_fallback_description = stop_at_fallback_description
+        self.title: str | None = None
+        self.description: str | None = None
+        # open elements until the first h1 is closed, an end tag closes the last open element with its name
+        # and all the elements opened after it, an end tag without an open element is ignored
+        self._open_tags: list[str] = []
+        self._hidden_depth = 0
+        # index of the first h1 in the open elements, the h1 is closed once the stack is popped below it
+        self._h1_index: int | None = None
+        self._h1_parts: list[str] | None = None
+        self._h1_done = False
+        # meta name="description" always wins over meta name="Description"
+        self._has_description = False
+        self._has_fallback_description = False
+        self._fallback_description: str | None = None
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether the rest of the document cannot change the extracted metadata."""
+        if self.stop_at_fallback_description and self._has_fallback_description:
+            return self._h1_done
+        return self._h1_done and self._has_description
+
+    @property
+    def metadata(self) -> HtmlMetadata:
+        """Metadata collected from the data fed so far."""
+        title = self.title
+        if title is None and self._h1_parts is not None:
+            # unclosed h1 contains the rest of the document
+            title = ''.join(self._h1_parts)
+        description = self.description if self._has_description else self._fallback_description
+        return HtmlMetadata(title=title, description=description)
+
+    def feed(self, data: str) -> None:
+        """Feeds the parser with the next chunk of the document, the data is ignored once complete."""
+        if self.is_complete:
+            return
+        with suppress(_ParsingFinishedError):
+            super().feed(data)
+
+    def close(self) -> None:
+        """Processes any remaining buffered data."""
+        if self.is_complete:
+            return
+        with suppress(_ParsingFinishedError):
+            super().close()
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        """Starts collecting the h1 text or reads the meta description."""
+        if tag == 'meta':
+            self._handle_meta(dict(attrs))
+        if self._h1_done or tag in VOID_ELEMENTS:
+            return
+        if tag == 'h1' and self._h1_parts is None:
+            self._h1_parts = []
+            self._h1_index = len(self._open_tags)
+        self._open_tags.append(tag)
+        if tag in HIDDEN_TEXT_ELEMENTS:
+            self._hidden_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        """Closes the first h1 when its end tag or the end tag of any enclosing element is found."""
+        if self._h1_done:
+            return
+        for index in range(len(self._open_tags) - 1, -1, -1):
+            if self._open_tags[index] == tag:
+                break
+        else:
+            return
+        self._hidden_depth -= sum(open_tag in HIDDEN_TEXT_ELEMENTS for open_tag in self._open_tags[index:])
+        del self._open_tags[index:]
+        if self._h1_index is not None and index <= self._h1_index and self._h1_parts is not None:
+            self._h1_done = True
+            self.title = ''.join(self._h1_parts)
+            self._open_tags.clear()
+            self._stop_if_complete()
+
+    def handle_data(self, data: str) -> None:
+        """Collects the text of the first h1."""
+        if self._h1_parts is not None and not self._h1_done and not self._hidden_depth:
+            self._h1_parts.append(data)
+
+    def unknown_decl(self, data: str) -> None:
+        """Collects the CDATA sections of the first h1, BeautifulSoup keeps their text."""
+        if data.upper().startswith('CDATA['):
+            self.handle_data(data[len('CDATA[') :])
+
+    def _handle_meta(self, attrs: dict[str, str | None]) -> None:
+        name = attrs.get('name')
+        if name not in {'description', 'Description'}:
+            return
+        content = attrs.get('content')
+        # attribute without a value is an empty string in BeautifulSoup
+        if content is None and 'content' in attrs:
+            content = ''
+        if name == 'description' and not self._has_description:
+            self._has_description = True
+            self.description = content
+            self._stop_if_complete()
+        elif name == 'Description' and not self._has_fallback_description:
+            self._has_fallback_description = True
+            self._fallback_description = content
+            self._stop_if_complete()
+
+    def _stop_if_complete(self) -> None:
+        if self.is_complete:
+            raise _ParsingFinishedError
+
+
+def extract_html_metadata(html: str) -> HtmlMetadata:
+    """Extracts the first h1 text and the meta description from the HTML content in a single pass."""
+    parser = HtmlMetadataParser()
+    parser.feed(html)
+    parser.close()
+    return parser.metadata
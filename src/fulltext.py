@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import tempfile
+from typing import TYPE_CHECKING
+
+from src.helpers import parse_url
+from src.renderer import render_llms_txt_header
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from apify.storages import KeyValueStore
+    from apify_client.clients import DatasetClientAsync
+
+    from src.mytypes import LinkDict, LinkRecord, LLMSData
+
+# key of the llms-full.txt record, the shards of a large file have the -<index> suffix
+LLMS_FULL_KEY_PREFIX = 'llms-full'
+# each shard is read into memory to be uploaded, so the file is always split into the shards of at most this size
+DEFAULT_LLMS_FULL_MAX_FILE_MBYTES = 8
+TEXT_CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+
+def get_item_content(item: dict) -> str | None:
+    """Returns the markdown of the crawled page, or its plain text if the crawler did not save the markdown."""
+    return item.get('markdown') or item.get('text') or None
+
+
+class PageContents:
+    """Contents of the pages stored in a temporary file, only their offsets are kept in memory.
+
+    The pages are looked up by their normalized URL, a page added again replaces the previous content.
+    """
+
+    def __init__(self, directory: str | None = None) -> None:
+        """Creates the empty temporary file, it is deleted once closed.
+
+        :param directory: Directory of the file, the default temporary directory if None
+        """
+        self._file = tempfile.TemporaryFile(prefix='llms-contents-', dir=directory)  # noqa: SIM115
+        self._offsets: dict[str, tuple[int, int]] = {}
+        self.size = 0
+
+    @property
+    def pages_count(self) -> int:
+        """Number of the pages with the content."""
+        return len(self._offsets)
+
+    def add(self, url: str, content: str) -> None:
+        """Appends the content of the page to the file."""
+        data = content.encode()
+        self._file.seek(self.size)
+        self._file.write(data)
+        self._offsets[parse_url(url).normalized] = (self.size, len(data))
+        self.size += len(data)
+
+    def get(self, url: str) -> str | None:
+        """Reads the content of the page from the file, None if it was not added."""
+        if (entry := self._offsets.get(parse_url(url).normalized)) is None:
+            return None
+        offset, length = entry
+        self._file.seek(offset)
+        return self._file.read(length).decode()
+
+    def close(self) -> None:
+        """Closes and deletes the file."""
+        self._file.close()
+
+
+async def restore_page_contents(contents: PageContents, dataset: DatasetClientAsync, limit: int) -> None:
+    """Adds the contents of the first dataset items again, e.g. of the items restored from a checkpoint."""
+    if limit <= 0:
+        return
+    async for item in dataset.iterate_items(limit=limit):
+        if (url := item.get('url')) is not None and (content := get_item_content(item)):
+            contents.add(url, content)
+
+
+def render_llms_full_page(title: str, url: str, content: str | None) -> str:
+    """Generates the part of the llms-full.txt file with the content of a single page."""
+    result = f'### {title.strip()}\n\nSource: {url.strip()}\n\n'
+    if content and (content := content.strip()):
+        result += f'{content}\n\n'
+    return result
+
+
+def iter_llms_full_txt(
+    data: LLMSData,
+    sections: Iterable[tuple[str, Iterable[LinkDict | LinkRecord]]],
+    contents: PageContents,
+    root_url: str,
+) -> Iterator[str]:
+    """Yields the parts of the llms-full.txt file, the header and then the content of each page one at a time.
+
+    The sections and their pages are in the same order as in the llms.txt file, the content of the start page
+    follows the header.
+
+    :param data: LLMS data with the header of the file
+    :param sections: Titles of the sections with their links, in the order of the llms.txt file
+    :param contents: Contents of the pages
+    :param root_url: Start URL of the site
+    """
+    yield render_llms_txt_header(data)
+    if root_content := contents.get(root_url):
+        yield f'{root_content.strip()}\n\n'
+    for title, links in sections:
+        yield f'## {title.strip()}\n\n'
+        for link in links:
+            yield render_llms_full_page(link['title'], link['url'], contents.get(link['url']))
+
+
+class ShardedTextFile:
+    """Text written part by part into a temporary file, split into the shards of limited size.
+
+    The shards are split only between the parts, so a part larger than the limit makes a larger shard.
+    """
+
+    def __init__(self, max_shard_bytes: int | None = None, directory: str | None = None) -> None:
+        """Creates the empty temporary file, it is deleted once closed.
+
+        :param max_shard_bytes: Maximum size of a shard, the text is not split if None
+        :param directory: Directory of the file, the default temporary directory if None
+        """
+        self.max_shard_bytes = max_shard_bytes
+        self._file = tempfile.TemporaryFile(prefix='llms-full-', dir=directory)  # noqa: SIM115
+        # offsets and sizes of the shards, the last one is not included until finished
+        self.shards: list[tuple[int, int]] = []
+        self.size = 0
+        self._shard_offset = 0
+
+    def write(self, part: str) -> None:
+        """Appends the part of the text, starts a new shard if it does not fit into the current one."""
+        data = part.encode()
+        shard_size = self.size - self._shard_offset
+        if self.max_shard_bytes is not None and shard_size and shard_size + len(data) > self.max_shard_bytes:
+            self.shards.append((self._shard_offset, shard_size))
+            self._shard_offset = self.size
+        self._file.write(data)
+        self.size += len(data)
+
+    def finish(self) -> None:
+        """Closes the last shard, no more parts may be written."""
+        self.shards.append((self._shard_offset, self.size - self._shard_offset))
+        self._shard_offset = self.size
+
+    def iter_shards(self) -> Iterator[str]:
+        """Yields the text of the shards one at a time."""
+        for offset, size in self.shards:
+            self._file.seek(offset)
+            yield self._file.read(size).decode()
+
+    def close(self) -> None:
+        """Closes and deletes the file."""
+        self._file.close()
+
+
+def get_llms_full_shard_key(key_suffix: str, index: int) -> str:
+    """Returns the key of the llms-full.txt shard, indexed from 1."""
+    return f'{LLMS_FULL_KEY_PREFIX}{key_suffix}-{index}.txt'
+
+
+async def save_llms_full_txt(
+    store: KeyValueStore, text_file: ShardedTextFile, data: LLMSData, key_suffix: str = ''
+) -> list[str]:
+    """Uploads the llms-full.txt file shard by shard, returns the keys of the saved records.
+
+    A single shard is saved as the `llms-full.txt` record. The shards of a larger file are saved as
+    the `llms-full-1.txt`, `llms-full-2.txt`, ... records and `llms-full.txt` is their index then.
+    Only one shard is held in memory at a time.
+    """
+    key = f'{LLMS_FULL_KEY_PREFIX}{key_suffix}.txt'
+    if len(text_file.shards) <= 1:
+        await store.set_value(key, next(text_file.iter_shards(), ''), content_type=TEXT_CONTENT_TYPE)
+        return [key]
+
+    shard_keys = []
+    for index, shard in enumerate(text_file.iter_shards(), start=1):
+        shard_keys.append(shard_key := get_llms_full_shard_key(key_suffix, index))
+        await store.set_value(shard_key, shard, content_type=TEXT_CONTENT_TYPE)
+    index_lines = [f'- [{shard_key}]({await store.get_public_url(shard_key)})\n' for shard_key in shard_keys]
+    index_text = (
+        render_llms_txt_header(data)
+        + f'The full content is split into {len(shard_keys)} files, in this order:\n\n'
+        + ''.join(index_lines)
+    )
+    await store.set_value(key, index_text, content_type=TEXT_CONTENT_TYPE)
+    return [key, *shard_keys]
@@ -1,23 +1,33 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple
 from urllib.parse import urlparse
 
 import bs4
 from bs4.element import NavigableString
 
 from src.crawler_config import CRAWLER_CONFIG
+from src.trie import PathTrie
 
 if TYPE_CHECKING:
     from apify_client.clients import KeyValueStoreClientAsync
 
-    from src.mytypes import LLMSData
+    from src.mytypes import LinkDict, LinkRecord, LLMSData
+    from src.trie import PathTrieNode
 
 # not using Actor.log because pytest then throws a warning
 # about non existent event loop
 logger = logging.getLogger('apify')
 
+# maximum number of parsed URLs kept in the cache
+URL_CACHE_SIZE = 4096
+# characters not allowed in the key-value store record keys
+INVALID_KEY_CHARS_RE = re.compile(r"[^a-zA-Z0-9!_.'()-]+")
+KEY_SLUG_MAX_LENGTH = 200
+
 
 def get_section_dir_title(section_dir: str, path_titles: dict[str, str]) -> str:
     """Gets the title of the section from the path titles."""
@@ -32,7 +42,11 @@ def get_section_dir_title(section_dir: str, path_titles: dict[str, str]) -> str:
 
 def get_h1_from_html(html: str) -> str | None:
     """Extracts the first h1 tag from the HTML content."""
-    soup = bs4.BeautifulSoup(html, 'html.parser')
+    return get_h1_from_soup(bs4.BeautifulSoup(html, 'html.parser'))
+
+
+def get_h1_from_soup(soup: bs4.BeautifulSoup) -> str | None:
+    """Extracts the first h1 tag from the parsed HTML content."""
     h1 = soup.find('h1')
     return h1.getText() if h1 else None
 
@@ -44,7 +58,8 @@ def clean_llms_data(data: LLMSData, section_min_links: int = 2) -> None:
     :param section_min_links: Minimum number of links in a section to keep it
     and not move the links to the index section
     """
-    to_remove_sections: set[str] = set()
+    # kept in the order of the sections, so the links of the index section do not depend on the hash seed
+    to_remove_sections: list[str] = []
 
     if 'sections' not in data:
         raise ValueError('Missing "sections" attribute in the LLMS data!')
@@ -56,7 +71,7 @@ def clean_llms_data(data: LLMSData, section_min_links: int = 2) -> None:
         if section_dir == '/':
             continue
         if len(section['links']) < section_min_links:
-            to_remove_sections.add(section_dir)
+            to_remove_sections.append(section_dir)
 
     if to_remove_sections:
         if '/' not in sections:
@@ -66,25 +81,80 @@ def clean_llms_data(data: LLMSData, section_min_links: int = 2) -> None:
             del sections[section_dir]
 
 
+def collapse_sparse_sections(data: LLMSData, section_min_links: int = 2) -> None:
+    """Collapses the sections with low link count into their nearest ancestor section.
+
+    Generalization of `clean_llms_data` for the nested sections. The sections are visited in a single
+    post-order pass over the trie of their paths, so the links of the sparse subsections are counted
+    in their parent before the parent is checked itself. Links without any ancestor section
+    are moved to the index section.
+
+    :param data: LLMS data to clean
+    :param section_min_links: Minimum number of links in a section to keep it
+    """
+    if 'sections' not in data:
+        raise ValueError('Missing "sections" attribute in the LLMS data!')
+
+    sections = data['sections']
+    section_trie: PathTrie[str] = PathTrie()
+    for section_dir in sorted(sections):
+        section_trie[section_dir] = section_dir
+
+    def collapse(node: PathTrieNode[str]) -> list[LinkDict | LinkRecord]:
+        """Returns the links that are passed to the nearest ancestor section."""
+        orphan_links = [link for child in node.children.values() for link in collapse(child)]
+        if (section_dir := node.value) is None:
+            return orphan_links
+        section = sections[section_dir]
+        section['links'].extend(orphan_links)
+        # skip the index section
+        if section_dir == '/' or len(section['links']) >= section_min_links:
+            return []
+        del sections[section_dir]
+        return section['links']
+
+    if index_links := collapse(section_trie.root):
+        sections['/'] = {'title': 'Index', 'links': index_links}
+
+
+class ParsedUrl(NamedTuple):
+    """URL parsed once into all the parts used while processing the crawled pages."""
+
+    normalized: str
+    path: str
+    path_dir: str
+    hostname: str | None
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def parse_url(url: str) -> ParsedUrl:
+    """Parses the URL into the normalized URL, its path, directory path and hostname.
+
+    The results are cached, because the same URLs are parsed repeatedly, e.g. the start URL and section parents.
+    """
+    parsed_url = urlparse(url)
+    path = parsed_url.path.rstrip('/')
+    return ParsedUrl(
+        normalized=parsed_url._replace(path=path).geturl(),
+        path=path or '/',
+        path_dir=path.rsplit('/', 1)[0] or '/',
+        hostname=parsed_url.hostname,
+    )
+
+
 def get_url_path(url: str) -> str:
     """Get the path from the URL."""
-    url_normalized = normalize_url(url)
-    parsed_url = urlparse(url_normalized)
-    return parsed_url.path or '/'
+    return parse_url(url).path
 
 
 def get_url_path_dir(url: str) -> str:
     """Get the directory path from the URL."""
-    url_normalized = normalize_url(url)
-    parsed_url = urlparse(url_normalized)
-    return parsed_url.path.rsplit('/', 1)[0] or '/'
+    return parse_url(url).path_dir
 
 
 def normalize_url(url: str) -> str:
     """Normalizes the URL by removing trailing slash."""
-    parsed_url = urlparse(url)
-    normalized = parsed_url._replace(path=parsed_url.path.rstrip('/'))
-    return normalized.geturl()
+    return parse_url(url).normalized
 
 
 def get_hostname_path_string_from_url(url: str) -> str:
@@ -95,6 +165,12 @@ def get_hostname_path_string_from_url(url: str) -> str:
     return f'{parsed_url.hostname}{parsed_url.path}'
 
 
+def get_url_key_slug(url: str) -> str:
+    """Returns the hostname and path of the URL usable in the key-value store record keys, e.g. `example.com-docs`."""
+    slug = INVALID_KEY_CHARS_RE.sub('-', get_hostname_path_string_from_url(url)).strip('-')
+    return slug[:KEY_SLUG_MAX_LENGTH]
+
+
 def is_description_suitable(description: str | None) -> bool:
     """Checks if the description is suitable for the `llms.txt` file.
 
@@ -107,9 +183,14 @@ def is_description_suitable(description: str | None) -> bool:
     return '\n' not in description
 
 
+def get_html_record_key(html_url: str) -> str:
+    """Returns the key of the HTML record in the KV store of the crawler run from the `htmlUrl` of the item."""
+    return html_url.split('records/')[-1]
+
+
 async def get_html_from_kvstore(kvstore: KeyValueStoreClientAsync, html_url: str) -> str | None:
     """Gets the HTML content from the KV store."""
-    store_id = html_url.split('records/')[-1]
+    store_id = get_html_record_key(html_url)
     if not (record := await kvstore.get_record(store_id)):
         logger.warning(f'Failed to get record with id "{store_id}"!')
         return None
@@ -121,14 +202,25 @@ async def get_html_from_kvstore(kvstore: KeyValueStoreClientAsync, html_url: str
 
 
 def get_crawler_actor_config(
-    url: str, max_crawl_depth: int = 1, max_crawl_pages: int = 50, crawler_type: str = 'playwright:adaptive'
+    url: str,
+    max_crawl_depth: int = 1,
+    max_crawl_pages: int = 50,
+    crawler_type: str = 'playwright:adaptive',
+    *,
+    save_html: bool = True,
+    start_urls: list[str] | None = None,
 ) -> dict:
-    """Creates actor input configuration for the `apify/website-content-crawler` actor."""
-    config = CRAWLER_CONFIG
-    config['startUrls'] = [{'url': url, 'method': 'GET'}]
+    """Creates actor input configuration for the `apify/website-content-crawler` actor.
+
+    The HTML files are not saved by the crawler when `save_html` is False, only the dataset metadata is used then.
+    The crawler starts from the `start_urls` instead of the `url` if provided, e.g. the pages found in the sitemap.
+    """
+    config = CRAWLER_CONFIG.copy()
+    config['startUrls'] = [{'url': start_url, 'method': 'GET'} for start_url in start_urls or [url]]
     config['maxCrawlDepth'] = max_crawl_depth
     config['maxCrawlPages'] = max_crawl_pages
     config['crawlerType'] = crawler_type
+    config['saveHtmlAsFile'] = save_html
 
     return config
 
@@ -138,7 +230,11 @@ def get_description_from_html(html: str) -> None | str:
 
     Uses meta 'description' or 'Description' from the html.
     """
-    soup = bs4.BeautifulSoup(html, 'html.parser')
+    return get_description_from_soup(bs4.BeautifulSoup(html, 'html.parser'))
+
+
+def get_description_from_soup(soup: bs4.BeautifulSoup) -> None | str:
+    """Extracts the description from the parsed HTML content."""
     description = soup.find('meta', {'name': 'description'})
     if description is None:
         description = soup.find('meta', {'name': 'Description'})
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from html.parser import HTMLParser
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import httpx
+
+from src.helpers import parse_url
+from src.sitemap import is_url_in_scope
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+    from concurrent.futures import Executor
+
+logger = logging.getLogger('apify')
+
+# crawler type of the built-in crawler, the other types are passed to apify/website-content-crawler
+BUILTIN_CRAWLER_TYPE = 'builtin:http'
+# maximum number of concurrent requests to a single host
+DEFAULT_HOST_CONCURRENCY = 4
+DEFAULT_CRAWLER_CONCURRENCY = 10
+HTTP_CRAWLER_TIMEOUT_SECS = 30
+HTTP_CRAWLER_USER_AGENT = 'Mozilla/5.0 (compatible; llms.txt generator)'
+# only the pages of these content types are extracted and their links followed
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+def create_crawler_http_client(max_connections: int = DEFAULT_CRAWLER_CONCURRENCY) -> httpx.AsyncClient:
+    """Creates the HTTP client with pooled connections for the built-in crawler, it must not carry the Apify API token.
+
+    :param max_connections: Maximum number of the open connections
+    """
+    return httpx.AsyncClient(
+        headers={'User-Agent': HTTP_CRAWLER_USER_AGENT},
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=HTTP_CRAWLER_TIMEOUT_SECS,
+        follow_redirects=True,
+    )
+
+
+class _LinkParser(HTMLParser):
+    """Collects the `href` attributes of the links and the base URL of the document."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.base_href: str | None = None
+        self.hrefs: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        href = dict(attrs).get('href')
+        if not href:
+            return
+        if tag == 'a':
+            self.hrefs.append(href.strip())
+        elif tag == 'base' and self.base_href is None:
+            self.base_href = href.strip()
+
+
+def extract_links(html: str, page_url: str) -> list[str]:
+    """Returns the absolute HTTP URLs of the links in the HTML page without the fragments and duplicates."""
+    parser = _LinkParser()
+    parser.feed(html)
+    parser.close()
+    base_url = urljoin(page_url, parser.base_href) if parser.base_href else page_url
+    links = []
+    for href in parser.hrefs:
+        url = urldefrag(urljoin(base_url, href)).url
+        if urlparse(url).scheme in {'http', 'https'}:
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+
+class CrawledPage(NamedTuple):
+    """HTML page downloaded by the built-in crawler."""
+
+    url: str
+    depth: int
+    html: str
+
+
+class HttpCrawler:
+    """Lightweight crawler of the static sites running in the actor process.
+
+    The pages are downloaded with pooled connections, concurrently up to the `concurrency` limit
+    and the `host_concurrency` limit for each host, but they are yielded in the breadth-first order
+    of their discovery, so the output does not depend on the response times.
+    Only the links under the path of the start URL are followed.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        start_url: str,
+        *,
+        max_depth: int = 1,
+        max_pages: int = 50,
+        start_urls: list[str] | None = None,
+        concurrency: int = DEFAULT_CRAWLER_CONCURRENCY,
+        host_concurrency: int = DEFAULT_HOST_CONCURRENCY,
+        executor: Executor | None = None,
+        deadline: float | None = None,
+    ) -> None:
+        """Creates the crawler.
+
+        :param client: HTTP client used to download the pages
+        :param start_url: Start URL of the site, only the pages under its path are crawled
+        :param max_depth: Maximum number of links followed from the start URLs
+        :param max_pages: Maximum number of the requested pages
+        :param start_urls: Pages crawled instead of the start URL, their links are not followed if provided
+        :param concurrency: Maximum number of pages downloaded at the same time
+        :param host_concurrency: Maximum number of pages downloaded from a single host at the same time
+        :param executor: Executor for the link extraction, parses on the event loop if None
+        :param deadline: The `time.monotonic` deadline, no more pages are requested after it
+        """
+        if concurrency < 1 or host_concurrency < 1:
+            raise ValueError('The crawler concurrency must be at least 1!')
+        self.client = client
+        self.start_url = start_url
+        self.max_depth = max_depth if start_urls is None else 0
+        self.max_pages = max_pages
+        self.start_urls = start_urls if start_urls is not None else [start_url]
+        self.concurrency = concurrency
+        self.host_concurrency = host_concurrency
+        self.executor = executor
+        self.deadline = deadline
+        self.requests_count = 0
+        self.failed_count = 0
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+
+    async def iter_pages(self) -> AsyncIterator[CrawledPage]:
+        """Crawls the site and yields the downloaded HTML pages in the breadth-first order."""
+        seen: set[str] = set()
+        queue: deque[tuple[str, int]] = deque()
+        for url in self.start_urls:
+            self._enqueue(url, 0, seen, queue)
+
+        pending: deque[tuple[str, int, asyncio.Task[tuple[str, str] | None]]] = deque()
+        try:
+            while queue or pending:
+                while queue and len(pending) < self.concurrency and not self._is_past_deadline(queue):
+                    url, depth = queue.popleft()
+                    pending.append((url, depth, asyncio.ensure_future(self._fetch(url))))
+                if not pending:
+                    break
+                requested_url, depth, task = pending.popleft()
+                if (result := await task) is None:
+                    continue
+                url, html = result
+                # redirects may lead outside of the scope or to an already crawled page
+                if (normalized := parse_url(url).normalized) != parse_url(requested_url).normalized:
+                    if normalized in seen or not is_url_in_scope(url, self.start_url):
+                        logger.info(f'Skipping page "{requested_url}" redirected to "{url}"')
+                        continue
+                    seen.add(normalized)
+                if depth < self.max_depth:
+                    for link in await self._extract_links(html, url):
+                        self._enqueue(link, depth + 1, seen, queue)
+                yield CrawledPage(url, depth, html)
+        finally:
+            # the consumer stopped early or failed, do not leave the prefetched requests running
+            for _, _, task in pending:
+                task.cancel()
+
+    def _enqueue(self, url: str, depth: int, seen: set[str], queue: deque[tuple[str, int]]) -> None:
+        """Adds the page to the queue if it is in the scope and was not seen yet, up to `max_pages` pages."""
+        if len(seen) >= self.max_pages or not is_url_in_scope(url, self.start_url):
+            return
+        normalized = parse_url(url).normalized
+        if normalized not in seen:
+            seen.add(normalized)
+            queue.append((url, depth))
+
+    def _is_past_deadline(self, queue: deque[tuple[str, int]]) -> bool:
+        """Checks if the deadline has passed, the rest of the queue is dropped then."""
+        if self.deadline is None or time.monotonic() < self.deadline:
+            return False
+        logger.warning(f'Reached the crawler timeout, {len(queue)} pages were not crawled!')
+        queue.clear()
+        return True
+
+    async def _fetch(self, url: str) -> tuple[str, str] | None:
+        """Downloads the page, returns its final URL and HTML or None if it is not a valid HTML page."""
+        hostname = urlparse(url).hostname or ''
+        host_slots = self._host_slots.setdefault(hostname, asyncio.Semaphore(self.host_concurrency))
+        async with host_slots:
+            self.requests_count += 1
+            try:
+                response = await self.client.get(url)
+            except httpx.HTTPError as exc:
+                self.failed_count += 1
+                logger.warning(f'Failed to crawl page "{url}": {exc}')
+                return None
+        if response.is_error:
+            self.failed_count += 1
+            logger.warning(f'Failed to crawl page "{url}", status code {response.status_code}!')
+            return None
+        content_type = response.headers.get('Content-Type', 'text/html').partition(';')[0].strip().lower()
+        if content_type not in HTML_CONTENT_TYPES:
+            logger.info(f'Skipping page "{url}" with content type "{content_type}"')
+            return None
+        return str(response.url), response.text
+
+    async def _extract_links(self, html: str, url: str) -> list[str]:
+        """Extracts the links of the page, in the executor if provided."""
+        if self.executor is None:
+            return extract_links(html, url)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, extract_links, html, url)
@@ -1,178 +1,733 @@
 """This module defines the main entry point for the llsm.txt generator actor."""
 
+from __future__ import annotations
+
 import asyncio
 import logging
-from datetime import timedelta
+import time
+from functools import partial
 from typing import TYPE_CHECKING
-from urllib.parse import urlparse
 
 from apify import Actor
 
-from .helpers import (
-    clean_llms_data,
-    get_crawler_actor_config,
-    get_description_from_html,
-    get_h1_from_html,
-    get_html_from_kvstore,
-    get_section_dir_title,
-    get_url_path,
-    get_url_path_dir,
-    is_description_suitable,
-    normalize_url,
-)
+from .builder import LLMSDataBuilder
+from .cache import ExtractionCache, SectionRenderCache, get_cache_key, get_render_cache_key
+from .checkpoint import CHECKPOINT_RECORD_KEY, ProcessingCheckpoint
+from .dedup import DUPLICATES_RECORD_KEY, PageDeduplicator
+from .fulltext import PageContents, ShardedTextFile, iter_llms_full_txt, restore_page_contents, save_llms_full_txt
+from .helpers import clean_llms_data, collapse_sparse_sections, get_crawler_actor_config, get_url_key_slug
+from .http_crawler import HttpCrawler, create_crawler_http_client
+from .metrics import METRICS_RECORD_KEY, RunMetrics
+from .options import CRAWLER_MEMORY_MBYTES, DEFAULT_CRAWLER_MAX_API_CALLS, GeneratorOptions, get_start_urls
+from .parsers import resolve_parser_backend
+from .partial_fetch import PartialHtmlFetcher, create_records_http_client
+from .pipeline import ItemProcessor, create_parser_executor, process_crawled_pages, process_dataset_items
+from .profiling import create_run_profiler
 from .renderer import render_llms_txt
+from .scheduler import RunScheduler, get_run_deadline_from_details
+from .sitemap import (
+    SitemapState,
+    add_unchanged_sitemap_pages,
+    create_sitemap_http_client,
+    discover_sitemap_pages,
+    get_sitemap_state,
+    get_sitemap_state_key,
+)
 
 if TYPE_CHECKING:
-    from src.mytypes import LLMSData
+    from collections.abc import Awaitable, Callable
+    from concurrent.futures import Executor
+
+    import httpx
+    from apify.storages import KeyValueStore
+    from apify_client import ApifyClientAsync
+    from apify_client.clients import RunClientAsync
 
 logger = logging.getLogger('apify')
 
-# minimum for the llms.txt generator to process the results
-MIN_GENERATOR_RUN_SECS = 60
 LOG_POLL_INTERVAL_SECS = 5
 SECTION_MIN_LINKS = 2
+# maximum number of dataset items processed between two status polls while the crawler is running
+INCREMENTAL_BATCH_SIZE = 1000
+# bounds of the long-poll waits for the crawler run, the upper one limits how stale the propagated status can be
+CRAWLER_WAIT_MIN_SECS = 5
+CRAWLER_WAIT_MAX_SECS = 30
+# statuses of a finished run, a READY run is still waiting for the memory and an ABORTING one still pushes items
+TERMINAL_RUN_STATUSES = frozenset({'SUCCEEDED', 'FAILED', 'ABORTED', 'TIMED-OUT'})
 
 
-async def main() -> None:
-    """Main entry point for the llms.txt generator actor."""
-    async with Actor:
-        actor_input = await Actor.get_input()
-        url = actor_input.get('startUrl')
-        if url is None:
-            msg = 'Missing "startUrl" attribute in input!'
-            raise ValueError(msg)
-        url_normalized = normalize_url(url)
-
-        max_crawl_depth = int(actor_input.get('maxCrawlDepth', 1))
-        max_crawl_pages = int(actor_input.get('maxCrawlPages', 50))
-        crawler_type = actor_input.get('crawlerType', 'playwright:adaptive')
-
-        if run_id := Actor.config.actor_run_id:
-            if not (run := await Actor.apify_client.run(run_id).get()):
-                msg = 'Failed to get the actor run details!'
-                raise RuntimeError(msg)
-
-            if not (timeout_secs := run.get('options', {}).get('timeoutSecs')):
-                msg = 'Missing "timeoutSecs" attribute in actor run details!'
-                raise ValueError(msg)
-
-            # crawler timeout is set to timeout - MIN_GENERATOR_RUN_SECS or timeout if tha time is too low
-            timeout_crawler = timedelta(
-                seconds=(
-                    timeout_secs - MIN_GENERATOR_RUN_SECS
-                    if timeout_secs >= MIN_GENERATOR_RUN_SECS * 2
-                    else timeout_secs
-                )
-            )
-        # if run is local, do not set the timeout
-        else:
-            logger.warning('Running the actor locally, not setting the crawler timeout!')
-            timeout_crawler = None
-
-        # call apify/website-content-crawler actor to get the html content
-        logger.info(f'Starting the "apify/website-content-crawler" actor for URL: {url}')
-        await Actor.set_status_message('Starting the crawler...')
-        actor_run_details = await Actor.call(
-            'apify/website-content-crawler',
-            get_crawler_actor_config(
-                url, max_crawl_depth=max_crawl_depth, max_crawl_pages=max_crawl_pages, crawler_type=crawler_type
-            ),
-            # memory limit for the crawler actor so free tier can use this actor
-            memory_mbytes=2048,
-            wait=timedelta(seconds=LOG_POLL_INTERVAL_SECS),
-            timeout=timeout_crawler,
-        )
-        if actor_run_details is None:
-            msg = 'Failed to start the "apify/website-content-crawler" actor!'
-            raise RuntimeError(msg)
+async def wait_for_crawler_run(
+    run_client: RunClientAsync,
+    on_poll: Callable[[], Awaitable[object]] | None = None,
+    max_api_calls: int = DEFAULT_CRAWLER_MAX_API_CALLS,
+    status_prefix: str = '',
+) -> dict:
+    """Waits for the crawler run to reach a terminal status while propagating its status message.
 
-        run_client = Actor.apify_client.run(actor_run_details.id)
-        last_status_msg = None
-        while (run := await run_client.get()) and run.get('status') == 'RUNNING':
-            status_msg = run.get('statusMessage')
-            if status_msg != last_status_msg:
-                logger.info(f'Crawler status: {status_msg}')
-                if status_msg is not None:
-                    await Actor.set_status_message(status_msg)
-                last_status_msg = status_msg
-            await asyncio.sleep(LOG_POLL_INTERVAL_SECS)
-
-        if not (run := await run_client.wait_for_finish()):
-            msg = 'Failed to get the "apify/website-content-crawler" actor run details!'
-            raise RuntimeError(msg)
+    The run is long-polled, so the wait ends as soon as the run finishes. The wait is doubled after each poll
+    without any progress up to `CRAWLER_WAIT_MAX_SECS` and reset to `CRAWLER_WAIT_MIN_SECS` when the status
+    message changes or `on_poll` reports progress, so the status message stays responsive.
+
+    Once `max_api_calls` is reached, the rest of the run is awaited by a single blocking call. The status message,
+    `on_poll` and therefore the incremental processing and the overdue abort of the scheduler stop then,
+    the run is still bounded by the timeout it was started with.
+
+    :param run_client: Client of the `apify/website-content-crawler` actor run
+    :param on_poll: Called after each status poll while the crawler has not finished yet,
+        a truthy result means progress was made
+    :param max_api_calls: Maximum number of status polls, the last one waits until the run finishes
+    :param status_prefix: Prefix of the propagated status messages, distinguishes the sites in the batch mode
+    """
+    if max_api_calls < 1:
+        msg = 'The maximum number of crawler API calls must be at least 1!'
+        raise ValueError(msg)
+
+    last_status_msg = None
+    wait_secs = CRAWLER_WAIT_MIN_SECS
+    api_calls = 0
+    while True:
+        api_calls += 1
+        if api_calls >= max_api_calls:
+            if api_calls > 1:
+                logger.info(f'Reached {max_api_calls} crawler status polls, waiting for the crawler to finish...')
+            run = await run_client.wait_for_finish()
+            break
+        run = await run_client.wait_for_finish(wait_secs=wait_secs)
+        if not run or run.get('status') in TERMINAL_RUN_STATUSES:
+            break
+
+        progressed = False
         status_msg = run.get('statusMessage')
-        logger.info(f'Crawler status: {status_msg}')
-        await Actor.set_status_message('Crawler finished! Processing the results...')
-
-        run_store = run_client.key_value_store()
-        run_dataset = run_client.dataset()
-
-        hostname = urlparse(url).hostname
-        root_title = hostname
-
-        data: LLMSData = {'title': root_title, 'description': None, 'details': None, 'sections': {}}
-        sections = data['sections']
-
-        is_dataset_empty = True
-        path_titles: dict[str, str] = {}
-        sections_to_fill_title = []
-        async for item in run_dataset.iterate_items():
-            is_dataset_empty = False
-            if (item_url := item.get('url')) is None:
-                logger.warning('Missing "url" attribute in dataset item!')
-                continue
-            logger.info(f'Processing page: {item_url}')
-            if (html_url := item.get('htmlUrl')) is None:
-                logger.warning('Missing "htmlUrl" attribute in dataset item!')
-                continue
-
-            html = await get_html_from_kvstore(run_store, html_url)
-            metadata = item.get('metadata', {})
-            description = metadata.get('description') or (get_description_from_html(html) if html else None)
-            title = (get_h1_from_html(html) if html else None) or metadata.get('title')
-            path_titles[get_url_path(item_url)] = title
-
-            # handle input root url separately
-            is_root = normalize_url(item_url) == url_normalized
-            if is_root:
-                data['description'] = description if is_description_suitable(description) else None
-                continue
-
-            section_dir = get_url_path_dir(item_url)
-            section_title = path_titles.get(section_dir)
-            if section_dir not in sections:
-                sections[section_dir] = {'title': section_title or section_dir, 'links': []}
-                if section_title is None:
-                    sections_to_fill_title.append(section_dir)
-
-            sections[section_dir]['links'].append(
-                {
-                    'url': item_url,
-                    'title': title,
-                    'description': description if is_description_suitable(description) else None,
-                }
+        if status_msg != last_status_msg:
+            logger.info(f'{status_prefix}Crawler status: {status_msg}')
+            if status_msg is not None:
+                await Actor.set_status_message(f'{status_prefix}{status_msg}')
+            last_status_msg = status_msg
+            progressed = True
+        if on_poll is not None and await on_poll():
+            progressed = True
+        wait_secs = CRAWLER_WAIT_MIN_SECS if progressed else min(wait_secs * 2, CRAWLER_WAIT_MAX_SECS)
+
+    if not run:
+        msg = 'Failed to get the "apify/website-content-crawler" actor run details!'
+        raise RuntimeError(msg)
+    status_msg = run.get('statusMessage')
+    logger.info(f'{status_prefix}Crawler status: {status_msg} ({api_calls} status polls)')
+    return run
+
+
+async def get_run_deadline(apify_client: ApifyClientAsync) -> float | None:
+    """Returns the `time.monotonic` deadline of the actor run, None if the actor runs locally."""
+    if not (run_id := Actor.config.actor_run_id):
+        logger.warning('Running the actor locally, not limiting the crawler and processing time!')
+        return None
+
+    if not (run := await apify_client.run(run_id).get()):
+        msg = 'Failed to get the actor run details!'
+        raise RuntimeError(msg)
+
+    return get_run_deadline_from_details(run)
+
+
+async def start_crawler_run(
+    apify_client: ApifyClientAsync,
+    url: str,
+    options: GeneratorOptions,
+    crawler_deadline: float | None = None,
+    status_prefix: str = '',
+    start_urls: list[str] | None = None,
+) -> str:
+    """Starts the `apify/website-content-crawler` actor for the site and returns the ID of its run.
+
+    If the `start_urls` are provided, only these pages are crawled without following their links.
+    """
+    timeout_crawler_secs = None
+    if crawler_deadline is not None:
+        if (remaining_secs := crawler_deadline - time.monotonic()) <= 0:
+            msg = f'No time left to crawl the site "{url}"!'
+            raise RuntimeError(msg)
+        timeout_crawler_secs = max(int(remaining_secs), 1)
+
+    # call apify/website-content-crawler actor to get the html content
+    logger.info(f'Starting the "apify/website-content-crawler" actor for URL: {url}')
+    await Actor.set_status_message(f'{status_prefix}Starting the crawler...')
+    actor_run_details = await apify_client.actor('apify/website-content-crawler').call(
+        run_input=get_crawler_actor_config(
+            url,
+            max_crawl_depth=options.max_crawl_depth if start_urls is None else 0,
+            max_crawl_pages=options.max_crawl_pages,
+            crawler_type=options.crawler_type,
+            save_html=options.save_html,
+            start_urls=start_urls,
+        ),
+        # memory limit for the crawler actor so free tier can use this actor
+        memory_mbytes=CRAWLER_MEMORY_MBYTES,
+        wait_secs=LOG_POLL_INTERVAL_SECS,
+        timeout_secs=timeout_crawler_secs,
+    )
+    if actor_run_details is None:
+        msg = 'Failed to start the "apify/website-content-crawler" actor!'
+        raise RuntimeError(msg)
+
+    return str(actor_run_details['id'])
+
+
+async def process_crawler_run(
+    url: str,
+    options: GeneratorOptions,
+    builder: LLMSDataBuilder,
+    processor: ItemProcessor,
+    checkpoint: ProcessingCheckpoint,
+    *,
+    apify_client: ApifyClientAsync,
+    crawler_slots: asyncio.Semaphore,
+    scheduler: RunScheduler,
+    site: str = '',
+    status_prefix: str = '',
+    start_urls: list[str] | None = None,
+) -> None:
+    """Crawls the site with the `apify/website-content-crawler` actor and adds its dataset items to the builder.
+
+    The crawler timeout leaves the time for processing its items estimated by the scheduler. If the measured
+    throughput shows that the processing would not finish in time, the crawler is aborted earlier.
+    The progress is saved into the checkpoint on the platform events. If the checkpoint was restored,
+    its crawler run is processed from the restored dataset offset instead of starting a new run.
+    """
+    # the crawler produces at most this many items, the estimate is on the safe side
+    expected_items = len(start_urls) if start_urls is not None else options.max_crawl_pages
+    processed_items = 0
+    crawler_deadline = None
+    async with crawler_slots:
+        if checkpoint.run_id is None:
+            # the crawler gets its part of the time left for the crawlers of the pending sites
+            crawler_deadline = scheduler.start_crawler(site, expected_items)
+            checkpoint.run_id = await start_crawler_run(
+                apify_client, url, options, crawler_deadline, status_prefix, start_urls
             )
+            await checkpoint.save()
+        else:
+            scheduler.finish_site(site)
+            logger.info(
+                f'{status_prefix}Resuming the crawler run "{checkpoint.run_id}" from item {builder.items_count}'
+            )
+        run_client = apify_client.run(checkpoint.run_id)
+        processor.kvstore = run_client.key_value_store()
+        dataset = run_client.dataset()
+        if builder.contents is not None and builder.items_count:
+            # the contents are not saved in the checkpoint, they are read again from the processed items
+            await restore_page_contents(builder.contents, dataset, builder.items_count)
 
-        if is_dataset_empty:
-            msg = (
-                'No pages were crawled successfully!'
-                ' Please check the "apify/website-content-crawler" actor run for more details.'
+        async def process_items(limit: int | None = None) -> int:
+            nonlocal processed_items
+            started_at = time.monotonic()
+            processed = await process_dataset_items(
+                builder, dataset, processor, limit=limit, concurrency=options.fetch_concurrency
             )
-            raise RuntimeError(msg)
+            scheduler.record_processing(processed, time.monotonic() - started_at)
+            processed_items += processed
+            return processed
+
+        is_aborted = False
+
+        async def on_poll() -> bool:
+            nonlocal is_aborted
+            # items are processed in batches between the status polls, the rest is processed after the crawl
+            progressed = options.process_while_crawling and await process_items(INCREMENTAL_BATCH_SIZE) > 0
+            if not is_aborted and scheduler.is_crawler_overdue(
+                max(expected_items - processed_items, 0), crawler_deadline
+            ):
+                logger.warning(f'{status_prefix}Stopping the crawler to leave enough time for the processing')
+                await run_client.abort(gracefully=True)
+                is_aborted = True
+            return progressed
+
+        checkpoint.attach()
+        try:
+            with processor.metrics.stage('crawler'):
+                await wait_for_crawler_run(
+                    run_client, on_poll, max_api_calls=options.crawler_max_api_calls, status_prefix=status_prefix
+                )
+        except BaseException:
+            checkpoint.detach()
+            raise
+
+    # the slot is released once the crawler has finished, the next crawler runs while its results are processed
+    try:
+        await Actor.set_status_message(f'{status_prefix}Crawler finished! Processing the results...')
+        with processor.metrics.stage('processing'):
+            await process_items()
+    finally:
+        checkpoint.detach()
+
+
+async def crawl_site(
+    url: str,
+    options: GeneratorOptions,
+    builder: LLMSDataBuilder,
+    processor: ItemProcessor,
+    crawler_deadline: float | None = None,
+    status_prefix: str = '',
+    start_urls: list[str] | None = None,
+) -> None:
+    """Crawls the site with the built-in crawler and adds its pages to the builder while crawling.
+
+    If the `start_urls` are provided, only these pages are crawled without following their links.
+    """
+    logger.info(f'Starting the built-in crawler for URL: {url}')
+    await Actor.set_status_message(f'{status_prefix}Crawling the site...')
+    async with create_crawler_http_client(options.fetch_concurrency) as client:
+        crawler = HttpCrawler(
+            client,
+            url,
+            max_depth=options.max_crawl_depth,
+            max_pages=options.max_crawl_pages,
+            start_urls=start_urls,
+            concurrency=options.fetch_concurrency,
+            executor=processor.executor,
+            deadline=crawler_deadline,
+        )
+        with processor.metrics.stage('crawler'):
+            await process_crawled_pages(builder, crawler.iter_pages(), processor, options.fetch_concurrency)
+    processor.metrics.increment('crawlerRequests', crawler.requests_count)
+    processor.metrics.increment('crawlerFailedRequests', crawler.failed_count)
+    logger.info(f'{status_prefix}Crawler finished: {crawler.requests_count} requests, {crawler.failed_count} failed')
+
+
+async def report_processing(processor: ItemProcessor, store: KeyValueStore, key_suffix: str = '') -> None:
+    """Adds the counters of the partial fetcher and the deduplicator to the metrics and saves the duplicates report."""
+    metrics = processor.metrics
+    if (partial_fetcher := processor.partial_fetcher) is not None:
+        metrics.increment('htmlBytes', partial_fetcher.bytes_downloaded)
+        metrics.increment('partialFetchRequests', partial_fetcher.requests_count)
+        metrics.increment('partialFetchRangeIgnored', partial_fetcher.range_ignored_count)
+
+    if (dedup := processor.dedup) is not None:
+        metrics.increment('duplicateUrls', dedup.url_duplicates_count)
+        metrics.increment('duplicateContents', dedup.content_duplicates_count)
+        duplicates_key = f'{DUPLICATES_RECORD_KEY}{key_suffix}'
+        await store.set_value(duplicates_key, dedup.report)
+        logger.info(f'Collapsed {len(dedup.duplicates)} duplicate pages, see the "{duplicates_key}" record')
+
+
+async def save_site_caches(
+    url: str,
+    builder: LLMSDataBuilder,
+    cache_store: KeyValueStore | None,
+    cache: ExtractionCache | None,
+    sitemap_pages: dict[str, str | None],
+    metrics: RunMetrics,
+) -> None:
+    """Saves the extraction cache and the sitemap state of the site for the next runs, if the cache store is set."""
+    if cache_store is None:
+        return
+    if cache is not None:
+        metrics.increment('cacheHits', cache.hits)
+        metrics.increment('cacheMisses', cache.misses)
+        await cache.save(cache_store, get_cache_key(url))
+    if sitemap_pages:
+        await get_sitemap_state(builder, sitemap_pages).save(cache_store, get_sitemap_state_key(url))
+
+
+async def save_site_output(
+    url: str,
+    output: str,
+    builder: LLMSDataBuilder,
+    *,
+    store: KeyValueStore,
+    metrics: RunMetrics,
+    full_text: ShardedTextFile | None = None,
+    partial: bool = False,
+    key_suffix: str = '',
+    push_data: bool = True,
+) -> None:
+    """Saves the llms.txt of the site and its llms-full.txt if rendered into the key-value store and the dataset.
 
-        for section_dir in sections_to_fill_title:
-            sections[section_dir]['title'] = get_section_dir_title(section_dir, path_titles)
+    The files are always saved into the key-value store, the dataset item is not pushed if `push_data` is False.
+    """
+    # save into kv-store as a file to be able to download it
+    output_key = f'llms{key_suffix}.txt'
+    await store.set_value(output_key, output)
+    logger.info(f'Saved the "{output_key}" file into the key-value store!')
 
-        # move sections with less than SECTION_MIN_LINKS to the root
-        clean_llms_data(data)
-        output = render_llms_txt(data)
+    dataset_item = {'url': url, 'key': output_key, 'llms.txt': output, 'partial': partial}
+    if full_text is not None:
+        dataset_item['fullKey'] = await save_full_text(full_text, builder, store, metrics, key_suffix)
 
-        # save into kv-store as a file to be able to download it
+    if not push_data:
+        logger.info(f'The "{output_key}" file has not changed since the previous run, not pushing it to the dataset!')
+        return
+    await Actor.push_data(dataset_item)
+    logger.info(f'Pushed the "{output_key}" file to the dataset!')
+
+
+def check_output_changed(output: str, render_cache: SectionRenderCache | None, metrics: RunMetrics) -> bool:
+    """Returns if the output has changed since the previous run, it is always considered changed without the cache."""
+    if render_cache is None:
+        return True
+    output_changed = render_cache.is_output_changed(output)
+    metrics.increment('renderSectionsUnchanged', render_cache.hits)
+    metrics.increment('renderSectionsRendered', render_cache.misses)
+    metrics.increment('renderSectionsRemoved', render_cache.removed_count)
+    if not output_changed:
+        metrics.increment('outputUnchanged')
+    return output_changed
+
+
+def create_page_contents(options: GeneratorOptions) -> PageContents | None:
+    """Creates the storage of the page contents if the llms-full.txt is generated, None otherwise."""
+    if not options.llms_full_txt:
+        return None
+    # the contents of the pages are taken from the dataset items of the crawler
+    if options.is_builtin_crawler:
+        logger.warning('The built-in crawler does not save the page contents, not generating llms-full.txt!')
+        return None
+    return PageContents()
+
+
+async def save_full_text(
+    full_text: ShardedTextFile,
+    builder: LLMSDataBuilder,
+    store: KeyValueStore,
+    metrics: RunMetrics,
+    key_suffix: str = '',
+) -> str:
+    """Saves the rendered llms-full.txt into the key-value store and deletes its file, returns the key of the record."""
+    with metrics.stage('upload'):
+        full_keys = await save_llms_full_txt(store, full_text, builder.data, key_suffix)
+    full_text.close()
+    metrics.increment('llmsFullBytes', full_text.size)
+    logger.info(f'Saved the "{full_keys[0]}" file into the key-value store in {len(full_text.shards)} parts!')
+    return full_keys[0]
+
+
+def render_site(
+    builder: LLMSDataBuilder,
+    options: GeneratorOptions,
+    metrics: RunMetrics,
+    full_text: ShardedTextFile | None = None,
+    render_cache: SectionRenderCache | None = None,
+) -> str:
+    """Cleans the sections of the site and renders its llms.txt, the spilled sections are deleted afterwards.
+
+    The llms-full.txt is rendered into the `full_text` file if provided, the builder must store the contents then.
+    The sections not changed since the previous run are taken from the `render_cache` if provided.
+    """
+    with metrics.stage('clean'):
+        data = builder.build()
+        # the spilled sections are cleaned and rendered by streaming their links from the disk
+        if builder.spilled is not None:
+            if options.nested_sections:
+                builder.spilled.collapse_sparse_sections(SECTION_MIN_LINKS)
+            else:
+                builder.spilled.clean(SECTION_MIN_LINKS)
+        elif options.nested_sections:
+            # move sections with less than SECTION_MIN_LINKS to their parent section or the root
+            collapse_sparse_sections(data, SECTION_MIN_LINKS)
+        else:
+            # move sections with less than SECTION_MIN_LINKS to the root
+            clean_llms_data(data, SECTION_MIN_LINKS)
+    with metrics.stage('render'):
+        if builder.spilled is not None:
+            output = builder.spilled.render(data, render_cache)
+        else:
+            output = render_llms_txt(data, render_cache)
+    if full_text is not None and builder.contents is not None:
+        # the contents are streamed page by page from the disk to the disk
+        with metrics.stage('renderFull'):
+            for part in iter_llms_full_txt(data, builder.iter_sections(data), builder.contents, builder.url_normalized):
+                full_text.write(part)
+            full_text.finish()
+        metrics.increment('llmsFullPages', builder.contents.pages_count)
+    if builder.spilled is not None:
+        metrics.increment('spilledLinks', builder.links_count)
+    builder.close()
+    return output
+
+
+async def generate_llms_txt(
+    url: str,
+    options: GeneratorOptions,
+    *,
+    store: KeyValueStore,
+    crawler_slots: asyncio.Semaphore,
+    scheduler: RunScheduler | None = None,
+    executor: Executor | None = None,
+    http_client: httpx.AsyncClient | None = None,
+    apify_client: ApifyClientAsync | None = None,
+    key_suffix: str = '',
+    status_prefix: str = '',
+) -> RunMetrics:
+    """Crawls the site and saves its llms.txt into the `llms{key_suffix}.txt` record, returns the metrics of the site.
+
+    The crawler is started once it fits into the memory budget, its slot is released as soon as it finishes,
+    so the next crawler can run while the results of this one are being processed.
+
+    :param url: Start URL of the site
+    :param options: Options of the generation
+    :param store: Key-value store where the llms.txt and the metrics are saved
+    :param crawler_slots: Limits the number of the concurrently running crawlers
+    :param scheduler: Splits the run time between the crawler and the processing, the time is not limited if None
+    :param executor: Executor for the HTML parsing, parses on the event loop if None
+    :param http_client: HTTP client for the partial downloads of the HTML records, downloads whole records if None
+    :param apify_client: Client starting the crawler runs and reading their results, the client of the actor if None
+    :param key_suffix: Suffix of the record keys, distinguishes the sites in the batch mode
+    :param status_prefix: Prefix of the status messages, distinguishes the sites in the batch mode
+    """
+    metrics = RunMetrics()
+    if scheduler is None:
+        scheduler = RunScheduler(None)
+    contents = create_page_contents(options)
+    # the built-in crawler passes the HTML straight to the extraction, there are no HTML records
+    builder = LLMSDataBuilder(
+        url,
+        require_html=options.save_html and not options.is_builtin_crawler,
+        spill_threshold=options.spill_threshold_links,
+        contents=contents,
+    )
+    # pages served under several URLs are added only once
+    dedup = PageDeduplicator() if options.dedup_pages else None
+    # the built-in crawler has no crawler run to reattach to after a restart
+    checkpoint = None
+    if not options.is_builtin_crawler:
+        checkpoint = ProcessingCheckpoint(store, builder, f'{CHECKPOINT_RECORD_KEY}{key_suffix}', dedup)
+        await checkpoint.restore()
+    cache, cache_store, render_cache = None, None, None
+    if options.cache_store_name:
+        cache_store = await Actor.open_key_value_store(name=options.cache_store_name)
+        cache = await ExtractionCache.load(
+            cache_store,
+            get_cache_key(url),
+            max_entries=options.cache_max_entries,
+            max_age_runs=options.cache_max_age_runs,
+        )
+        render_cache = await SectionRenderCache.load(cache_store, get_render_cache_key(url))
+
+    # the pages not changed since the previous run are taken from the sitemap state instead of crawling them
+    sitemap_pages: dict[str, str | None] = {}
+    crawl_urls = None
+    unchanged_pages_count = 0
+    if options.discovery_mode == 'sitemap':
+        with metrics.stage('sitemap'):
+            async with create_sitemap_http_client() as sitemap_client:
+                sitemap_pages = await discover_sitemap_pages(sitemap_client, url)
+        if checkpoint is not None and checkpoint.is_restored:
+            # the unchanged pages were restored from the checkpoint together with the crawled ones
+            unchanged_pages_count = checkpoint.unchanged_pages_count
+        elif sitemap_pages:
+            sitemap_state = SitemapState()
+            # the llms-full.txt needs the contents of all the pages, so the unchanged pages are crawled as well
+            if cache_store is not None and contents is None:
+                sitemap_state = await SitemapState.load(cache_store, get_sitemap_state_key(url))
+            crawl_urls = add_unchanged_sitemap_pages(builder, sitemap_pages, sitemap_state)
+            unchanged_pages_count = len(sitemap_pages) - len(crawl_urls)
+            if checkpoint is not None:
+                checkpoint.unchanged_pages_count = unchanged_pages_count
+            metrics.increment('sitemapPages', len(sitemap_pages))
+            metrics.increment('sitemapUnchangedPages', unchanged_pages_count)
+        else:
+            logger.warning(f'No sitemap pages found under "{url}", crawling the site from the start URL!')
+
+    # only the leading part of the HTML records is downloaded and parsed while downloading
+    partial_fetcher = None
+    if http_client is not None and not options.is_builtin_crawler:
+        partial_fetcher = PartialHtmlFetcher(http_client, options.partial_fetch_window)
+    processor = ItemProcessor(
+        executor=executor,
+        cache=cache,
+        metrics=metrics,
+        policy=options.extraction_policy,
+        partial_fetcher=partial_fetcher,
+        dedup=dedup,
+        parser_backend=options.parser_backend,
+        # the processing stops in time to render and save the items processed so far
+        deadline=scheduler.processing_deadline,
+    )
+    if crawl_urls is not None and not crawl_urls:
+        logger.info(f'None of the {len(sitemap_pages)} sitemap pages has changed, skipping the crawler!')
+        scheduler.finish_site(key_suffix)
+    elif options.is_builtin_crawler:
+        await crawl_site(
+            url,
+            options,
+            builder,
+            processor,
+            crawler_deadline=scheduler.processing_deadline,
+            status_prefix=status_prefix,
+            start_urls=crawl_urls,
+        )
+    elif checkpoint is not None:
+        await process_crawler_run(
+            url,
+            options,
+            builder,
+            processor,
+            checkpoint,
+            apify_client=apify_client or Actor.apify_client,
+            crawler_slots=crawler_slots,
+            scheduler=scheduler,
+            site=key_suffix,
+            status_prefix=status_prefix,
+            start_urls=crawl_urls,
+        )
+
+    await report_processing(processor, store, key_suffix)
+
+    if processor.deadline_reached:
+        metrics.increment('partialOutput')
+        logger.warning(f'{status_prefix}Not all pages were processed before the deadline, the output is partial!')
+    elif builder.items_count == 0 and unchanged_pages_count == 0:
+        msg = (
+            'No pages were crawled successfully!'
+            ' Please check the "apify/website-content-crawler" actor run for more details.'
+        )
+        raise RuntimeError(msg)
+
+    await save_site_caches(url, builder, cache_store, cache, sitemap_pages, metrics)
+
+    full_text = ShardedTextFile(options.llms_full_max_file_bytes) if contents is not None else None
+    output = render_site(builder, options, metrics, full_text, render_cache)
+    output_changed = check_output_changed(output, render_cache, metrics)
+    # every run has a new default key-value store, so the files are always saved and only the dataset item is skipped,
+    # the llms-full.txt is not covered by the output hash, its item is always pushed
+    await save_site_output(
+        url,
+        output,
+        builder,
+        store=store,
+        metrics=metrics,
+        full_text=full_text,
+        partial=processor.deadline_reached,
+        key_suffix=key_suffix,
+        push_data=output_changed or not options.skip_unchanged_output or full_text is not None,
+    )
+    # saved only once the output is, so a failed save does not make the next runs skip the output
+    if render_cache is not None and cache_store is not None:
+        await render_cache.save(cache_store, get_render_cache_key(url), output)
+
+    if checkpoint is not None:
+        await checkpoint.delete()
+
+    metrics_key = f'{METRICS_RECORD_KEY}{key_suffix}'
+    await store.set_value(metrics_key, metrics.to_dict())
+    logger.info(f'Saved the "{metrics_key}" record into the key-value store: {metrics.summary()}')
+    return metrics
+
+
+def get_site_key_suffixes(urls: list[str]) -> list[str]:
+    """Returns the unique record key suffixes of the sites in the batch mode, e.g. `-example.com-docs`."""
+    suffixes: list[str] = []
+    for url in urls:
+        suffix = base_suffix = f'-{get_url_key_slug(url)}'
+        index = 1
+        while suffix in suffixes:
+            index += 1
+            suffix = f'{base_suffix}-{index}'
+        suffixes.append(suffix)
+    return suffixes
+
+
+async def main(actor_input: dict | None = None, apify_client: ApifyClientAsync | None = None) -> None:
+    """Main entry point for the llms.txt generator actor.
+
+    :param actor_input: Input of the actor, read from the actor run if None
+    :param apify_client: Client of the Apify API used for the crawler runs, the client of the actor if None,
+        e.g. a stand-in serving a recorded crawler run
+    """
+    async with Actor:
+        if actor_input is None:
+            actor_input = await Actor.get_input()
+        if apify_client is None:
+            apify_client = Actor.apify_client
+        if not (urls := get_start_urls(actor_input)):
+            msg = 'Missing "startUrl" attribute in input!'
+            raise ValueError(msg)
+        # batch mode saves the outputs of the sites under distinct keys, even if there is a single site
+        is_batch = bool(actor_input.get('startUrls'))
+
+        options = GeneratorOptions.from_input(actor_input)
+        # the parser backend is selected once, not by a self-benchmark for each site of the batch
+        options = options._replace(parser_backend=resolve_parser_backend(options.parser_backend))
+        # the crawlers get the run time that is left after the estimated processing of their results,
+        # in the batch mode it is split between the sites by their key suffixes
+        key_suffixes = get_site_key_suffixes(urls)
+        scheduler = RunScheduler(
+            await get_run_deadline(apify_client),
+            sites=key_suffixes if is_batch else (),
+            max_concurrent_crawlers=options.max_concurrent_crawlers,
+        )
         store = await Actor.open_key_value_store()
-        await store.set_value('llms.txt', output)
-        logger.info('Saved the "llms.txt" file into the key-value store!')
+        # each crawler run takes CRAWLER_MEMORY_MBYTES of the memory budget
+        crawler_slots = asyncio.Semaphore(options.max_concurrent_crawlers)
 
-        await Actor.push_data({'llms.txt': output})
-        logger.info('Pushed the "llms.txt" file to the dataset!')
+        # HTML records are prefetched and parsed concurrently while the items are processed in the dataset order
+        parser_executor = create_parser_executor(
+            options.parser_executor_mode, options.parser_workers, Actor.config.memory_mbytes
+        )
+        http_client = (
+            create_records_http_client(Actor.config.token, options.fetch_concurrency)
+            if options.partial_html_fetch
+            else None
+        )
+        generate = partial(
+            generate_llms_txt,
+            options=options,
+            store=store,
+            crawler_slots=crawler_slots,
+            scheduler=scheduler,
+            executor=parser_executor,
+            http_client=http_client,
+            apify_client=apify_client,
+        )
+        # the processing of the sites is profiled only if enabled, the dumps are saved as the key-value store records
+        profiler = create_run_profiler(
+            store,
+            cpu=options.profile_cpu,
+            memory=options.profile_memory,
+            memory_interval_secs=options.profile_memory_interval_secs,
+        )
+        async with profiler:
+            try:
+                if not is_batch:
+                    metrics = await generate(urls[0])
+                    partial_note = ' The output is partial, the run time was not enough to process all pages!'
+                    await Actor.set_status_message(
+                        'Finished! Saved the "llms.txt" file into the key-value store and dataset...'
+                        f' ({metrics.summary()})' + (partial_note if metrics.counters.get('partialOutput') else '')
+                    )
+                    return
+
+                logger.info(
+                    f'Generating llms.txt for {len(urls)} sites, {options.max_concurrent_crawlers} crawlers at once'
+                )
 
-        await Actor.set_status_message('Finished! Saved the "llms.txt" file into the key-value store and dataset...')
+                async def generate_site(url: str, key_suffix: str) -> RunMetrics:
+                    try:
+                        return await generate(url, key_suffix=key_suffix, status_prefix=f'[{key_suffix[1:]}] ')
+                    finally:
+                        # a failed site does not hold the crawler time of the other sites
+                        scheduler.finish_site(key_suffix)
+
+                results = await asyncio.gather(
+                    *(generate_site(url, key_suffix) for url, key_suffix in zip(urls, key_suffixes)),
+                    return_exceptions=True,
+                )
+            finally:
+                if parser_executor is not None:
+                    parser_executor.shutdown(cancel_futures=True)
+                if http_client is not None:
+                    await http_client.aclose()
+
+        failed_urls = []
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                logger.error(f'Failed to generate llms.txt for "{url}": {result}')
+                await Actor.push_data({'url': url, 'error': str(result)})
+                failed_urls.append(url)
+        if len(failed_urls) == len(urls):
+            msg = 'Failed to generate llms.txt for all the sites!'
+            raise RuntimeError(msg)
+
+        await Actor.set_status_message(
+            f'Finished! Saved {len(urls) - len(failed_urls)} llms.txt files into the key-value store and dataset'
+            + (f', {len(failed_urls)} sites failed: {", ".join(failed_urls)}' if failed_urls else '...')
+        )
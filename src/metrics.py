@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import bisect
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+METRICS_RECORD_KEY = 'METRICS'
+
+# upper bounds of the histogram buckets in milliseconds, the last bucket is unbounded
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """Histogram of durations in milliseconds with fixed buckets."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        """Adds the duration to the histogram."""
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def to_dict(self) -> dict:
+        """Returns the histogram as a JSON serializable dictionary."""
+        buckets = {f'le_{bound}ms': count for bound, count in zip(HISTOGRAM_BUCKETS_MS, self.counts)}
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avgMs': round(self.total_ms / self.count, 3) if self.count else None,
+            'maxMs': round(self.max_ms, 3),
+            'buckets': buckets,
+        }
+
+
+class RunMetrics:
+    """Timings and counters of the stages of the actor run, saved as the `METRICS` record."""
+
+    def __init__(self) -> None:
+        self.stage_secs: dict[str, float] = defaultdict(float)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.histograms: dict[str, Histogram] = defaultdict(Histogram)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measures the wall time of the stage, repeated stages with the same name are summed."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_secs[name] += time.perf_counter() - start
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Adds the duration of the block into the histogram of the given name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histograms[name].observe((time.perf_counter() - start) * 1000)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increments the counter of the given name."""
+        self.counters[name] += value
+
+    def to_dict(self) -> dict:
+        """Returns the metrics as a JSON serializable dictionary."""
+        return {
+            'stageSecs': {name: round(secs, 3) for name, secs in self.stage_secs.items()},
+            'counters': dict(self.counters),
+            'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+        }
+
+    def summary(self) -> str:
+        """Returns a short human readable summary of the metrics for the status message."""
+        stages = ', '.join(f'{name} {secs:.1f} s' for name, secs in self.stage_secs.items())
+        counters = ', '.join(f'{name} {value}' for name, value in self.counters.items())
+        return '; '.join(part for part in (stages, counters) if part)
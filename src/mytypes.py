@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import TypedDict
+import sys
+from typing import Any, TypedDict
 
 
 class LinkDict(TypedDict):
@@ -15,7 +16,7 @@ class SectionDict(TypedDict):
     """Dictionary representing a single section in the `llms.txt` file."""
 
     title: str
-    links: list[LinkDict]
+    links: list[LinkDict | LinkRecord]
 
 
 class LLMSData(TypedDict):
@@ -24,4 +25,85 @@ class LLMSData(TypedDict):
     title: str
     description: str | None
     details: str | None
-    sections: dict[str, SectionDict]
+    sections: dict[str, SectionDict | SectionRecord]
+
+
+def split_url_origin(url: str) -> tuple[str, str]:
+    """Splits the URL into the scheme and host part and the rest starting with the path."""
+    host_start = url.find('://')
+    path_start = url.find('/', host_start + 3 if host_start >= 0 else 0)
+    if path_start == -1:
+        return url, ''
+    return url[:path_start], url[path_start:]
+
+
+class LinkRecord:
+    """Memory compact alternative to `LinkDict` used for large sites.
+
+    The scheme and host part of the URL is interned, so it is stored only once for all links of the site.
+    Supports the item access of `LinkDict`, so it can be used wherever the dictionary is read.
+    """
+
+    __slots__ = ('description', 'origin', 'path', 'title')
+
+    def __init__(self, url: str, title: str, description: str | None) -> None:
+        origin, path = split_url_origin(url)
+        self.origin = sys.intern(origin)
+        self.path = path
+        self.title = title
+        self.description = description
+
+    @property
+    def url(self) -> str:
+        """Full URL of the link."""
+        return self.origin + self.path
+
+    def __getitem__(self, key: str) -> Any:
+        """Returns the attribute of the link like `LinkDict` item access."""
+        if key not in LinkDict.__annotations__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns the attribute of the link like `dict.get`."""
+        return getattr(self, key) if key in LinkDict.__annotations__ else default
+
+    def to_dict(self) -> LinkDict:
+        """Converts the link into the `LinkDict`."""
+        return {'url': self.url, 'title': self.title, 'description': self.description}
+
+
+class SectionRecord:
+    """Memory compact alternative to `SectionDict` holding `LinkRecord` links.
+
+    Supports the item access of `SectionDict`, so it can be used wherever the dictionary is read.
+    """
+
+    __slots__ = ('links', 'title')
+
+    def __init__(self, title: str, links: list[LinkDict | LinkRecord] | None = None) -> None:
+        self.title = title
+        self.links: list[LinkDict | LinkRecord] = links if links is not None else []
+
+    def __getitem__(self, key: str) -> Any:
+        """Returns the attribute of the section like `SectionDict` item access."""
+        if key not in SectionDict.__annotations__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        """Sets the attribute of the section like `SectionDict` item assignment."""
+        if key not in SectionDict.__annotations__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns the attribute of the section like `dict.get`."""
+        return getattr(self, key) if key in SectionDict.__annotations__ else default
+
+    def to_dict(self) -> SectionDict:
+        """Converts the section and its links into the `SectionDict`."""
+        return {
+            'title': self.title,
+            'links': [link.to_dict() if isinstance(link, LinkRecord) else link for link in self.links],
+        }
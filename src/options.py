@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from src.cache import DEFAULT_CACHE_MAX_AGE_RUNS, DEFAULT_CACHE_MAX_ENTRIES
+from src.fulltext import DEFAULT_LLMS_FULL_MAX_FILE_MBYTES
+from src.http_crawler import BUILTIN_CRAWLER_TYPE
+from src.parsers import DEFAULT_PARSER_BACKEND, PARSER_BACKENDS
+from src.partial_fetch import DEFAULT_PARTIAL_FETCH_WINDOW
+from src.pipeline import (
+    DEFAULT_EXTRACTION_POLICY,
+    DEFAULT_FETCH_CONCURRENCY,
+    DEFAULT_PARSER_EXECUTOR_MODE,
+    EXTRACTION_POLICIES,
+)
+from src.profiling import DEFAULT_MEMORY_PROFILE_INTERVAL_SECS
+
+# memory of each crawler run, low enough for the free tier
+CRAWLER_MEMORY_MBYTES = 2048
+DEFAULT_CRAWLER_MAX_API_CALLS = 1000
+# crawl follows the links from the start URL, sitemap crawls only the new and changed pages of the sitemaps
+DISCOVERY_MODES = ('crawl', 'sitemap')
+
+
+class GeneratorOptions(NamedTuple):
+    """Options of the llms.txt generation shared by all the sites of the actor run."""
+
+    max_crawl_depth: int = 1
+    max_crawl_pages: int = 50
+    crawler_type: str = 'playwright:adaptive'
+    discovery_mode: str = 'crawl'
+    crawler_max_api_calls: int = DEFAULT_CRAWLER_MAX_API_CALLS
+    memory_budget_mbytes: int = CRAWLER_MEMORY_MBYTES
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY
+    parser_executor_mode: str = DEFAULT_PARSER_EXECUTOR_MODE
+    parser_workers: int | None = None
+    parser_backend: str = DEFAULT_PARSER_BACKEND
+    process_while_crawling: bool = False
+    nested_sections: bool = False
+    cache_store_name: str | None = None
+    cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES
+    cache_max_age_runs: int = DEFAULT_CACHE_MAX_AGE_RUNS
+    skip_unchanged_output: bool = False
+    partial_html_fetch: bool = False
+    partial_fetch_window: int = DEFAULT_PARTIAL_FETCH_WINDOW
+    extraction_policy: str = DEFAULT_EXTRACTION_POLICY
+    dedup_pages: bool = False
+    spill_threshold_links: int | None = None
+    llms_full_txt: bool = False
+    llms_full_max_file_bytes: int = DEFAULT_LLMS_FULL_MAX_FILE_MBYTES * 1024 * 1024
+    profile_cpu: bool = False
+    profile_memory: bool = False
+    profile_memory_interval_secs: float = DEFAULT_MEMORY_PROFILE_INTERVAL_SECS
+
+    @classmethod
+    def from_input(cls, actor_input: dict) -> GeneratorOptions:
+        """Reads the options from the actor input, the missing ones get their default values."""
+        options = cls(
+            max_crawl_depth=int(actor_input.get('maxCrawlDepth', 1)),
+            max_crawl_pages=int(actor_input.get('maxCrawlPages', 50)),
+            crawler_type=actor_input.get('crawlerType', 'playwright:adaptive'),
+            discovery_mode=actor_input.get('discoveryMode', 'crawl'),
+            crawler_max_api_calls=int(actor_input.get('crawlerMaxApiCalls', DEFAULT_CRAWLER_MAX_API_CALLS)),
+            memory_budget_mbytes=int(actor_input.get('crawlerMemoryBudgetMbytes', CRAWLER_MEMORY_MBYTES)),
+            fetch_concurrency=int(actor_input.get('htmlFetchConcurrency', DEFAULT_FETCH_CONCURRENCY)),
+            parser_executor_mode=actor_input.get('htmlParserExecutor', DEFAULT_PARSER_EXECUTOR_MODE),
+            parser_workers=int(actor_input.get('htmlParserWorkers', 0)) or None,
+            parser_backend=actor_input.get('htmlParserBackend', DEFAULT_PARSER_BACKEND),
+            process_while_crawling=bool(actor_input.get('processWhileCrawling', False)),
+            nested_sections=bool(actor_input.get('nestedSections', False)),
+            cache_store_name=actor_input.get('cacheStoreName') or None,
+            cache_max_entries=int(actor_input.get('cacheMaxEntries', DEFAULT_CACHE_MAX_ENTRIES)),
+            cache_max_age_runs=int(actor_input.get('cacheMaxAgeRuns', DEFAULT_CACHE_MAX_AGE_RUNS)),
+            skip_unchanged_output=bool(actor_input.get('skipUnchangedOutput', False)),
+            partial_html_fetch=bool(actor_input.get('partialHtmlFetch', False)),
+            partial_fetch_window=int(
+                actor_input.get('partialHtmlFetchWindowKb', DEFAULT_PARTIAL_FETCH_WINDOW // 1024) * 1024
+            ),
+            extraction_policy=actor_input.get('extractionPolicy', DEFAULT_EXTRACTION_POLICY),
+            dedup_pages=bool(actor_input.get('dedupPages', False)),
+            spill_threshold_links=int(actor_input.get('spillThresholdLinks', 0)) or None,
+            llms_full_txt=bool(actor_input.get('llmsFullTxt', False)),
+            # 0 was the unlimited size before, which held the whole file in memory
+            llms_full_max_file_bytes=int(
+                (actor_input.get('llmsFullMaxFileMbytes') or DEFAULT_LLMS_FULL_MAX_FILE_MBYTES) * 1024 * 1024
+            ),
+            profile_cpu=bool(actor_input.get('profileCpu', False)),
+            profile_memory=bool(actor_input.get('profileMemory', False)),
+            profile_memory_interval_secs=float(
+                actor_input.get('profileMemoryIntervalSecs', DEFAULT_MEMORY_PROFILE_INTERVAL_SECS)
+            ),
+        )
+        if options.extraction_policy not in EXTRACTION_POLICIES:
+            msg = f'Invalid "extractionPolicy" input, use one of {", ".join(EXTRACTION_POLICIES)}!'
+            raise ValueError(msg)
+        if options.parser_backend not in PARSER_BACKENDS:
+            msg = f'Invalid "htmlParserBackend" input, use one of {", ".join(PARSER_BACKENDS)}!'
+            raise ValueError(msg)
+        if options.llms_full_max_file_bytes <= 0:
+            msg = 'The "llmsFullMaxFileMbytes" input has to be positive!'
+            raise ValueError(msg)
+        if options.discovery_mode not in DISCOVERY_MODES:
+            msg = f'Invalid "discoveryMode" input, use one of {", ".join(DISCOVERY_MODES)}!'
+            raise ValueError(msg)
+        return options
+
+    @property
+    def save_html(self) -> bool:
+        """Whether the crawler has to store the HTML files, they are not needed if only the metadata is used."""
+        return self.extraction_policy != 'metadata-only'
+
+    @property
+    def is_builtin_crawler(self) -> bool:
+        """Whether the site is crawled in the actor process instead of by the `apify/website-content-crawler` actor."""
+        return self.crawler_type == BUILTIN_CRAWLER_TYPE
+
+    @property
+    def max_concurrent_crawlers(self) -> int:
+        """Number of the crawler runs fitting into the memory budget at the same time, at least one."""
+        return max(1, self.memory_budget_mbytes // CRAWLER_MEMORY_MBYTES)
+
+
+def get_start_urls(actor_input: dict) -> list[str]:
+    """Returns the start URLs of the sites from the `startUrl` and `startUrls` inputs without duplicates.
+
+    The `startUrls` items may be plain strings or the request objects with the `url` attribute.
+    """
+    urls = [actor_input['startUrl']] if actor_input.get('startUrl') else []
+    for start_url in actor_input.get('startUrls') or []:
+        url = start_url.get('url') if isinstance(start_url, dict) else start_url
+        if url:
+            urls.append(url)
+    return list(dict.fromkeys(urls))
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import logging
+import time
+from functools import cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+import bs4
+
+from src.extractor import HtmlMetadata, extract_html_metadata
+from src.helpers import get_description_from_soup, get_h1_from_soup
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger('apify')
+
+# stdlib is the streaming parser stopping at the metadata, the others build the whole document tree,
+# auto benchmarks the available backends at startup and uses the fastest conforming one
+PARSER_BACKENDS = ('auto', 'stdlib', 'bs4', 'bs4-lxml', 'lexbor')
+DEFAULT_PARSER_BACKEND = 'stdlib'
+# optional packages the backends need, installed with the `parsers` extra of the project
+PARSER_BACKEND_PACKAGES = {'bs4-lxml': 'lxml', 'lexbor': 'selectolax'}
+# number of the document sections of the self-benchmark pages, about 20 KiB each
+BENCHMARK_PAGE_SECTIONS = 200
+BENCHMARK_REPEAT = 3
+
+# well-formed documents every backend extracts the same metadata from as the stdlib parser
+WELL_FORMED_CORPUS = (
+    '',
+    '<h1>Example</h1>',
+    '<h1>Example</h1><h1>Example 2</h1>',
+    '<h2>Example</h2>',
+    '<div><h1>Example</h1></div>',
+    '<html><head><meta name="description" content="testdesc"></head><body></body></html>',
+    '<html><head><meta name="Description" content="testdec"></head><body></body></html>',
+    '<html><head></head><body></body></html>',
+    '<meta name="Description" content="upper"><meta name="description" content="lower">',
+    '<meta name="description" content="first"><meta name="description" content="second">',
+    '<meta name="description"><h1>No content</h1>',
+    '<meta name="description" content><h1>Empty content</h1>',
+    '<meta name="description" content=""><h1>Empty string content</h1>',
+    '<meta name="DESCRIPTION" content="ignored"><meta property="og:description" content="ignored">',
+    '<meta name="description" content="Tom &amp; Jerry &quot;cartoon&quot; &#8211; &eacute;">',
+    '<h1>Hello <span>nested <b>world</b></span>!</h1>',
+    '<h1>Line<br>break<br/>here<img src="x"/></h1>',
+    '<h1>Title<meta name="description" content="inside"/> rest</h1>',
+    '<h1>Fish &amp; chips &#8211; &lt;menu&gt;</h1>',
+    '<h1></h1><h1>Second</h1>',
+    '<h1 class="title" id="main">  Spaced   title  </h1>',
+    '<H1>Uppercase</H1><META NAME="description" CONTENT="Upper tags">',
+    '<!-- <h1>Comment</h1> --><h1>Real</h1>',
+    '<script>document.write("<h1>Script</h1>")</script><h1>Real</h1>',
+    '<h1>Multi\nline\ntitle</h1><meta name="description" content="Multi\nline">',
+    '<body><h1>Body first</h1><meta name="description" content="In body"></body>',
+    '<h1>A<noscript>N</noscript>B</h1>',
+    '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Doc</title>'
+    '<meta name="description" content="Žluťoučký kůň 🐎"></head>'
+    '<body><header><nav><a href="/">Home</a></nav></header><main><article><h1>Getting <code>started</code></h1>'
+    '<p>Text</p></article></main></body></html>',
+)
+# broken markup common on real sites, the backends building the tree the HTML5 way close the h1 elsewhere
+# or keep other text than BeautifulSoup with html.parser, which the stdlib parser matches
+BROKEN_MARKUP_CORPUS = (
+    '<h1>Unclosed heading<p>paragraph',
+    '<div><h1>Implicitly closed</div><p>after</p>',
+    '<h1>Outer<h1>Inner</h1>tail</h1>',
+    '<h1>Title</p> more</h1>',
+    '<h1>A</span>B</h1>',
+    '<h1>A</br>B</h1>',
+    '<p><h1>A</p>B</h1>',
+    '<div><h1>A</b></div>B',
+    '<h1>A<p>B</div>C</h1>D',
+    '<h1>A<b>B</h1>C</b>D',
+    '<h1>A<script>x = "<b>";</script>B<style>p {}</style>C</h1>',
+    '<h1>A<template><b>T</b>U</template>B</h1>',
+    '<template><h1>Hidden</h1></template><meta name="description" content="after">',
+    '<h1>A<script>unclosed</h1>B',
+    '<h1>A<!--c-->B<![CDATA[x]]>C</h1>',
+)
+# documents the `auto` backend has to extract the same metadata from as the stdlib parser,
+# so the selected backend does not change the output on any site
+PARSER_CONFORMANCE_CORPUS = WELL_FORMED_CORPUS + BROKEN_MARKUP_CORPUS
+
+
+def extract_with_bs4(html: str) -> HtmlMetadata:
+    """Extracts the first h1 text and the meta description with BeautifulSoup and the stdlib `html.parser`."""
+    return _extract_from_soup(bs4.BeautifulSoup(html, 'html.parser'))
+
+
+def extract_with_bs4_lxml(html: str) -> HtmlMetadata:
+    """Extracts the first h1 text and the meta description with BeautifulSoup and the lxml parser."""
+    return _extract_from_soup(bs4.BeautifulSoup(html, 'lxml'))
+
+
+def extract_with_lexbor(html: str) -> HtmlMetadata:
+    """Extracts the first h1 text and the meta description with the lexbor parser of selectolax."""
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    h1 = tree.css_first('h1')
+    title = h1.text(deep=True) if h1 is not None else None
+    # meta name="description" always wins over meta name="Description", the same as in `HtmlMetadataParser`
+    descriptions: dict[str, str | None] = {}
+    for meta in tree.css('meta[name]'):
+        attributes = meta.attributes
+        if (name := attributes.get('name')) in {'description', 'Description'} and name not in descriptions:
+            # attribute without a value is an empty string in BeautifulSoup
+            descriptions[name] = (attributes['content'] or '') if 'content' in attributes else None
+    description = descriptions['description'] if 'description' in descriptions else descriptions.get('Description')
+    return HtmlMetadata(title=title, description=description)
+
+
+def _extract_from_soup(soup: bs4.BeautifulSoup) -> HtmlMetadata:
+    return HtmlMetadata(title=get_h1_from_soup(soup), description=get_description_from_soup(soup))
+
+
+# the functions are picklable, so they can be sent to the process pool workers
+_BACKEND_FUNCTIONS: dict[str, Callable[[str], HtmlMetadata]] = {
+    'stdlib': extract_html_metadata,
+    'bs4': extract_with_bs4,
+    'bs4-lxml': extract_with_bs4_lxml,
+    'lexbor': extract_with_lexbor,
+}
+
+
+def is_parser_backend_available(backend: str) -> bool:
+    """Checks if the optional package needed by the parser backend is installed."""
+    return (package := PARSER_BACKEND_PACKAGES.get(backend)) is None or find_spec(package) is not None
+
+
+def get_available_parser_backends() -> list[str]:
+    """Returns the parser backends that can be used in this environment, without `auto`."""
+    return [backend for backend in _BACKEND_FUNCTIONS if is_parser_backend_available(backend)]
+
+
+def resolve_parser_backend(backend: str) -> str:
+    """Returns the name of the parser backend to use, `auto` is resolved by the self-benchmark.
+
+    :param backend: One of `PARSER_BACKENDS`, `auto` runs the self-benchmark once per process
+    """
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f'Invalid HTML parser backend "{backend}", use one of {", ".join(PARSER_BACKENDS)}!')
+    if backend == 'auto':
+        return select_parser_backend()
+    if not is_parser_backend_available(backend):
+        raise ValueError(
+            f'HTML parser backend "{backend}" needs the "{PARSER_BACKEND_PACKAGES[backend]}" package to be installed!'
+        )
+    return backend
+
+
+def get_parser_backend(backend: str) -> Callable[[str], HtmlMetadata]:
+    """Returns the function extracting the `HtmlMetadata` from the HTML content with the parser backend."""
+    return _BACKEND_FUNCTIONS[resolve_parser_backend(backend)]
+
+
+def check_parser_backend(backend: str) -> list[str]:
+    """Returns the documents of the conformance corpus the backend extracts different metadata from than stdlib."""
+    extract = _BACKEND_FUNCTIONS[backend]
+    return [html for html in PARSER_CONFORMANCE_CORPUS if extract(html) != extract_html_metadata(html)]
+
+
+def make_benchmark_pages(sections: int = BENCHMARK_PAGE_SECTIONS) -> list[str]:
+    """Creates the documentation-like pages of the self-benchmark.
+
+    One page has the metadata at the top, where the streaming parser stops early, the other has no description,
+    so the whole page has to be parsed by all the backends.
+    """
+    body = ''.join(
+        f'<div class="section"><h2>Section {i}</h2><p>Lorem <a href="/page{i}">ipsum</a> dolor sit amet, '
+        f'consectetur <code>adipiscing</code> elit.</p></div>'
+        for i in range(sections)
+    )
+    head = '<head><title>Page</title><meta name="viewport" content="width=device-width"></head>'
+    page = f'<html>{head}<body><nav><a href="/">Home</a></nav><main><h1>Page title</h1>{body}</main></body></html>'
+    return [page.replace('</title>', '</title><meta name="description" content="Page description">'), page]
+
+
+def benchmark_parser_backend(backend: str, pages: list[str], repeat: int = BENCHMARK_REPEAT) -> float:
+    """Returns the best time in seconds the backend takes to extract the metadata from all the pages."""
+    extract = _BACKEND_FUNCTIONS[backend]
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for page in pages:
+            extract(page)
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+@cache
+def select_parser_backend() -> str:
+    """Returns the fastest of the available parser backends conforming to the stdlib parser.
+
+    The result is cached, the benchmark runs at most once per process.
+    """
+    pages = make_benchmark_pages()
+    timings: dict[str, float] = {}
+    for backend in get_available_parser_backends():
+        if mismatches := check_parser_backend(backend):
+            logger.info(f'HTML parser backend "{backend}" does not conform on {len(mismatches)} documents, skipping')
+            continue
+        timings[backend] = benchmark_parser_backend(backend, pages)
+    backend = min(timings, key=timings.__getitem__)
+    timings_summary = ', '.join(f'{name} {secs * 1000:.1f} ms' for name, secs in timings.items())
+    logger.info(f'Selected the "{backend}" HTML parser backend ({timings_summary})')
+    return backend
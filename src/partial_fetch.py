@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import codecs
+import logging
+from typing import TYPE_CHECKING
+
+import httpx
+
+from src.extractor import HtmlMetadataParser
+
+if TYPE_CHECKING:
+    from src.extractor import HtmlMetadata
+
+logger = logging.getLogger('apify')
+
+# the h1 and the meta description are almost always in the first few tens of KiB of the page
+DEFAULT_PARTIAL_FETCH_WINDOW = 32 * 1024
+# the window is doubled for each next request up to this size
+MAX_PARTIAL_FETCH_WINDOW = 1024 * 1024
+# pages without the meta description are never complete, the rest is then read by a single request
+MAX_PARTIAL_FETCH_WINDOWS = 4
+PARTIAL_FETCH_TIMEOUT_SECS = 30
+
+
+def create_records_http_client(token: str | None = None, max_connections: int = 10) -> httpx.AsyncClient:
+    """Creates the HTTP client with pooled connections for the partial downloads of the HTML records.
+
+    :param token: Apify API token used to read the records of the private key-value stores
+    :param max_connections: Maximum number of the open connections
+    """
+    headers = {'Authorization': f'Bearer {token}'} if token else None
+    return httpx.AsyncClient(
+        headers=headers,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=PARTIAL_FETCH_TIMEOUT_SECS,
+        # large records may be redirected to the storage backend
+        follow_redirects=True,
+    )
+
+
+class PartialHtmlFetcher:
+    """Extracts the metadata of the HTML records by downloading only their leading part.
+
+    The records are requested with a `Range` header, starting with the `initial_window` bytes and widening
+    the window until the parser has found the h1 and the meta name="description" or "Description",
+    or the whole record is read.
+    After `max_windows` requests the whole rest of the record is requested at once.
+    Backends ignoring the range requests send the whole record, it is streamed and the download is stopped
+    as soon as the parser is complete.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        initial_window: int = DEFAULT_PARTIAL_FETCH_WINDOW,
+        max_window: int = MAX_PARTIAL_FETCH_WINDOW,
+        max_windows: int = MAX_PARTIAL_FETCH_WINDOWS,
+    ) -> None:
+        """Creates the fetcher.
+
+        :param client: HTTP client used for the requests, should be authorized to read the records
+        :param initial_window: Number of bytes requested first
+        :param max_window: Maximum number of bytes requested at once
+        :param max_windows: Maximum number of the windows requested before the rest of the record is requested
+        """
+        if initial_window < 1:
+            raise ValueError('The partial fetch window must be at least 1 byte!')
+        if max_windows < 1:
+            raise ValueError('The partial fetch must request at least 1 window!')
+        self.client = client
+        self.initial_window = initial_window
+        self.max_window = max(max_window, initial_window)
+        self.max_windows = max_windows
+        self.bytes_downloaded = 0
+        self.requests_count = 0
+        self.range_ignored_count = 0
+
+    async def fetch_metadata(self, html_url: str) -> HtmlMetadata | None:
+        """Downloads the leading part of the HTML record and returns its metadata, None if the download failed."""
+        # downloading the rest of the record for a meta name="description" after the "Description" is not worth it
+        parser = HtmlMetadataParser(stop_at_fallback_description=True)
+        decoder: codecs.IncrementalDecoder | None = None
+        offset = 0
+        window = self.initial_window
+        windows_count = 0
+        is_eof = False
+        while not is_eof and not parser.is_complete:
+            # the last request asks for the whole rest of the record
+            is_last = windows_count >= self.max_windows
+            end = '' if is_last else offset + window - 1
+            # compressed responses cannot be split into byte ranges of the record
+            headers = {'Range': f'bytes={offset}-{end}', 'Accept-Encoding': 'identity'}
+            windows_count += 1
+            self.requests_count += 1
+            async with self.client.stream('GET', html_url, headers=headers) as response:
+                # range starting at the end of the record, e.g. an empty record
+                if response.status_code == 416:  # noqa: PLR2004
+                    break
+                if response.is_error:
+                    logger.warning(f'Failed to get record "{html_url}", status code {response.status_code}!')
+                    return None
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(response.charset_encoding or 'utf-8')(errors='replace')
+
+                if response.status_code == 206:  # noqa: PLR2004
+                    received = await self._read(response, parser, decoder)
+                    offset += received
+                    total = _get_content_range_total(response)
+                    is_eof = is_last or received < window or (total is not None and offset >= total)
+                else:
+                    # the whole record is sent from the start, the already parsed part is skipped
+                    self.range_ignored_count += 1
+                    await self._read(response, parser, decoder, skip=offset)
+                    is_eof = True
+            window = min(window * 2, self.max_window)
+
+        if decoder is not None:
+            parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+        return parser.metadata
+
+    async def _read(
+        self, response: httpx.Response, parser: HtmlMetadataParser, decoder: codecs.IncrementalDecoder, skip: int = 0
+    ) -> int:
+        """Feeds the parser with the response body until it is complete, returns the number of bytes read."""
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            self.bytes_downloaded += len(chunk)
+            if received <= skip:
+                continue
+            parser.feed(decoder.decode(chunk[max(0, skip - received + len(chunk)) :]))
+            if parser.is_complete:
+                # leaving the stream unread closes the connection instead of downloading the rest
+                break
+        return received
+
+
+def _get_content_range_total(response: httpx.Response) -> int | None:
+    """Returns the total size of the record from the `Content-Range: bytes start-end/total` header."""
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import aclosing
+from typing import TYPE_CHECKING, TypeVar
+
+from src.cache import get_content_hash
+from src.extractor import extract_html_metadata
+from src.helpers import get_html_from_kvstore, is_description_suitable
+from src.metrics import RunMetrics
+from src.parsers import get_parser_backend
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+
+    from apify_client.clients import DatasetClientAsync, KeyValueStoreClientAsync
+
+    from src.builder import LLMSDataBuilder
+    from src.cache import ExtractionCache
+    from src.dedup import PageDeduplicator
+    from src.extractor import HtmlMetadata
+    from src.http_crawler import CrawledPage
+    from src.partial_fetch import PartialHtmlFetcher
+
+logger = logging.getLogger('apify')
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# number of HTML records downloaded ahead of the currently processed dataset item
+DEFAULT_FETCH_CONCURRENCY = 10
+
+# inline parses on the event loop, thread and process parse in the executor of that type
+PARSER_EXECUTOR_MODES = ('inline', 'thread', 'process')
+DEFAULT_PARSER_EXECUTOR_MODE = 'process'
+# the platform allocates one CPU core per this much memory of the actor, `os.cpu_count` reports the host CPUs
+MEMORY_MBYTES_PER_CPU = 4096
+# number of the parser workers when the memory of the actor is not known
+DEFAULT_PARSER_WORKERS = 2
+
+# html-first always parses the HTML, metadata-first only when the dataset item metadata is not sufficient,
+# metadata-only never downloads the HTML
+EXTRACTION_POLICIES = ('html-first', 'metadata-first', 'metadata-only')
+DEFAULT_EXTRACTION_POLICY = 'html-first'
+
+
+def get_default_parser_workers(memory_mbytes: int | None = None) -> int:
+    """Returns the number of the parser workers matching the CPU share of the actor.
+
+    :param memory_mbytes: Memory of the actor, `DEFAULT_PARSER_WORKERS` are used if not known
+    """
+    if not memory_mbytes:
+        return DEFAULT_PARSER_WORKERS
+    return max(1, min(memory_mbytes // MEMORY_MBYTES_PER_CPU, os.cpu_count() or 1))
+
+
+def create_parser_executor(
+    mode: str = DEFAULT_PARSER_EXECUTOR_MODE, workers: int | None = None, memory_mbytes: int | None = None
+) -> Executor | None:
+    """Creates the executor for the HTML parsing stage, returns None for inline parsing.
+
+    :param mode: One of `PARSER_EXECUTOR_MODES`
+    :param workers: Number of worker threads or processes, defaults to the CPU share of the actor memory
+    :param memory_mbytes: Memory of the actor the default number of workers is derived from
+    """
+    if mode not in PARSER_EXECUTOR_MODES:
+        raise ValueError(f'Invalid HTML parser executor mode "{mode}", use one of {", ".join(PARSER_EXECUTOR_MODES)}!')
+    if mode == 'inline':
+        return None
+
+    workers = workers or get_default_parser_workers(memory_mbytes)
+    if mode == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='html-parser')
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+async def iter_ordered(
+    items: AsyncIterator[T], func: Callable[[T], Awaitable[R]], concurrency: int
+) -> AsyncGenerator[tuple[T, R]]:
+    """Yields items together with the result of `func` for each of them in the original order.
+
+    Up to `concurrency` items are processed ahead of the item that is being consumed by the caller.
+    The items are not read any further until the oldest result is consumed, so the number
+    of in-flight tasks and buffered results never exceeds the limit.
+    """
+    if concurrency < 1:
+        raise ValueError('The pipeline concurrency must be at least 1!')
+
+    pending: deque[tuple[T, asyncio.Task[R]]] = deque()
+    try:
+        async for item in items:
+            pending.append((item, asyncio.ensure_future(func(item))))
+            if len(pending) >= concurrency:
+                head_item, head_task = pending.popleft()
+                yield head_item, await head_task
+
+        while pending:
+            head_item, head_task = pending.popleft()
+            yield head_item, await head_task
+    finally:
+        # the consumer stopped early or failed, do not leave the prefetched tasks running
+        for _, task in pending:
+            task.cancel()
+
+
+async def fetch_item_html(kvstore: KeyValueStoreClientAsync, item: dict) -> str | None:
+    """Downloads the HTML content of the dataset item, returns None if the item is not valid."""
+    if item.get('url') is None or (html_url := item.get('htmlUrl')) is None:
+        return None
+    return await get_html_from_kvstore(kvstore, html_url)
+
+
+def is_item_metadata_sufficient(item: dict) -> bool:
+    """Checks if the metadata of the dataset item has the title and a suitable description of the page."""
+    metadata = item.get('metadata') or {}
+    return bool(metadata.get('title')) and is_description_suitable(metadata.get('description'))
+
+
+async def parse_html(
+    html: str,
+    executor: Executor | None = None,
+    extract: Callable[[str], HtmlMetadata] = extract_html_metadata,
+) -> HtmlMetadata:
+    """Extracts the metadata from the HTML content, in the executor if provided.
+
+    :param html: HTML content of the page
+    :param executor: Executor for the parsing, parses on the event loop if None
+    :param extract: Extraction function of the parser backend, see `get_parser_backend`
+    """
+    if executor is None:
+        return extract(html)
+    return await asyncio.get_running_loop().run_in_executor(executor, extract, html)
+
+
+class ItemProcessor:
+    """Downloads the HTML content of the dataset items and extracts their metadata."""
+
+    def __init__(
+        self,
+        kvstore: KeyValueStoreClientAsync | None = None,
+        executor: Executor | None = None,
+        cache: ExtractionCache | None = None,
+        metrics: RunMetrics | None = None,
+        policy: str = DEFAULT_EXTRACTION_POLICY,
+        partial_fetcher: PartialHtmlFetcher | None = None,
+        dedup: PageDeduplicator | None = None,
+        parser_backend: str = 'stdlib',
+        deadline: float | None = None,
+    ) -> None:
+        """Creates the processor.
+
+        :param kvstore: Key-value store client of the crawler run with the HTML records,
+            not needed for the pages of the built-in crawler
+        :param executor: Executor for the HTML parsing, parses on the event loop if None
+        :param cache: Cache of the metadata extracted in the previous runs
+        :param metrics: Metrics of the run to record the fetch and parse timings into
+        :param policy: One of `EXTRACTION_POLICIES`, decides which items need their HTML content
+        :param partial_fetcher: Downloads only the leading part of the HTML records if provided,
+            the metadata are extracted while downloading and the cache is not used then
+        :param dedup: Deduplicator of the pages, the duplicates are not downloaded or parsed if possible
+        :param parser_backend: One of `PARSER_BACKENDS` used for the parsing of the whole HTML content,
+            the partial fetcher always uses the streaming stdlib parser
+        :param deadline: The `time.monotonic` time the processing stops at, the rest of the items is not processed
+        """
+        if policy not in EXTRACTION_POLICIES:
+            raise ValueError(f'Invalid extraction policy "{policy}", use one of {", ".join(EXTRACTION_POLICIES)}!')
+        self.policy = policy
+        self.kvstore = kvstore
+        self.executor = executor
+        self.cache = cache
+        self.metrics = metrics or RunMetrics()
+        self.partial_fetcher = partial_fetcher
+        self.dedup = dedup
+        self.extract_metadata = get_parser_backend(parser_backend)
+        self.deadline = deadline
+        # set once the processing was stopped at the deadline, the output is partial then
+        self.deadline_reached = False
+
+    async def __call__(self, item: dict) -> HtmlMetadata | None:
+        """Returns the metadata of the dataset item, None if the item has no valid HTML content.
+
+        If the cache is provided, the metadata of the pages with unchanged content are taken from it instead.
+        The items that do not need the HTML content according to the extraction policy are not downloaded.
+        """
+        if not self.needs_html(item):
+            self.metrics.increment('htmlSkipped')
+            return None
+        if self.partial_fetcher is not None:
+            return await self.fetch_partial(item)
+        if self.kvstore is None:
+            return None
+        with self.metrics.timer('kvFetchMs'):
+            html = await fetch_item_html(self.kvstore, item)
+        if not html:
+            return None
+        return await self.extract(item['url'], html)
+
+    async def extract(self, url: str, html: str) -> HtmlMetadata | None:
+        """Extracts the metadata of the page, taken from the cache if its content has not changed.
+
+        Returns None without parsing if the deduplicator knows an accepted page with the same content.
+        """
+        self.metrics.increment('htmlBytes', len(html.encode()))
+        if self.cache is None and self.dedup is None:
+            return await self.parse(html)
+
+        content_hash = get_content_hash(html)
+        if self.dedup is not None and self.dedup.check_content(url, content_hash):
+            return None
+        if self.cache is None:
+            return await self.parse(html)
+        if (html_metadata := self.cache.get(url, content_hash)) is None:
+            html_metadata = await self.parse(html)
+            self.cache.put(url, content_hash, html_metadata)
+        return html_metadata
+
+    def check_deadline(self) -> bool:
+        """Checks if the deadline has passed, no more items may be added to the builder then."""
+        if self.deadline is None or self.deadline_reached or time.monotonic() < self.deadline:
+            return self.deadline_reached
+        logger.warning('Reached the processing deadline, the rest of the items will not be processed!')
+        self.deadline_reached = True
+        return True
+
+    def needs_html(self, item: dict) -> bool:
+        """Checks if the HTML content of the item has to be downloaded according to the extraction policy."""
+        if self.policy == 'metadata-only':
+            return False
+        return self.policy == 'html-first' or not is_item_metadata_sufficient(item)
+
+    async def fetch_partial(self, item: dict) -> HtmlMetadata | None:
+        """Extracts the metadata while downloading only the leading part of the HTML record of the item."""
+        if self.partial_fetcher is None or item.get('url') is None or (html_url := item.get('htmlUrl')) is None:
+            return None
+        with self.metrics.timer('kvFetchMs'):
+            return await self.partial_fetcher.fetch_metadata(html_url)
+
+    async def parse(self, html: str) -> HtmlMetadata:
+        """Extracts the metadata from the HTML content, in the executor if provided."""
+        with self.metrics.timer('parseMs'):
+            return await parse_html(html, self.executor, self.extract_metadata)
+
+
+async def process_dataset_items(
+    builder: LLMSDataBuilder,
+    dataset: DatasetClientAsync,
+    processor: ItemProcessor,
+    limit: int | None = None,
+    concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+) -> int:
+    """Adds the dataset items that were not added to the builder yet, returns the number of added items.
+
+    The builder counts every item it has seen, so its count is used as the dataset offset.
+    This makes it possible to process a dataset that is still being filled by a running crawler.
+
+    :param builder: Builder of the LLMS data
+    :param dataset: Dataset client of the crawler run
+    :param processor: Processor downloading and parsing the HTML content of the items
+    :param limit: Maximum number of items to add, adds all currently available items if None
+    :param concurrency: Maximum number of pages downloaded or parsed at the same time
+    """
+    offset = builder.items_count
+    dedup = processor.dedup
+    items = _mark_duplicates(
+        dataset.iterate_items(offset=offset, limit=limit),
+        lambda item: dedup is not None and dedup.is_duplicate_item(item),
+    )
+
+    async def process(entry: tuple[dict, bool]) -> HtmlMetadata | None:
+        item, is_duplicate = entry
+        return None if is_duplicate else await processor(item)
+
+    async with aclosing(iter_ordered(items, process, concurrency)) as results:
+        async for (item, is_duplicate), html_metadata in results:
+            if processor.check_deadline():
+                break
+            if dedup is not None and is_duplicate:
+                dedup.commit(item.get('url', ''))
+                builder.skip_item()
+            elif dedup is not None and not dedup.accept_content(item.get('url', '')):
+                builder.skip_item()
+            else:
+                builder.add_item(item, html_metadata)
+    processed = builder.items_count - offset
+    processor.metrics.increment('datasetItems', processed)
+    return processed
+
+
+async def process_crawled_pages(
+    builder: LLMSDataBuilder,
+    pages: AsyncIterator[CrawledPage],
+    processor: ItemProcessor,
+    concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+) -> int:
+    """Adds the pages of the built-in crawler to the builder as they are crawled, returns the number of added pages.
+
+    :param builder: Builder of the LLMS data, must not require the `htmlUrl` of the items
+    :param pages: Pages yielded by the built-in crawler
+    :param processor: Processor extracting the metadata of the pages
+    :param concurrency: Maximum number of pages parsed at the same time
+    """
+    offset = builder.items_count
+    dedup = processor.dedup
+    marked_pages = _mark_duplicates(pages, lambda page: dedup is not None and dedup.is_duplicate_url(page.url))
+
+    async def extract(entry: tuple[CrawledPage, bool]) -> HtmlMetadata | None:
+        page, is_duplicate = entry
+        return None if is_duplicate else await processor.extract(page.url, page.html)
+
+    async with aclosing(iter_ordered(marked_pages, extract, concurrency)) as results:
+        async for (page, is_duplicate), html_metadata in results:
+            if processor.check_deadline():
+                break
+            if dedup is not None and is_duplicate:
+                dedup.commit(page.url)
+                builder.skip_item()
+            elif dedup is not None and not dedup.accept_content(page.url):
+                builder.skip_item()
+            else:
+                builder.add_item({'url': page.url}, html_metadata)
+    processed = builder.items_count - offset
+    processor.metrics.increment('crawledPages', processed)
+    return processed
+
+
+async def _mark_duplicates(items: AsyncIterator[T], is_duplicate: Callable[[T], bool]) -> AsyncIterator[tuple[T, bool]]:
+    """Yields the items with the flag whether they are duplicates, checked in the original order."""
+    async for item in items:
+        yield item, is_duplicate(item)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import asynccontextmanager, nullcontext
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable
+    from contextlib import AbstractAsyncContextManager
+
+    from apify.storages import KeyValueStore
+
+logger = logging.getLogger('apify')
+
+# cProfile stats in the `marshal` format of `pstats`, e.g. `python -m pstats CPU_PROFILE` or snakeviz open them
+CPU_PROFILE_RECORD_KEY = 'CPU_PROFILE'
+# JSON with the top allocations of the periodic tracemalloc snapshots
+MEMORY_PROFILE_RECORD_KEY = 'MEMORY_PROFILE'
+# the last tracemalloc snapshot, loaded by `tracemalloc.Snapshot.load`
+MEMORY_SNAPSHOT_RECORD_KEY = 'MEMORY_SNAPSHOT'
+DEFAULT_MEMORY_PROFILE_INTERVAL_SECS = 30
+# source lines with the largest allocations listed in each snapshot
+MEMORY_PROFILE_TOP_LINES = 25
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+
+def get_memory_profile_entry(snapshot: tracemalloc.Snapshot, started_at: float) -> dict:
+    """Returns the JSON serializable summary of the snapshot with its top allocations by the source line."""
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    statistics = snapshot.statistics('lineno')
+    return {
+        'elapsedSecs': round(time.monotonic() - started_at, 3),
+        'tracedBytes': current_bytes,
+        'peakBytes': peak_bytes,
+        'top': [
+            {'line': str(statistic.traceback), 'sizeBytes': statistic.size, 'count': statistic.count}
+            for statistic in statistics[:MEMORY_PROFILE_TOP_LINES]
+        ],
+    }
+
+
+def take_memory_snapshot() -> tracemalloc.Snapshot:
+    """Takes the snapshot of the traced allocations without the allocations of tracemalloc itself."""
+    own_traces = tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__)
+    return tracemalloc.take_snapshot().filter_traces([own_traces])
+
+
+def dump_to_bytes(dump: Callable[[str], None]) -> bytes:
+    """Returns the dump of the profiler, the standard library writes them only into files."""
+    with tempfile.TemporaryDirectory(prefix='llms-profile-') as directory:
+        path = os.path.join(directory, 'dump')
+        dump(path)
+        with open(path, 'rb') as file:
+            return file.read()
+
+
+async def _snapshot_periodically(entries: list[dict], interval_secs: float, started_at: float) -> None:
+    while True:
+        await asyncio.sleep(interval_secs)
+        entries.append(get_memory_profile_entry(take_memory_snapshot(), started_at))
+
+
+@asynccontextmanager
+async def profile_run(
+    store: KeyValueStore,
+    *,
+    cpu: bool = True,
+    memory: bool = False,
+    memory_interval_secs: float = DEFAULT_MEMORY_PROFILE_INTERVAL_SECS,
+) -> AsyncIterator[None]:
+    """Profiles the block with cProfile and tracemalloc, the dumps are saved into the key-value store afterwards.
+
+    Only the code running in the thread of the event loop is profiled by cProfile, the HTML parsing in the pool
+    workers is not. The allocations are traced in all the threads of the process.
+
+    :param store: Key-value store where the dumps are saved, even if the block raises
+    :param cpu: Profiles the CPU time with cProfile into the `CPU_PROFILE` record
+    :param memory: Traces the allocations and snapshots them periodically into the `MEMORY_PROFILE` record
+    :param memory_interval_secs: Interval between the memory snapshots
+    """
+    started_at = time.monotonic()
+    profiler = cProfile.Profile() if cpu else None
+    memory_entries: list[dict] = []
+    snapshot_task = None
+    # the tracing started by the user, e.g. by the PYTHONTRACEMALLOC environment variable, is not stopped
+    stop_tracing = memory and not tracemalloc.is_tracing()
+    if memory:
+        if stop_tracing:
+            tracemalloc.start()
+        snapshot_task = asyncio.create_task(_snapshot_periodically(memory_entries, memory_interval_secs, started_at))
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        snapshot = None
+        if snapshot_task is not None:
+            snapshot_task.cancel()
+            snapshot = take_memory_snapshot()
+            memory_entries.append(get_memory_profile_entry(snapshot, started_at))
+        if stop_tracing:
+            tracemalloc.stop()
+        await save_profiles(store, profiler, memory_entries, snapshot)
+
+
+async def save_profiles(
+    store: KeyValueStore,
+    profiler: cProfile.Profile | None,
+    memory_entries: list[dict],
+    snapshot: tracemalloc.Snapshot | None,
+) -> None:
+    """Saves the cProfile stats, the memory profile and the last memory snapshot into the key-value store."""
+    if profiler is not None:
+        cpu_profile = dump_to_bytes(profiler.dump_stats)
+        await store.set_value(CPU_PROFILE_RECORD_KEY, cpu_profile, content_type=BINARY_CONTENT_TYPE)
+        logger.info(f'Saved the "{CPU_PROFILE_RECORD_KEY}" cProfile stats into the key-value store!')
+    if snapshot is not None:
+        memory_snapshot = dump_to_bytes(snapshot.dump)
+        await store.set_value(MEMORY_SNAPSHOT_RECORD_KEY, memory_snapshot, content_type=BINARY_CONTENT_TYPE)
+        await store.set_value(MEMORY_PROFILE_RECORD_KEY, {'snapshots': memory_entries})
+        peak_mbytes = max(entry['peakBytes'] for entry in memory_entries) / 1024 / 1024
+        logger.info(
+            f'Saved the "{MEMORY_PROFILE_RECORD_KEY}" record with {len(memory_entries)} snapshots'
+            f' into the key-value store, peak traced memory {peak_mbytes:.1f} MB!'
+        )
+
+
+def create_run_profiler(
+    store: KeyValueStore,
+    *,
+    cpu: bool = False,
+    memory: bool = False,
+    memory_interval_secs: float = DEFAULT_MEMORY_PROFILE_INTERVAL_SECS,
+) -> AbstractAsyncContextManager[None]:
+    """Returns the context manager profiling the block, nothing is profiled nor hooked if both profilers are off."""
+    if not cpu and not memory:
+        return nullcontext()
+    return profile_run(store, cpu=cpu, memory=memory, memory_interval_secs=memory_interval_secs)
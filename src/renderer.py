@@ -1,9 +1,19 @@
-from src.mytypes import LLMSData
+from __future__ import annotations
 
+from typing import TYPE_CHECKING
 
-def render_llms_txt(data: LLMSData) -> str:
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from src.cache import SectionRenderCache
+    from src.mytypes import LinkDict, LinkRecord, LLMSData
+
+
+def render_llms_txt(data: LLMSData, cache: SectionRenderCache | None = None) -> str:
     """Generates llms.txt file from the provided data.
 
+    The sections not changed since the previous run are taken from the `cache` if provided.
+
     Example data:
     {
         'title': 'Example',
@@ -30,6 +40,15 @@ def render_llms_txt(data: LLMSData) -> str:
     - [Example](https://example.com): Example description
 
     """
+    result = [render_llms_txt_header(data)]
+    for section_dir in sorted(data.get('sections', {})):
+        section = data['sections'][section_dir]
+        result.append(render_section(section['title'], section.get('links', []), cache))
+    return ''.join(result)
+
+
+def render_llms_txt_header(data: LLMSData) -> str:
+    """Generates the title, description and details part of the llms.txt file."""
     result = [f"# {data['title'].strip()}\n\n"]
 
     if description := data.get('description'):
@@ -38,14 +57,23 @@ def render_llms_txt(data: LLMSData) -> str:
     if details := data.get('details'):
         result.append(f'{details.strip()}\n\n')
 
-    for section_dir in sorted(data.get('sections', {})):
-        section = data['sections'][section_dir]
-        result.append(f"## {section['title'].strip()}\n\n")
-        for link in section.get('links', []):
-            link_str = f"- [{link['title'].strip()}]({link['url'].strip()})"
-            if link_description := link.get('description'):
-                link_str += f': {link_description.strip()}'
-            result.append(f'{link_str}\n')
-        result.append('\n')
+    return ''.join(result)
 
+
+def render_llms_txt_section(title: str, links: Iterable[LinkDict | LinkRecord]) -> str:
+    """Generates a single section of the llms.txt file with its links."""
+    result = [f'## {title.strip()}\n\n']
+    for link in links:
+        link_str = f"- [{link['title'].strip()}]({link['url'].strip()})"
+        if link_description := link.get('description'):
+            link_str += f': {link_description.strip()}'
+        result.append(f'{link_str}\n')
+    result.append('\n')
     return ''.join(result)
+
+
+def render_section(title: str, links: Iterable[LinkDict | LinkRecord], cache: SectionRenderCache | None = None) -> str:
+    """Generates a single section of the llms.txt file, or takes it from the `cache` if it has not changed."""
+    if cache is None:
+        return render_llms_txt_section(title, links)
+    return cache.render_section(title, links)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import math
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# time reserved after the processing for cleaning, rendering and saving the output
+OUTPUT_RESERVE_SECS = 15
+# wall time of processing a dataset item assumed until enough items are measured, most of it is the download
+DEFAULT_ITEM_PROCESSING_SECS = 0.02
+# items that have to be processed before their measured throughput replaces the default
+MIN_MEASURED_ITEMS = 50
+# the processing estimate is multiplied by this to absorb the variance of the throughput
+PROCESSING_SAFETY_FACTOR = 1.5
+# part of the run time the crawlers get at least, however long the processing is estimated to take
+MIN_CRAWLER_TIME_SHARE = 0.5
+
+
+def get_run_deadline_from_details(run: dict) -> float:
+    """Returns the `time.monotonic` deadline of the actor run from its `startedAt` and `timeoutSecs` details.
+
+    The deadline is counted from the start of the run, so a migrated or resumed run keeps its original deadline.
+    """
+    if not (timeout_secs := run.get('options', {}).get('timeoutSecs')):
+        msg = 'Missing "timeoutSecs" attribute in actor run details!'
+        raise ValueError(msg)
+    if not (started_at := run.get('startedAt')):
+        msg = 'Missing "startedAt" attribute in actor run details!'
+        raise ValueError(msg)
+    # the API client parses the dates, the raw API returns them as ISO strings
+    if isinstance(started_at, str):
+        started_at = datetime.fromisoformat(started_at.replace('Z', '+00:00'))
+    elapsed_secs = (datetime.now(timezone.utc) - started_at).total_seconds()
+    return time.monotonic() + float(timeout_secs) - max(elapsed_secs, 0.0)
+
+
+class RunScheduler:
+    """Splits the remaining time of the actor run between the crawlers and the processing of their results.
+
+    The processing time of a site is estimated from the number of its dataset items and the throughput measured
+    on the items processed so far. The crawler gets the time that is left after the estimated processing,
+    the processing stops at the processing deadline, so the output can always be rendered and saved in time.
+
+    In the batch mode, the crawlers share the run deadline. The time left for the crawling is split between
+    the starting crawler and the sites still waiting for a crawler slot, so the first crawlers cannot take
+    the time of the later ones.
+    """
+
+    def __init__(
+        self,
+        run_deadline: float | None,
+        item_processing_secs: float = DEFAULT_ITEM_PROCESSING_SECS,
+        sites: Iterable[str] = (),
+        max_concurrent_crawlers: int = 1,
+    ) -> None:
+        """Creates the scheduler.
+
+        :param run_deadline: The `time.monotonic` deadline of the actor run, the time is not limited if None
+        :param item_processing_secs: Processing time of an item assumed until the throughput is measured
+        :param sites: Keys of the sites whose crawlers have not started yet
+        :param max_concurrent_crawlers: Maximum number of the crawlers running at the same time
+        """
+        self.run_deadline = run_deadline
+        self.started_at = time.monotonic()
+        self.default_item_processing_secs = item_processing_secs
+        self.measured_items = 0
+        self.measured_secs = 0.0
+        self.pending_sites = set(sites)
+        self.max_concurrent_crawlers = max(max_concurrent_crawlers, 1)
+
+    @property
+    def item_processing_secs(self) -> float:
+        """Wall time of processing a dataset item, measured once enough items were processed."""
+        if self.measured_items < MIN_MEASURED_ITEMS:
+            return self.default_item_processing_secs
+        return self.measured_secs / self.measured_items
+
+    @property
+    def processing_deadline(self) -> float | None:
+        """The `time.monotonic` time the processing has to stop at to save the output before the run times out."""
+        if self.run_deadline is None:
+            return None
+        return self.run_deadline - OUTPUT_RESERVE_SECS
+
+    def record_processing(self, items_count: int, secs: float) -> None:
+        """Adds the processed items and their wall time to the measured throughput."""
+        self.measured_items += items_count
+        self.measured_secs += secs
+
+    def estimate_processing_secs(self, items_count: int) -> float:
+        """Estimates the time of processing the items, including the safety margin."""
+        return items_count * self.item_processing_secs * PROCESSING_SAFETY_FACTOR
+
+    def get_crawler_deadline(self, items_count: int) -> float | None:
+        """Returns the `time.monotonic` deadline of a crawler leaving enough time for processing its items.
+
+        :param items_count: Number of the items the crawler is expected to produce and that are not processed yet
+        """
+        if (processing_deadline := self.processing_deadline) is None:
+            return None
+        # the processing of a huge site would not leave any time for the crawling, the output is partial then
+        min_deadline = self.started_at + (processing_deadline - self.started_at) * MIN_CRAWLER_TIME_SHARE
+        return max(processing_deadline - self.estimate_processing_secs(items_count), min_deadline)
+
+    def start_crawler(self, site: str, items_count: int) -> float | None:
+        """Returns the `time.monotonic` deadline of the crawler of the site starting now.
+
+        The crawlers of the pending sites run in waves of `max_concurrent_crawlers`, the starting crawler
+        gets its wave's part of the time left until the deadline from `get_crawler_deadline`.
+
+        :param site: Key of the site, it is no longer pending
+        :param items_count: Number of the items the crawler is expected to produce
+        """
+        self.finish_site(site)
+        if (crawler_deadline := self.get_crawler_deadline(items_count)) is None:
+            return None
+        waves = math.ceil((len(self.pending_sites) + 1) / self.max_concurrent_crawlers)
+        now = time.monotonic()
+        return now + max(crawler_deadline - now, 0.0) / waves
+
+    def finish_site(self, site: str) -> None:
+        """Removes the site from the pending ones, once its crawler started or it needs no crawler."""
+        self.pending_sites.discard(site)
+
+    def is_crawler_overdue(self, items_count: int, crawler_deadline: float | None = None) -> bool:
+        """Checks if the crawler has to be stopped to process its items in time with the current throughput.
+
+        :param items_count: Number of the items the crawler is expected to produce and that are not processed yet
+        :param crawler_deadline: Deadline the crawler got from `start_crawler`, the crawler is overdue after it
+        """
+        deadlines = [
+            deadline for deadline in (self.get_crawler_deadline(items_count), crawler_deadline) if deadline is not None
+        ]
+        return bool(deadlines) and time.monotonic() >= min(deadlines)
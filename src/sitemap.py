@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import logging
+import zlib
+from collections import deque
+from typing import TYPE_CHECKING, NamedTuple, cast
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import XMLPullParser
+
+import httpx
+
+from src.cache import get_content_hash
+from src.helpers import parse_url
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+    from xml.etree.ElementTree import Element
+
+    from apify.storages import KeyValueStore
+
+    from src.builder import LLMSDataBuilder
+
+logger = logging.getLogger('apify')
+
+# maximum number of the sitemap documents read for a single site, protects against the huge or cyclic indexes
+DEFAULT_MAX_SITEMAPS = 1000
+SITEMAP_TIMEOUT_SECS = 30
+SITEMAP_USER_AGENT = 'Mozilla/5.0 (compatible; llms.txt generator)'
+# the gzipped sitemaps are detected by their first bytes
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class SitemapUrl(NamedTuple):
+    """Page URL listed in a sitemap with its last modification date if known."""
+
+    loc: str
+    lastmod: str | None
+
+
+def create_sitemap_http_client() -> httpx.AsyncClient:
+    """Creates the HTTP client for the sitemaps of the crawled sites, it must not carry the Apify API token."""
+    return httpx.AsyncClient(
+        headers={'User-Agent': SITEMAP_USER_AGENT}, timeout=SITEMAP_TIMEOUT_SECS, follow_redirects=True
+    )
+
+
+def _local_name(tag: str) -> str:
+    """Returns the XML tag without its namespace."""
+    return tag.rpartition('}')[2]
+
+
+class _SitemapParser:
+    """Incremental parser of the sitemap and sitemap index documents.
+
+    The parsed elements are dropped right away, so the memory does not grow with the size of the document.
+    """
+
+    def __init__(self) -> None:
+        self._parser: XMLPullParser[Element] = XMLPullParser(events=('start', 'end'))
+        self._root: Element | None = None
+
+    def feed(self, data: bytes) -> list[tuple[str, str, str | None]]:
+        """Feeds the next chunk of the document and returns the `(kind, loc, lastmod)` entries completed by it.
+
+        The kind is `sitemap` for the entries of a sitemap index and `url` for the pages of a sitemap.
+        """
+        self._parser.feed(data)
+        entries = []
+        # only the start and end events with the elements are requested
+        for event, element in cast('Iterator[tuple[str, Element]]', self._parser.read_events()):
+            if event == 'start':
+                if self._root is None:
+                    self._root = element
+                continue
+            kind = _local_name(element.tag)
+            if kind not in {'url', 'sitemap'}:
+                continue
+            loc, lastmod = None, None
+            for child in element:
+                name = _local_name(child.tag)
+                if name == 'loc':
+                    loc = (child.text or '').strip()
+                elif name == 'lastmod':
+                    lastmod = (child.text or '').strip() or None
+            if self._root is not None:
+                self._root.clear()
+            if loc:
+                entries.append((kind, loc, lastmod))
+        return entries
+
+
+async def _iter_sitemap_document(
+    client: httpx.AsyncClient, sitemap_url: str
+) -> AsyncIterator[tuple[str, str, str | None]]:
+    """Streams the sitemap document and yields its `(kind, loc, lastmod)` entries as soon as they are parsed."""
+    parser = _SitemapParser()
+    decompressor = None
+    async with client.stream('GET', sitemap_url) as response:
+        if response.is_error:
+            logger.warning(f'Failed to get the sitemap "{sitemap_url}", status code {response.status_code}!')
+            return
+        async for chunk in response.aiter_bytes():
+            # sitemap.xml.gz files are usually served without the content encoding
+            if decompressor is None and chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            for entry in parser.feed(decompressor.decompress(chunk) if decompressor else chunk):
+                yield entry
+        if decompressor is not None:
+            for entry in parser.feed(decompressor.flush()):
+                yield entry
+
+
+async def iter_sitemap_urls(
+    client: httpx.AsyncClient, sitemap_urls: list[str], max_sitemaps: int = DEFAULT_MAX_SITEMAPS
+) -> AsyncIterator[SitemapUrl]:
+    """Yields the page URLs of the sitemaps, the nested sitemaps of the sitemap indexes are followed.
+
+    :param client: HTTP client used to download the sitemaps
+    :param sitemap_urls: URLs of the sitemaps or sitemap indexes
+    :param max_sitemaps: Maximum number of the sitemap documents read
+    """
+    queue = deque(sitemap_urls)
+    seen = set(sitemap_urls)
+    read_count = 0
+    while queue and read_count < max_sitemaps:
+        sitemap_url = queue.popleft()
+        read_count += 1
+        try:
+            async for kind, loc, lastmod in _iter_sitemap_document(client, sitemap_url):
+                if kind == 'url':
+                    yield SitemapUrl(loc, lastmod)
+                elif loc not in seen:
+                    seen.add(loc)
+                    queue.append(loc)
+        except (httpx.HTTPError, SyntaxError, zlib.error) as exc:
+            # xml.etree.ElementTree.ParseError is a SyntaxError
+            logger.warning(f'Failed to read the sitemap "{sitemap_url}": {exc}')
+    if queue:
+        logger.warning(f'Reached {max_sitemaps} sitemaps, {len(queue)} sitemaps were not read!')
+
+
+async def find_sitemap_urls(client: httpx.AsyncClient, start_url: str) -> list[str]:
+    """Returns the sitemaps listed in the robots.txt of the site, or the default `/sitemap.xml` location."""
+    robots_url = urljoin(start_url, '/robots.txt')
+    sitemap_urls = []
+    try:
+        response = await client.get(robots_url)
+        if response.is_success:
+            for line in response.text.splitlines():
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'sitemap' and value.strip():
+                    sitemap_urls.append(value.strip())
+    except httpx.HTTPError as exc:
+        logger.warning(f'Failed to get "{robots_url}": {exc}')
+    return sitemap_urls or [urljoin(start_url, '/sitemap.xml')]
+
+
+def is_url_in_scope(url: str, start_url: str) -> bool:
+    """Checks if the URL is on the host of the start URL and under its path."""
+    parsed_url, parsed_start_url = urlparse(url), parse_url(start_url)
+    if parsed_url.hostname != parsed_start_url.hostname:
+        return False
+    scope = parsed_start_url.path.rstrip('/')
+    path = parsed_url.path.rstrip('/')
+    return path == scope or path.startswith(f'{scope}/')
+
+
+async def discover_sitemap_pages(
+    client: httpx.AsyncClient, start_url: str, max_sitemaps: int = DEFAULT_MAX_SITEMAPS
+) -> dict[str, str | None]:
+    """Returns the normalized URLs of the sitemap pages under the start URL with their last modification dates."""
+    sitemap_urls = await find_sitemap_urls(client, start_url)
+    logger.info(f'Reading the sitemaps of the site: {", ".join(sitemap_urls)}')
+    pages: dict[str, str | None] = {}
+    async for sitemap_url in iter_sitemap_urls(client, sitemap_urls, max_sitemaps):
+        if is_url_in_scope(sitemap_url.loc, start_url):
+            pages[parse_url(sitemap_url.loc).normalized] = sitemap_url.lastmod
+    logger.info(f'Found {len(pages)} pages under "{start_url}" in the sitemaps!')
+    return pages
+
+
+def get_sitemap_state_key(url: str) -> str:
+    """Returns the key of the sitemap state record for the site crawled from the start `url`."""
+    return f'SITEMAP_STATE-{get_content_hash(url)}'
+
+
+class SitemapState:
+    """Titles and descriptions of the sitemap pages by their last modification date, kept between the runs.
+
+    Each normalized URL maps to a compact `[lastmod, title, description]` entry, the pages whose `lastmod`
+    has not changed since the previous run are not crawled again.
+    """
+
+    def __init__(self, entries: dict[str, list] | None = None) -> None:
+        self.entries = entries if entries is not None else {}
+
+    def get(self, url: str, lastmod: str | None) -> tuple[str, str | None] | None:
+        """Returns the title and the description of the page if it has not changed since the previous run."""
+        entry = self.entries.get(url)
+        if lastmod is None or entry is None or entry[0] != lastmod:
+            return None
+        return entry[1], entry[2]
+
+    def put(self, url: str, lastmod: str | None, title: str | None, description: str | None) -> None:
+        """Stores the title and the description of the page, pages without the `lastmod` or title are always crawled."""
+        if lastmod is not None and title is not None:
+            self.entries[url] = [lastmod, title, description]
+
+    @classmethod
+    async def load(cls, store: KeyValueStore, key: str) -> SitemapState:
+        """Loads the state saved by the previous run from the key-value store."""
+        record = await store.get_value(key) or {}
+        state = cls(record.get('entries', {}))
+        logger.info(f'Loaded {len(state.entries)} sitemap pages from the key-value store!')
+        return state
+
+    async def save(self, store: KeyValueStore, key: str) -> None:
+        """Saves the state into the key-value store."""
+        await store.set_value(key, {'entries': self.entries})
+        logger.info(f'Saved {len(self.entries)} sitemap pages into the key-value store!')
+
+
+def add_unchanged_sitemap_pages(
+    builder: LLMSDataBuilder, pages: dict[str, str | None], state: SitemapState
+) -> list[str]:
+    """Adds the sitemap pages not changed since the previous run to the builder, returns the URLs of the rest."""
+    changed_urls = []
+    for url, lastmod in pages.items():
+        if (entry := state.get(url, lastmod)) is None:
+            changed_urls.append(url)
+        else:
+            builder.add_page(url, *entry)
+    return changed_urls
+
+
+def get_sitemap_state(builder: LLMSDataBuilder, pages: dict[str, str | None]) -> SitemapState:
+    """Returns the state with the titles and descriptions of the sitemap pages added to the builder.
+
+    Must be called before the builder data are cleaned, the pages are read from their original sections.
+    """
+    state = SitemapState()
+    if builder.url_normalized in pages:
+        root_title = builder.get_path_title(parse_url(builder.url_normalized).path)
+        state.put(builder.url_normalized, pages[builder.url_normalized], root_title, builder.data['description'])
+    for link in builder.iter_links():
+        url = parse_url(link['url']).normalized
+        if url in pages:
+            state.put(url, pages[url], link['title'], link['description'])
+    return state
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import sqlite3
+import tempfile
+import weakref
+from typing import TYPE_CHECKING
+
+from src.renderer import render_llms_txt_header, render_section
+from src.trie import PathTrie
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from src.cache import SectionRenderCache
+    from src.mytypes import LinkDict, LLMSData
+    from src.trie import PathTrieNode
+
+logger = logging.getLogger('apify')
+
+# links read from the database at once while rendering
+SPILL_FETCH_SIZE = 1000
+# page cache of the database, the rest of the data stays on the disk
+SPILL_CACHE_KIBIBYTES = 8 * 1024
+
+_SCHEMA = """
+CREATE TABLE links (seq INTEGER PRIMARY KEY, section INTEGER NOT NULL, url TEXT, title TEXT, description TEXT);
+CREATE INDEX links_section ON links (section, seq);
+CREATE TABLE path_titles (path TEXT PRIMARY KEY, title TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+def _delete_database(connection: sqlite3.Connection, path: str) -> None:
+    connection.close()
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+class _SpilledSection:
+    """Section whose links are stored in the database, only its title and link count are kept in memory."""
+
+    __slots__ = ('id', 'links_count', 'title')
+
+    def __init__(self, section_id: int, title: str) -> None:
+        self.id = section_id
+        self.title = title
+        self.links_count = 0
+
+
+class _SectionLinks:
+    """Links of an output section, streamed from the database again each time they are iterated."""
+
+    __slots__ = ('_source_dirs', '_spilled')
+
+    def __init__(self, spilled: SpilledSections, source_dirs: list[str]) -> None:
+        self._spilled = spilled
+        self._source_dirs = source_dirs
+
+    def __iter__(self) -> Iterator[LinkDict]:
+        for source_dir in self._source_dirs:
+            yield from self._spilled._iter_section_links(source_dir)  # noqa: SLF001
+
+
+class SpilledSections:
+    """Sections, links and page titles of the LLMS data stored in a temporary SQLite database on the local disk.
+
+    Used for sites too large to keep all their links in memory. Only the sections themselves are kept in memory,
+    there are orders of magnitude fewer of them than the pages. The sections are cleaned by deciding which
+    sections the links of each output section come from, the links are then streamed from the database
+    while rendering, so the output is the same as of `clean_llms_data` and `render_llms_txt` in memory.
+    """
+
+    def __init__(self, directory: str | None = None) -> None:
+        """Creates the empty database in a temporary file.
+
+        :param directory: Directory of the database file, the default temporary directory if None
+        """
+        fd, self.path = tempfile.mkstemp(prefix='llms-sections-', suffix='.sqlite', dir=directory)
+        os.close(fd)
+        self._connection = sqlite3.connect(self.path)
+        # the database is thrown away after the run, it does not need to survive a crash
+        self._connection.executescript(
+            f'PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; PRAGMA cache_size = -{SPILL_CACHE_KIBIBYTES};'
+            + _SCHEMA
+        )
+        # the database is deleted also if the builder is dropped because of an error or the process exits
+        self._finalizer = weakref.finalize(self, _delete_database, self._connection, self.path)
+        self.sections: dict[str, _SpilledSection] = {}
+        # source sections of the links of each output section, set by the cleaning
+        self._merged: dict[str, list[str]] | None = None
+
+    def close(self) -> None:
+        """Closes and deletes the database."""
+        self._finalizer()
+
+    def set_path_title(self, path: str, title: str | None) -> None:
+        """Sets the title of the page with the path, None removes it like in `PathTrie`."""
+        if title is None:
+            self._connection.execute('DELETE FROM path_titles WHERE path = ?', (path,))
+        else:
+            self._connection.execute('INSERT OR REPLACE INTO path_titles VALUES (?, ?)', (path, title))
+
+    def get_path_title(self, path: str) -> str | None:
+        """Returns the title of the page with the path."""
+        row = self._connection.execute('SELECT title FROM path_titles WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else None
+
+    def get_section_dir_title(self, section_dir: str) -> str:
+        """Gets the title of the section from the nearest titled page on its path.
+
+        The same as `get_section_dir_title_from_trie`, the title of the root page is used only for the root section.
+        """
+        path = section_dir
+        while path:
+            if (title := self.get_path_title(path)) is not None:
+                return title
+            if path == '/' or (path := path.rsplit('/', 1)[0]) == '/':
+                break
+        return section_dir
+
+    def add_section(self, section_dir: str, title: str) -> None:
+        """Adds the empty section."""
+        self.sections[section_dir] = _SpilledSection(len(self.sections), title)
+
+    def add_link(self, section_dir: str, url: str, title: str, description: str | None) -> None:
+        """Adds the link to the existing section."""
+        section = self.sections[section_dir]
+        section.links_count += 1
+        self._connection.execute(
+            'INSERT INTO links (section, url, title, description) VALUES (?, ?, ?, ?)',
+            (section.id, url, title, description),
+        )
+
+    def iter_links(self) -> Iterator[LinkDict]:
+        """Yields the links of all the sections in the order of the sections and of their links."""
+        for section_dir in self.sections:
+            yield from self._iter_section_links(section_dir)
+
+    def load(self, data: LLMSData, path_titles: PathTrie[str]) -> None:
+        """Moves the sections of the LLMS data and the page titles into the database, the data are emptied."""
+        for path, title in path_titles.items():
+            self.set_path_title(path, title)
+        for section_dir, section in data['sections'].items():
+            self.add_section(section_dir, section['title'])
+            for link in section['links']:
+                self.add_link(section_dir, link['url'], link['title'], link['description'])
+        self._connection.commit()
+        logger.info(f'Spilled {len(self.sections)} sections with {len(path_titles)} pages to "{self.path}"')
+        data['sections'] = {}
+
+    def set_section_title(self, section_dir: str, title: str) -> None:
+        """Sets the title of the section."""
+        self.sections[section_dir].title = title
+
+    def clean(self, section_min_links: int = 2) -> None:
+        """Moves the links of the sections with low link count into the index section, like `clean_llms_data`."""
+        merged = {section_dir: [section_dir] for section_dir in self.sections}
+        to_remove_sections = [
+            section_dir
+            for section_dir, section in self.sections.items()
+            if section_dir != '/' and section.links_count < section_min_links
+        ]
+        if to_remove_sections:
+            if '/' not in merged:
+                self._add_index_section()
+                merged['/'] = []
+            for section_dir in to_remove_sections:
+                merged['/'].append(section_dir)
+                del merged[section_dir]
+        self._merged = merged
+
+    def collapse_sparse_sections(self, section_min_links: int = 2) -> None:
+        """Collapses the sections with low link count into their nearest ancestor, like `collapse_sparse_sections`."""
+        merged = {section_dir: [section_dir] for section_dir in self.sections}
+        section_trie: PathTrie[str] = PathTrie()
+        for section_dir in sorted(self.sections):
+            section_trie[section_dir] = section_dir
+
+        def collapse(node: PathTrieNode[str]) -> tuple[list[str], int]:
+            """Returns the sections whose links are passed to the nearest ancestor section and their link count."""
+            orphans: list[str] = []
+            orphans_count = 0
+            for child in node.children.values():
+                child_orphans, child_count = collapse(child)
+                orphans.extend(child_orphans)
+                orphans_count += child_count
+            if (section_dir := node.value) is None:
+                return orphans, orphans_count
+            merged[section_dir].extend(orphans)
+            links_count = self.sections[section_dir].links_count + orphans_count
+            if section_dir == '/' or links_count >= section_min_links:
+                return [], 0
+            return merged.pop(section_dir), links_count
+
+        index_sections, index_count = collapse(section_trie.root)
+        if index_count:
+            self._add_index_section()
+            merged['/'] = index_sections
+        self._merged = merged
+
+    def iter_sections(self) -> Iterator[tuple[str, _SectionLinks]]:
+        """Yields the titles of the output sections with their links streamed from the database, in the output order."""
+        merged = self._merged
+        if merged is None:
+            merged = {section_dir: [section_dir] for section_dir in self.sections}
+        for section_dir in sorted(merged):
+            yield self.sections[section_dir].title, _SectionLinks(self, merged[section_dir])
+
+    def iter_render(self, data: LLMSData, cache: SectionRenderCache | None = None) -> Iterator[str]:
+        """Yields the parts of the llms.txt file with the header of the data and the links from the database."""
+        yield render_llms_txt_header(data)
+        for title, links in self.iter_sections():
+            yield render_section(title, links, cache)
+
+    def render(self, data: LLMSData, cache: SectionRenderCache | None = None) -> str:
+        """Generates the llms.txt file, the same as `render_llms_txt` of the data kept in memory."""
+        return ''.join(self.iter_render(data, cache))
+
+    def _add_index_section(self) -> None:
+        self.sections['/'] = _SpilledSection(len(self.sections), 'Index')
+
+    def _iter_section_links(self, section_dir: str) -> Iterator[LinkDict]:
+        cursor = self._connection.execute(
+            'SELECT url, title, description FROM links WHERE section = ? ORDER BY seq', (self.sections[section_dir].id,)
+        )
+        while rows := cursor.fetchmany(SPILL_FETCH_SIZE):
+            for url, title, description in rows:
+                yield {'url': url, 'title': title, 'description': description}
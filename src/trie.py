@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+T = TypeVar('T')
+
+
+def split_path(path: str) -> list[str]:
+    """Splits the URL path into its segments, the root path `/` has no segments."""
+    if path in {'', '/'}:
+        return []
+    return path.removeprefix('/').split('/')
+
+
+class PathTrieNode(Generic[T]):
+    """Single path segment of the `PathTrie`."""
+
+    __slots__ = ('children', 'value')
+
+    def __init__(self) -> None:
+        self.children: dict[str, PathTrieNode[T]] = {}
+        self.value: T | None = None
+
+
+class PathTrie(Generic[T]):
+    """Trie of the URL paths, each path can hold a value, e.g. the title of the page.
+
+    Every path is split only once when inserted or looked up, so looking up the nearest ancestor
+    of a path with a value costs O(depth) without any string re-splitting.
+    """
+
+    def __init__(self) -> None:
+        self.root: PathTrieNode[T] = PathTrieNode()
+        self._len = 0
+
+    def __len__(self) -> int:
+        """Returns the number of paths with a value."""
+        return self._len
+
+    def __setitem__(self, path: str, value: T | None) -> None:
+        """Sets the value of the path, None removes the value."""
+        node = self.root
+        for segment in split_path(path):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = PathTrieNode()
+            node = child
+        self._len += (value is not None) - (node.value is not None)
+        node.value = value
+
+    def get(self, path: str) -> T | None:
+        """Returns the value of the path or None if the path has no value."""
+        node: PathTrieNode[T] | None = self.root
+        for segment in split_path(path):
+            if node is None:
+                break
+            node = node.children.get(segment)
+        return node.value if node is not None else None
+
+    def get_nearest(self, path: str, *, include_root: bool = False) -> T | None:
+        """Returns the value of the path or of its nearest ancestor with a value.
+
+        :param path: URL path to look up
+        :param include_root: Whether the value of the root path `/` is used for the paths other than root
+        """
+        segments = split_path(path)
+        node = self.root
+        nearest = node.value if include_root or not segments else None
+        for segment in segments:
+            if (child := node.children.get(segment)) is None:
+                break
+            node = child
+            if node.value is not None:
+                nearest = node.value
+        return nearest
+
+    def items(self) -> Iterator[tuple[str, T]]:
+        """Yields the paths with a value together with the value, parents before their children."""
+        stack: list[tuple[str, PathTrieNode[T]]] = [('', self.root)]
+        while stack:
+            path, node = stack.pop()
+            if node.value is not None:
+                yield path or '/', node.value
+            # reversed so that the children are yielded in their insertion order
+            stack.extend((f'{path}/{segment}', child) for segment, child in reversed(node.children.items()))
+
+
+def get_section_dir_title_from_trie(section_dir: str, path_titles: PathTrie[str]) -> str:
+    """Gets the title of the section from the nearest titled page on its path, like `get_section_dir_title`."""
+    if not section_dir or (title := path_titles.get_nearest(section_dir)) is None:
+        return section_dir
+    return title
@@ -0,0 +1,3 @@
+from tests.fixtures import http_server
+
+__all__ = ['http_server']
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks import local_client
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from benchmarks.local_client import LocalApifyClient
+
+BASE = 'https://example.com/docs'
+
+# storages opened in the process by their ID or name, kept by crawlee with their records loaded into memory
+CRAWLEE_STORAGE_CACHES = (
+    '_cache_dataset_by_id',
+    '_cache_dataset_by_name',
+    '_cache_kvs_by_id',
+    '_cache_kvs_by_name',
+    '_cache_rq_by_id',
+    '_cache_rq_by_name',
+)
+
+
+@contextlib.contextmanager
+def fresh_actor_storage() -> Iterator[None]:
+    """Opens the storages of the actor runs in the block from the current storage directory, like a new process.
+
+    The actor and the crawlee services keep their configuration and crawlee keeps the opened storages
+    for the whole process otherwise.
+    """
+    # imported here, the configuration of the actor is frozen once the actor is first touched
+    from apify import Actor, Configuration
+    from crawlee import service_container
+    from crawlee.storages import _creation_management
+
+    configuration = Configuration()
+    with (
+        patch.object(Actor, '_configuration', configuration),
+        patch.object(service_container, '_services', {'configuration': configuration}),
+        contextlib.ExitStack() as storage_caches,
+    ):
+        for cache_name in CRAWLEE_STORAGE_CACHES:
+            storage_caches.enter_context(patch.object(_creation_management, cache_name, {}))
+        yield
+
+
+async def run_actor_locally(actor_input: dict, client: LocalApifyClient) -> None:
+    """Runs the actor against the local stand-in client with the storages from the current storage directory."""
+    with fresh_actor_storage():
+        await local_client.run_actor_locally(actor_input, client)
+
+
+class FakeKeyValueStore:
+    """Key-value store client keeping the values and the HTML records of the crawler run in memory.
+
+    Setting None deletes the value like on the platform, the JSON values are copied like when they are stored.
+    """
+
+    def __init__(self, records: dict[str, str] | None = None) -> None:
+        self.values: dict[str, Any] = {}
+        self.writes: list[str] = []
+        self.records = records or {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_value(self, key: str, default_value: Any = None) -> Any:
+        return self.values.get(key, default_value)
+
+    async def set_value(self, key: str, value: Any, content_type: str | None = None) -> None:  # noqa: ARG002
+        self.writes.append(key)
+        if value is None:
+            self.values.pop(key, None)
+        else:
+            self.values[key] = value if isinstance(value, (bytes, str)) else json.loads(json.dumps(value))
+
+    async def get_record(self, key: str) -> dict | None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # random latency so that the downloads finish out of order
+        await asyncio.sleep(random.uniform(0, 0.01))
+        self.in_flight -= 1
+        if key not in self.records:
+            return None
+        return {'key': key, 'value': self.records[key]}
+
+
+def make_dataset(count: int) -> tuple[list[dict], dict[str, str]]:
+    """Creates the dataset items of a crawler run over three sections of the docs and their HTML records."""
+    items = [
+        {
+            'url': f'{BASE}/section-{i % 3}/page-{i}',
+            'htmlUrl': f'https://api.apify.com/v2/records/page-{i}',
+            'metadata': {},
+            'markdown': f'Content of page {i}.',
+        }
+        for i in range(count)
+    ]
+    records = {f'page-{i}': f'<h1>Page {i}</h1>' for i in range(count)}
+    return items, records
+
+
+class QuietRequestHandler(BaseHTTPRequestHandler):
+    """Request handler of the test HTTP servers that does not log the requests."""
+
+    def log_message(self, *_args: object) -> None:
+        pass
+
+
+@pytest.fixture(scope='module')
+def http_server(http_handler: type[BaseHTTPRequestHandler]) -> Iterator[ThreadingHTTPServer]:
+    """Serves the `http_handler` fixture of the test module on a local port for all the tests of the module."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), http_handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
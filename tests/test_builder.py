@@ -0,0 +1,39 @@
+from src.builder import LLMSDataBuilder
+from src.extractor import HtmlMetadata
+
+
+def test_llms_data_builder() -> None:
+    builder = LLMSDataBuilder('https://example.com/docs/')
+    builder.add_item(
+        {'url': 'https://example.com/docs', 'htmlUrl': 'x', 'metadata': {'description': 'Root description'}},
+        HtmlMetadata(title='Docs', description=None),
+    )
+    builder.add_item(
+        {'url': 'https://example.com/docs/guides/intro', 'htmlUrl': 'x', 'metadata': {'title': 'Intro meta'}},
+        HtmlMetadata(title=None, description='Multi\nline'),
+    )
+    builder.add_item(
+        {'url': 'https://example.com/docs/guides', 'htmlUrl': 'x', 'metadata': {}},
+        HtmlMetadata(title='Guides', description='All guides'),
+    )
+    # invalid items are counted, but skipped
+    builder.add_item({'htmlUrl': 'x'}, None)
+    builder.add_item({'url': 'https://example.com/docs/missing-html'}, None)
+
+    data = builder.build()
+
+    assert builder.items_count == 5
+    assert data['title'] == 'example.com'
+    assert data['description'] == 'Root description'
+    sections = {section_dir: section.to_dict() for section_dir, section in data['sections'].items()}  # type: ignore[union-attr]
+    assert sections == {
+        # section created before its page was processed gets the title resolved at the end
+        '/docs/guides': {
+            'title': 'Guides',
+            'links': [{'url': 'https://example.com/docs/guides/intro', 'title': 'Intro meta', 'description': None}],
+        },
+        '/docs': {
+            'title': 'Docs',
+            'links': [{'url': 'https://example.com/docs/guides', 'title': 'Guides', 'description': 'All guides'}],
+        },
+    }
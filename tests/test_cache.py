@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.builder import LLMSDataBuilder
+from src.cache import ExtractionCache, SectionRenderCache, get_cache_key, get_content_hash, get_render_cache_key
+from src.extractor import HtmlMetadata
+from src.main import render_site
+from src.metrics import RunMetrics
+from src.options import GeneratorOptions
+from src.pipeline import ItemProcessor, process_dataset_items
+from src.renderer import render_llms_txt, render_llms_txt_section
+from tests.fixtures import BASE, FakeKeyValueStore, make_dataset, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_extraction_cache_get_put() -> None:
+    cache = ExtractionCache()
+    metadata = HtmlMetadata(title='Title', description='Description')
+    cache.put('https://example.com', 'hash', metadata)
+
+    assert cache.get('https://example.com', 'hash') == metadata
+    assert cache.get('https://example.com', 'changed') is None
+    assert cache.get('https://example.com/other', 'hash') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_extraction_cache_evict() -> None:
+    cache = ExtractionCache(run_number=10, max_entries=2, max_age_runs=3)
+    for url, last_seen in (('old', 7), ('a', 8), ('b', 10), ('c', 9)):
+        cache.entries[url] = ['hash', url, None, last_seen]
+
+    # 'old' is too old, 'a' is the least recently seen over the size limit
+    assert cache.evict() == 2
+    assert list(cache.entries) == ['b', 'c']
+
+
+async def test_extraction_cache_load_save() -> None:
+    store = FakeKeyValueStore()
+    key = get_cache_key('https://example.com')
+
+    cache = await ExtractionCache.load(store, key)  # type: ignore[arg-type]
+    assert cache.run_number == 1
+    cache.put('https://example.com', 'hash', HtmlMetadata(title='Title', description=None))
+    await cache.save(store, key)  # type: ignore[arg-type]
+
+    cache2 = await ExtractionCache.load(store, key)  # type: ignore[arg-type]
+    assert cache2.run_number == 2
+    assert cache2.get('https://example.com', 'hash') == HtmlMetadata(title='Title', description=None)
+
+
+async def test_item_processor_reuses_cache() -> None:
+    html = '<h1>Page</h1>'
+    item = {'url': 'https://example.com/page', 'htmlUrl': 'https://api.apify.com/v2/records/page'}
+    kvstore = FakeKeyValueStore({'page': html})
+    cache = ExtractionCache()
+    processor = ItemProcessor(kvstore, cache=cache)  # type: ignore[arg-type]
+    cache.put(item['url'], get_content_hash(html), HtmlMetadata(title='Cached', description=None))
+
+    with patch('src.pipeline.extract_html_metadata') as extract:
+        html_metadata = await processor(item)
+
+    assert html_metadata == HtmlMetadata(title='Cached', description=None)
+    extract.assert_not_called()
+
+    # changed content is parsed again and the cache is updated
+    kvstore.records['page'] = '<h1>Changed</h1>'
+    assert await processor(item) == HtmlMetadata(title='Changed', description=None)
+    assert cache.get(item['url'], get_content_hash('<h1>Changed</h1>')) == HtmlMetadata(
+        title='Changed', description=None
+    )
+
+
+def build_site(titles: dict[str, str], spill_threshold: int | None = None) -> LLMSDataBuilder:
+    builder = LLMSDataBuilder('https://example.com', spill_threshold=spill_threshold)
+    for path, title in titles.items():
+        builder.add_page(f'https://example.com{path}', title, None)
+    return builder
+
+
+SITE_TITLES = {f'/{section}/page-{i}': f'{section} {i}' for section in ('api', 'guide', 'blog') for i in range(3)}
+
+
+def test_section_render_cache() -> None:
+    data = build_site(SITE_TITLES).build()
+    cache = SectionRenderCache()
+    output = render_llms_txt(data, cache)
+    assert output == render_llms_txt(data)
+    assert (cache.hits, cache.misses, cache.removed_count) == (0, 3, 0)
+
+    # only the changed section is rendered again, the removed one is dropped from the cache
+    titles = {path: title for path, title in SITE_TITLES.items() if not path.startswith('/blog')}
+    titles['/api/page-0'] = 'Changed'
+    changed_data = build_site(titles).build()
+    cache2 = SectionRenderCache(cache.rendered, get_content_hash(output))
+    with patch('src.cache.render_llms_txt_section', wraps=render_llms_txt_section) as render_section:
+        changed_output = render_llms_txt(changed_data, cache2)
+    assert changed_output == render_llms_txt(changed_data)
+    assert render_section.call_count == 1
+    assert (cache2.hits, cache2.misses, cache2.removed_count) == (1, 1, 2)
+    assert cache2.is_output_changed(changed_output)
+    assert not cache2.is_output_changed(output)
+
+
+@pytest.mark.parametrize('spill_threshold', [None, 0])
+def test_render_site_with_render_cache(spill_threshold: int | None) -> None:
+    options = GeneratorOptions()
+    expected = render_site(build_site(SITE_TITLES), options, RunMetrics())
+    cache = SectionRenderCache()
+    assert render_site(build_site(SITE_TITLES, spill_threshold), options, RunMetrics(), render_cache=cache) == expected
+    cache2 = SectionRenderCache(cache.rendered)
+    assert render_site(build_site(SITE_TITLES, spill_threshold), options, RunMetrics(), render_cache=cache2) == expected
+    assert (cache2.hits, cache2.misses) == (cache.misses, 0)
+
+
+async def test_section_render_cache_load_save() -> None:
+    store = FakeKeyValueStore()
+    key = get_render_cache_key('https://example.com')
+    data = build_site(SITE_TITLES).build()
+
+    cache = await SectionRenderCache.load(store, key)  # type: ignore[arg-type]
+    output = render_llms_txt(data, cache)
+    await cache.save(store, key, output)  # type: ignore[arg-type]
+
+    cache2 = await SectionRenderCache.load(store, key)  # type: ignore[arg-type]
+    assert not cache2.is_output_changed(render_llms_txt(data, cache2))
+    assert (cache2.hits, cache2.misses) == (3, 0)
+
+
+async def test_run_actor_locally_skips_unchanged_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    items, records = make_dataset(10)
+    run = LocalRunClient(items, records)
+    builder = LLMSDataBuilder(f'{BASE}/')
+    await process_dataset_items(builder, run.dataset(), ItemProcessor(run.key_value_store()))  # type: ignore[arg-type]
+    output = render_site(builder, GeneratorOptions(), RunMetrics())
+
+    # render cache saved by the previous run with the same output
+    cache_path = tmp_path / 'key_value_stores' / 'cache'
+    cache_path.mkdir(parents=True)
+    record = {'outputHash': get_content_hash(output), 'entries': {}}
+    (cache_path / f'{get_render_cache_key(f"{BASE}/")}.json').write_text(json.dumps(record))
+
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    actor_input = {
+        'startUrl': f'{BASE}/',
+        'htmlParserExecutor': 'inline',
+        'cacheStoreName': 'cache',
+        'skipUnchangedOutput': True,
+    }
+    await run_actor_locally(actor_input, LocalApifyClient(run))
+
+    store_path = tmp_path / 'key_value_stores' / 'default'
+    # the file is saved into the new default store of the run, only the dataset item is skipped
+    assert (store_path / 'llms.txt').read_text() == output
+    assert not list((tmp_path / 'datasets' / 'default').glob('0*.json'))
+    metrics = json.loads((store_path / 'METRICS.json').read_text())
+    assert metrics['counters']['outputUnchanged'] == 1
+    assert metrics['counters']['renderSectionsRendered'] > 0
+
+
+async def test_run_actor_locally_keeps_render_cache_on_failed_save(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    items, records = make_dataset(10)
+    cache_path = tmp_path / 'key_value_stores' / 'cache'
+    cache_path.mkdir(parents=True)
+    render_cache_path = cache_path / f'{get_render_cache_key(f"{BASE}/")}.json'
+    render_cache_path.write_text(json.dumps({'outputHash': 'previous', 'entries': {}}))
+
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    actor_input = {'startUrl': f'{BASE}/', 'htmlParserExecutor': 'inline', 'cacheStoreName': 'cache'}
+    with (
+        patch('src.main.save_site_output', side_effect=RuntimeError('Failed to save')),
+        pytest.raises(RuntimeError, match='Failed to save'),
+    ):
+        await run_actor_locally(actor_input, LocalApifyClient(LocalRunClient(items, records)))
+
+    # the next run does not consider the output unchanged
+    assert json.loads(render_cache_path.read_text())['outputHash'] == 'previous'
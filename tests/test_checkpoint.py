@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.builder import LLMSDataBuilder
+from src.checkpoint import ProcessingCheckpoint
+from src.main import render_site
+from src.metrics import RunMetrics
+from src.options import GeneratorOptions
+from src.pipeline import ItemProcessor, process_dataset_items
+from src.renderer import render_llms_txt
+from tests.fixtures import BASE, FakeKeyValueStore, make_dataset, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+async def test_checkpoint_saves_only_new_pages() -> None:
+    store = FakeKeyValueStore()
+    builder = LLMSDataBuilder(f'{BASE}/')
+    checkpoint = ProcessingCheckpoint(store, builder)  # type: ignore[arg-type]
+    checkpoint.run_id = 'run-1'
+
+    builder.add_page(f'{BASE}/a', 'A', None)
+    builder.add_page(f'{BASE}/a/b', 'B', 'About B')
+    builder.items_count = 2
+    await checkpoint.save()
+    assert store.writes == ['CHECKPOINT-0', 'CHECKPOINT']
+    # nothing changed, nothing is written
+    await checkpoint.save()
+    assert len(store.writes) == 2
+    builder.add_page(f'{BASE}/c', 'C', None)
+    builder.items_count = 4
+    await checkpoint.save()
+    assert store.writes[2:] == ['CHECKPOINT-1', 'CHECKPOINT']
+    assert store.values['CHECKPOINT-1'] == {'pages': [[f'{BASE}/c', 'C', None]], 'dedup': []}
+    assert store.values['CHECKPOINT'] == {
+        'runId': 'run-1',
+        'itemsCount': 4,
+        'unchangedPagesCount': 0,
+        'chunksCount': 2,
+    }
+
+    restored_builder = LLMSDataBuilder(f'{BASE}/')
+    restored = ProcessingCheckpoint(store, restored_builder)  # type: ignore[arg-type]
+    assert await restored.restore()
+    assert restored.run_id == 'run-1'
+    assert restored_builder.items_count == 4
+    assert render_llms_txt(restored_builder.build()) == render_llms_txt(builder.build())
+    # the restored pages are not saved again
+    await restored.save()
+    assert len(store.writes) == 4
+
+    await restored.delete()
+    assert store.values == {}
+
+
+async def test_checkpoint_restore_missing() -> None:
+    checkpoint = ProcessingCheckpoint(FakeKeyValueStore(), LLMSDataBuilder(f'{BASE}/'))  # type: ignore[arg-type]
+    assert not await checkpoint.restore()
+    assert not checkpoint.is_restored
+
+
+async def test_run_actor_locally_resumes_from_checkpoint(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    items, records = make_dataset(30)
+    actor_input = {'startUrl': f'{BASE}/', 'htmlParserExecutor': 'inline'}
+
+    full_run = LocalRunClient(items, records)
+    full_builder = LLMSDataBuilder(f'{BASE}/')
+    await process_dataset_items(full_builder, full_run.dataset(), ItemProcessor(full_run.key_value_store()))  # type: ignore[arg-type]
+    expected = render_site(full_builder, GeneratorOptions(), RunMetrics())
+
+    # checkpoint of an actor run that was restarted after processing a part of the crawler run
+    run = LocalRunClient(items, records)
+    store = FakeKeyValueStore()
+    builder = LLMSDataBuilder(f'{BASE}/')
+    checkpoint = ProcessingCheckpoint(store, builder)  # type: ignore[arg-type]
+    checkpoint.run_id = run.id
+    processor = ItemProcessor(run.key_value_store())  # type: ignore[arg-type]
+    await process_dataset_items(builder, run.dataset(), processor, limit=12)  # type: ignore[arg-type]
+    await checkpoint.save()
+    store_path = tmp_path / 'resumed' / 'key_value_stores' / 'default'
+    store_path.mkdir(parents=True)
+    for key, value in store.values.items():
+        (store_path / f'{key}.json').write_text(json.dumps(value))
+
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path / 'resumed'))
+    monkeypatch.setenv('CRAWLEE_PURGE_ON_START', '0')
+    client = LocalApifyClient(run)
+    await run_actor_locally(actor_input, client)
+
+    # the crawler run is reattached instead of starting a new one
+    assert client.actor_client.run_inputs == []
+    assert (store_path / 'llms.txt').read_text() == expected
+    assert not (store_path / 'CHECKPOINT.json').exists()
+    assert not (store_path / 'CHECKPOINT-0.json').exists()
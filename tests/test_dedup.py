@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.builder import LLMSDataBuilder
+from src.checkpoint import ProcessingCheckpoint
+from src.dedup import PageDeduplicator, get_canonical_url
+from src.pipeline import ItemProcessor, process_dataset_items
+from tests.fixtures import BASE, FakeKeyValueStore, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def make_duplicated_dataset() -> tuple[list[dict], dict[str, str]]:
+    """Dataset where the pages are served under several URLs, the first URL of each page is expected in the output."""
+    pages = [
+        # (url, record key, canonical URL declared by the page)
+        (f'{BASE}/', 'docs', None),
+        (f'{BASE}/a', 'a', None),
+        (f'{BASE}/a/', 'a', None),
+        (f'{BASE}/a/index.html', 'a', None),
+        (f'{BASE}/b?ref=nav', 'b', None),
+        (f'{BASE}/b', 'b', None),
+        (f'{BASE}/c', 'c', None),
+        (f'{BASE}/c-alias', 'c-alias', f'{BASE}/c'),
+        (f'{BASE}/d', 'd', f'{BASE}/d-canonical'),
+        (f'{BASE}/d-canonical', 'd2', None),
+        # same content under an unrelated URL
+        (f'{BASE}/e', 'e', None),
+        (f'{BASE}/e-copy', 'e-copy', None),
+        (f'{BASE}/f', 'f', None),
+    ]
+    items = [
+        {'url': url, 'htmlUrl': f'https://api.apify.com/v2/records/{key}', 'metadata': {'canonicalUrl': canonical_url}}
+        for url, key, canonical_url in pages
+    ]
+    records = {key: f'<h1>Page {key}</h1>' for _, key, _ in pages}
+    records['docs'] = '<h1>Docs</h1>'
+    records['e-copy'] = records['e']
+    return items, records
+
+
+def test_get_canonical_url() -> None:
+    assert get_canonical_url('https://Example.com/docs/') == 'https://example.com/docs'
+    assert get_canonical_url('https://example.com/docs/index.html') == 'https://example.com/docs'
+    assert get_canonical_url('https://example.com/docs/INDEX.HTM?x=1#top') == 'https://example.com/docs'
+    assert get_canonical_url(' https://example.com/docs/a/b?page=2 ') == 'https://example.com/docs/a/b'
+    assert get_canonical_url('https://example.com/docs/index.html.md') == 'https://example.com/docs/index.html.md'
+    assert get_canonical_url('https://example.com/') == 'https://example.com'
+
+
+def test_page_deduplicator_content() -> None:
+    dedup = PageDeduplicator()
+    assert not dedup.check_content('https://example.com/a', 'hash-a')
+    # the second page was downloaded before the first one was accepted
+    assert not dedup.check_content('https://example.com/a-copy', 'hash-a')
+    assert dedup.accept_content('https://example.com/a')
+    assert not dedup.accept_content('https://example.com/a-copy')
+    assert dedup.check_content('https://example.com/a-copy2', 'hash-a')
+    # pages without the downloaded content are always accepted
+    assert dedup.accept_content('https://example.com/no-html')
+
+    assert dedup.report['contentDuplicates'] == 1
+    assert dedup.duplicates == [
+        {'url': 'https://example.com/a-copy', 'duplicateOf': 'https://example.com/a', 'reason': 'content'}
+    ]
+
+
+@pytest.mark.parametrize('concurrency', [1, 3, 20])
+async def test_process_dataset_items_dedup(concurrency: int) -> None:
+    items, records = make_duplicated_dataset()
+    run = LocalRunClient(items, records, latency_secs=0.001)
+    builder = LLMSDataBuilder(f'{BASE}/')
+    dedup = PageDeduplicator()
+    processor = ItemProcessor(run.key_value_store(), dedup=dedup)  # type: ignore[arg-type]
+
+    assert await process_dataset_items(builder, run.dataset(), processor, concurrency=concurrency) == len(items)  # type: ignore[arg-type]
+
+    links = [link['url'] for section in builder.data['sections'].values() for link in section['links']]
+    assert links == [f'{BASE}/a', f'{BASE}/b?ref=nav', f'{BASE}/c', f'{BASE}/d', f'{BASE}/e', f'{BASE}/f']
+    assert dedup.url_duplicates_count == 5
+    assert dedup.content_duplicates_count == 1
+    assert {'url': f'{BASE}/d-canonical', 'duplicateOf': f'{BASE}/d', 'reason': 'url'} in dedup.duplicates
+    # the duplicates by URL are not downloaded, the duplicates by content are not parsed if possible
+    assert processor.metrics.histograms['kvFetchMs'].count == len(items) - 5
+    assert processor.metrics.histograms['parseMs'].count <= len(items) - 5
+
+
+async def test_process_dataset_items_dedup_incremental() -> None:
+    items, records = make_duplicated_dataset()
+    run = LocalRunClient(items, records)
+    builder = LLMSDataBuilder(f'{BASE}/')
+    processor = ItemProcessor(run.key_value_store(), dedup=PageDeduplicator())  # type: ignore[arg-type]
+
+    # the skipped duplicates are counted, so the next batch starts at the right dataset offset
+    assert await process_dataset_items(builder, run.dataset(), processor, limit=4) == 4  # type: ignore[arg-type]
+    assert await process_dataset_items(builder, run.dataset(), processor) == len(items) - 4  # type: ignore[arg-type]
+    assert sum(len(section['links']) for section in builder.data['sections'].values()) == 6
+
+
+@pytest.mark.parametrize('limit', [2, 9, 11])
+async def test_process_dataset_items_dedup_restored(limit: int) -> None:
+    items, records = make_duplicated_dataset()
+    run = LocalRunClient(items, records)
+    store = FakeKeyValueStore()
+    checkpoint = ProcessingCheckpoint(store, LLMSDataBuilder(f'{BASE}/'), dedup=PageDeduplicator())  # type: ignore[arg-type]
+    processor = ItemProcessor(run.key_value_store(), dedup=checkpoint.dedup)  # type: ignore[arg-type]
+    await process_dataset_items(checkpoint.builder, run.dataset(), processor, limit=limit, concurrency=5)  # type: ignore[arg-type]
+    await checkpoint.save()
+
+    # the originals processed before the restart are still recognized
+    builder = LLMSDataBuilder(f'{BASE}/')
+    dedup = PageDeduplicator()
+    assert await ProcessingCheckpoint(store, builder, dedup=dedup).restore()  # type: ignore[arg-type]
+    processor = ItemProcessor(run.key_value_store(), dedup=dedup)  # type: ignore[arg-type]
+    assert await process_dataset_items(builder, run.dataset(), processor, concurrency=5) == len(items) - limit  # type: ignore[arg-type]
+
+    links = [link['url'] for section in builder.data['sections'].values() for link in section['links']]
+    assert links == [f'{BASE}/a', f'{BASE}/b?ref=nav', f'{BASE}/c', f'{BASE}/d', f'{BASE}/e', f'{BASE}/f']
+    assert (dedup.url_duplicates_count, dedup.content_duplicates_count) == (5, 1)
+    assert len(dedup.duplicates) == 6
+
+
+async def test_run_actor_locally_dedup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    items, records = make_duplicated_dataset()
+    client = LocalApifyClient(LocalRunClient(items, records))
+    await run_actor_locally({'startUrl': f'{BASE}/', 'dedupPages': True, 'htmlParserExecutor': 'inline'}, client)
+
+    store_path = tmp_path / 'key_value_stores' / 'default'
+    output = (store_path / 'llms.txt').read_text()
+    assert output.count('Page a') == 1
+    assert 'Page e-copy' not in output
+    report = json.loads((store_path / 'DUPLICATES.json').read_text())
+    assert (report['urlDuplicates'], report['contentDuplicates']) == (5, 1)
+    metrics = json.loads((store_path / 'METRICS.json').read_text())
+    assert metrics['counters']['duplicateUrls'] == 5
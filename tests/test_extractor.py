@@ -0,0 +1,47 @@
+import pytest
+
+from src.extractor import HtmlMetadata, HtmlMetadataParser, extract_html_metadata
+from src.helpers import get_description_from_html, get_h1_from_html
+from src.parsers import PARSER_CONFORMANCE_CORPUS
+
+
+@pytest.mark.parametrize('html', PARSER_CONFORMANCE_CORPUS)
+def test_extract_html_metadata_parity(html: str) -> None:
+    expected = HtmlMetadata(title=get_h1_from_html(html), description=get_description_from_html(html))
+    assert extract_html_metadata(html) == expected
+
+
+@pytest.mark.parametrize('html', PARSER_CONFORMANCE_CORPUS)
+def test_extract_html_metadata_parity_chunked(html: str) -> None:
+    parser = HtmlMetadataParser()
+    for i in range(0, len(html), 7):
+        parser.feed(html[i : i + 7])
+    parser.close()
+    assert parser.metadata == extract_html_metadata(html)
+
+
+def test_extract_html_metadata_early_exit() -> None:
+    parser = HtmlMetadataParser()
+    parser.feed('<meta name="description" content="desc"><h1>Title</h1>')
+    assert parser.is_complete
+
+    # nothing after the complete metadata is parsed
+    parser.feed('<h1>Other</h1><meta name="description" content="other">')
+    assert parser.metadata == HtmlMetadata(title='Title', description='desc')
+
+
+def test_extract_html_metadata_incomplete_with_fallback_description() -> None:
+    parser = HtmlMetadataParser()
+    parser.feed('<meta name="Description" content="upper"><h1>Title</h1>')
+    # lowercase description may still follow
+    assert not parser.is_complete
+    assert parser.metadata == HtmlMetadata(title='Title', description='upper')
+
+
+def test_extract_html_metadata_stop_at_fallback_description() -> None:
+    parser = HtmlMetadataParser(stop_at_fallback_description=True)
+    parser.feed('<meta name="Description" content="upper"><h1>Title</h1>')
+    assert parser.is_complete
+
+    parser.feed('<meta name="description" content="lower">')
+    assert parser.metadata == HtmlMetadata(title='Title', description='upper')
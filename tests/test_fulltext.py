@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.builder import LLMSDataBuilder
+from src.fulltext import PageContents, ShardedTextFile
+from src.main import render_site
+from src.metrics import RunMetrics
+from src.options import GeneratorOptions
+from tests.fixtures import BASE, make_dataset, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_page_contents() -> None:
+    contents = PageContents()
+    contents.add(f'{BASE}/a', 'First ž')
+    contents.add(f'{BASE}/b/', 'Second')
+    assert contents.get(f'{BASE}/a') == 'First ž'
+    # the pages are looked up by the normalized URL
+    assert contents.get(f'{BASE}/b') == 'Second'
+    assert contents.get(f'{BASE}/c') is None
+
+    contents.add(f'{BASE}/a', 'Replaced')
+    assert contents.get(f'{BASE}/a') == 'Replaced'
+    assert contents.get(f'{BASE}/b') == 'Second'
+    assert contents.pages_count == 2
+    contents.close()
+
+
+def test_sharded_text_file() -> None:
+    text_file = ShardedTextFile(max_shard_bytes=10)
+    for part in ['aaaa', 'bbbb', 'cccc', 'd' * 25, 'ee']:
+        text_file.write(part)
+    text_file.finish()
+    # the shards are split only between the parts, the oversized part makes a shard of its own
+    assert list(text_file.iter_shards()) == ['aaaabbbb', 'cccc', 'd' * 25, 'ee']
+    assert text_file.size == 39
+    text_file.close()
+
+
+def test_sharded_text_file_not_split() -> None:
+    text_file = ShardedTextFile()
+    for part in ['aaaa', 'bbbb', 'cccc']:
+        text_file.write(part)
+    text_file.finish()
+    assert list(text_file.iter_shards()) == ['aaaabbbbcccc']
+    text_file.close()
+
+
+def build(spill_threshold: int | None) -> LLMSDataBuilder:
+    builder = LLMSDataBuilder(BASE, spill_threshold=spill_threshold, contents=PageContents())
+    assert builder.contents is not None
+    builder.add_page(BASE, 'Docs', 'Root page')
+    builder.contents.add(BASE, 'Root content')
+    for i in range(30):
+        url = f'{BASE}/section-{i % 4}/page-{i}'
+        builder.add_page(url, f'Page {i}', None)
+        if i % 5:
+            builder.contents.add(url, f'Content of page {i}.\n')
+    return builder
+
+
+def render_full(builder: LLMSDataBuilder) -> tuple[str, str]:
+    full_text = ShardedTextFile()
+    output = render_site(builder, GeneratorOptions(), RunMetrics(), full_text)
+    full_output = ''.join(full_text.iter_shards())
+    full_text.close()
+    return output, full_output
+
+
+@pytest.mark.parametrize('spill_threshold', [0, 10])
+def test_llms_full_txt_spilled_equals_memory(spill_threshold: int) -> None:
+    expected_output, expected_full_output = render_full(build(None))
+    assert expected_full_output.startswith('# example.com\n\n> Root page\n\nRoot content\n\n## ')
+    assert '### Page 1\n\nSource: https://example.com/docs/section-1/page-1\n\nContent of page 1.\n\n' in (
+        expected_full_output
+    )
+    assert '### Page 5\n\nSource: https://example.com/docs/section-1/page-5\n\n###' in expected_full_output
+    # the pages are in the same order as in the llms.txt file
+    full_titles = [line[4:] for line in expected_full_output.splitlines() if line.startswith('### ')]
+    titles = [line[3 : line.index(']')] for line in expected_output.splitlines() if line.startswith('- [')]
+    assert full_titles == titles
+
+    assert render_full(build(spill_threshold)) == (expected_output, expected_full_output)
+
+
+async def test_run_actor_locally_llms_full_txt(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    items, records = make_dataset(20)
+    client = LocalApifyClient(LocalRunClient(items, records))
+
+    await run_actor_locally({'startUrl': f'{BASE}/', 'llmsFullTxt': True, 'htmlParserExecutor': 'inline'}, client)
+
+    store_path = tmp_path / 'key_value_stores' / 'default'
+    full_output = (store_path / 'llms-full.txt').read_text()
+    assert all(f'Content of page {i}.' in full_output for i in range(20))
+    assert not (store_path / 'llms-full-1.txt').exists()
+    dataset_items = [json.loads(path.read_text()) for path in (tmp_path / 'datasets' / 'default').glob('0*.json')]
+    assert dataset_items[0]['fullKey'] == 'llms-full.txt'
+    metrics = json.loads((store_path / 'METRICS.json').read_text())
+    assert metrics['counters']['llmsFullPages'] == 20
+
+
+async def test_run_actor_locally_llms_full_txt_shards(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    items, records = make_dataset(20)
+    client = LocalApifyClient(LocalRunClient(items, records))
+
+    # about 500 bytes per file
+    await run_actor_locally(
+        {'startUrl': f'{BASE}/', 'llmsFullTxt': True, 'llmsFullMaxFileMbytes': 0.0005, 'htmlParserExecutor': 'inline'},
+        client,
+    )
+
+    store_path = tmp_path / 'key_value_stores' / 'default'
+    index_text = (store_path / 'llms-full.txt').read_text()
+    shard_paths = sorted(store_path.glob('llms-full-*.txt'), key=lambda path: int(path.stem.rsplit('-', 1)[1]))
+    assert len(shard_paths) > 1
+    assert f'The full content is split into {len(shard_paths)} files' in index_text
+    assert all(f'[{path.name}](' in index_text for path in shard_paths)
+    assert all(len(path.read_bytes()) <= 500 for path in shard_paths)
+    full_output = ''.join(path.read_text() for path in shard_paths)
+    assert all(f'Content of page {i}.' in full_output for i in range(20))
@@ -1,13 +1,16 @@
 from typing import TYPE_CHECKING
 
 from src.helpers import (
+    ParsedUrl,
     clean_llms_data,
+    get_crawler_actor_config,
     get_h1_from_html,
     get_hostname_path_string_from_url,
     get_section_dir_title,
     get_url_path,
     get_url_path_dir,
     normalize_url,
+    parse_url,
 )
 
 if TYPE_CHECKING:
@@ -192,3 +195,25 @@ def test_get_hostname_path_string_from_url() -> None:
 
     url2 = 'https://example.com/path/'
     assert get_hostname_path_string_from_url(url2) == 'example.com/path/'
+
+
+def test_parse_url() -> None:
+    parse_url.cache_clear()
+    parsed = parse_url('https://example.com/dir/page/?q=1')
+    assert parsed == ParsedUrl(
+        normalized='https://example.com/dir/page?q=1', path='/dir/page', path_dir='/dir', hostname='example.com'
+    )
+
+    # repeated URLs are parsed only once
+    assert parse_url('https://example.com/dir/page/?q=1') is parsed
+    assert parse_url.cache_info().hits == 1
+
+
+def test_get_crawler_actor_config() -> None:
+    config = get_crawler_actor_config('https://example.com/docs', save_html=False)
+    assert config['saveHtmlAsFile'] is False
+    assert config['startUrls'] == [{'url': 'https://example.com/docs', 'method': 'GET'}]
+
+    # the shared default config is not modified
+    assert get_crawler_actor_config('https://example.com/other')['saveHtmlAsFile'] is True
+    assert config['startUrls'] == [{'url': 'https://example.com/docs', 'method': 'GET'}]
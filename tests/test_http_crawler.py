@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, ClassVar
+
+import httpx
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.http_crawler import HttpCrawler, create_crawler_http_client, extract_links
+from tests.fixtures import QuietRequestHandler, run_actor_locally
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+    from pathlib import Path
+
+
+def page(title: str, *links: str) -> bytes:
+    anchors = ''.join(f'<a href="{link}">{link}</a>' for link in links)
+    return (
+        f'<html><head><meta name="description" content="About {title}"></head><body><h1>{title}</h1>{anchors}'.encode()
+    )
+
+
+SITE = {
+    '/docs': page(
+        'Docs', '/docs/a', 'docs/b', '/docs/a#intro', '/docs/file.pdf', '/blog', 'https://other.com/docs', '/old'
+    ),
+    '/docs/a': page('Page A', '/docs/a/deep', '/docs', 'mailto:info@example.com'),
+    '/docs/b': page('Page B', 'b/deep', '/docs/missing'),
+    '/docs/a/deep': page('Deep A', '/docs/a/deeper'),
+    '/docs/b/deep': page('Deep B'),
+    '/docs/a/deeper': page('Deeper A'),
+    '/blog': page('Blog'),
+}
+
+
+class SiteHandler(QuietRequestHandler):
+    requested: ClassVar[list[str]] = []
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:  # noqa: N802
+        with self.lock:
+            SiteHandler.requested.append(self.path)
+            SiteHandler.active += 1
+            SiteHandler.max_active = max(SiteHandler.max_active, SiteHandler.active)
+        try:
+            # the later pages respond faster, the crawler must keep the discovery order
+            time.sleep(0.02 if self.path == '/docs/a' else 0.005)
+            self._respond()
+        finally:
+            with self.lock:
+                SiteHandler.active -= 1
+
+    def _respond(self) -> None:
+        if self.path == '/old':
+            self.send_response(301)
+            self.send_header('Location', '/docs/b')
+            self.end_headers()
+            return
+        if self.path == '/docs/file.pdf':
+            body, content_type = b'%PDF', 'application/pdf'
+        elif (html := SITE.get(self.path)) is not None:
+            body, content_type = html, 'text/html; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope='module')
+def http_handler() -> type[SiteHandler]:
+    return SiteHandler
+
+
+@pytest.fixture
+def base_url(http_server: ThreadingHTTPServer) -> str:
+    SiteHandler.requested = []
+    SiteHandler.max_active = 0
+    return f'http://127.0.0.1:{http_server.server_port}'
+
+
+async def crawl(base_url: str, **kwargs: object) -> list[tuple[str, int]]:
+    async with create_crawler_http_client() as client:
+        crawler = HttpCrawler(client, f'{base_url}/docs', **kwargs)  # type: ignore[arg-type]
+        return [(page.url.removeprefix(base_url), page.depth) async for page in crawler.iter_pages()]
+
+
+def test_extract_links() -> None:
+    html = '<base href="/docs/"><a href="a#x">A</a><a href="a">A</a><a href="mailto:x@y.z">M</a><a>no href</a>'
+    assert extract_links(html, 'https://example.com/blog/') == ['https://example.com/docs/a']
+    assert extract_links('<a href=" ../b ">', 'https://example.com/docs/a/') == ['https://example.com/docs/b']
+
+
+async def test_http_crawler_depth(base_url: str) -> None:
+    assert await crawl(base_url, max_depth=0) == [('/docs', 0)]
+    assert await crawl(base_url, max_depth=1) == [('/docs', 0), ('/docs/a', 1), ('/docs/b', 1)]
+    assert await crawl(base_url, max_depth=3) == [
+        ('/docs', 0),
+        ('/docs/a', 1),
+        ('/docs/b', 1),
+        ('/docs/a/deep', 2),
+        ('/docs/b/deep', 2),
+        ('/docs/a/deeper', 3),
+    ]
+    # out of scope, external and duplicate links are never requested, one request per crawl with the depth above 0
+    assert '/blog' not in SiteHandler.requested
+    assert SiteHandler.requested.count('/docs/a') == 2
+
+
+async def test_http_crawler_max_pages(base_url: str) -> None:
+    assert await crawl(base_url, max_depth=5, max_pages=2) == [('/docs', 0), ('/docs/a', 1)]
+    assert len(SiteHandler.requested) == 2
+
+
+async def test_http_crawler_start_urls(base_url: str) -> None:
+    start_urls = [f'{base_url}/docs/b', f'{base_url}/docs/a/deep', f'{base_url}/blog']
+    assert await crawl(base_url, max_depth=5, start_urls=start_urls) == [('/docs/b', 0), ('/docs/a/deep', 0)]
+
+
+async def test_http_crawler_host_concurrency(base_url: str) -> None:
+    assert len(await crawl(base_url, max_depth=3, host_concurrency=1)) == 6
+    assert SiteHandler.max_active == 1
+
+
+async def test_http_crawler_deadline(base_url: str) -> None:
+    assert await crawl(base_url, max_depth=3, deadline=time.monotonic()) == []
+    assert SiteHandler.requested == []
+
+
+async def test_http_crawler_connection_error() -> None:
+    async with httpx.AsyncClient() as client:
+        crawler = HttpCrawler(client, 'http://127.0.0.1:1/docs')
+        assert [page async for page in crawler.iter_pages()] == []
+    assert crawler.failed_count == 1
+
+
+async def test_run_actor_locally_builtin_crawler(
+    base_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    actor_input = {
+        'startUrl': f'{base_url}/docs',
+        'crawlerType': 'builtin:http',
+        'maxCrawlDepth': 2,
+        'htmlParserExecutor': 'thread',
+    }
+    client = LocalApifyClient(LocalRunClient([], {}))
+    await run_actor_locally(actor_input, client)
+    assert client.actor_client.run_inputs == []
+
+    output = (tmp_path / 'key_value_stores' / 'default' / 'llms.txt').read_text()
+    assert output.startswith('# 127.0.0.1\n\n> About Docs\n')
+    assert f'- [Page A]({base_url}/docs/a): About Page A' in output
+    assert f'- [Deep B]({base_url}/docs/b/deep): About Deep B' in output
+    assert 'Deeper A' not in output
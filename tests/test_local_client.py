@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from tests.fixtures import run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+ITEMS = [
+    {'url': 'https://example.com/docs', 'htmlUrl': 'https://api.apify.com/v2/records/docs', 'metadata': {}},
+    {'url': 'https://example.com/docs/a', 'htmlUrl': 'https://api.apify.com/v2/records/a', 'metadata': {}},
+    {'url': 'https://example.com/docs/b', 'htmlUrl': 'https://api.apify.com/v2/records/b', 'metadata': {}},
+]
+RECORDS = {
+    'docs': '<meta name="description" content="Docs description"><h1>Docs</h1>',
+    'a': '<h1>Page A</h1><meta name="description" content="About A">',
+    'b': '<h1>Page B</h1>',
+}
+EXPECTED_OUTPUT = """# example.com
+
+> Docs description
+
+## Docs
+
+- [Page A](https://example.com/docs/a): About A
+- [Page B](https://example.com/docs/b)
+
+"""
+
+
+async def test_local_run_client_reveals_items_gradually() -> None:
+    run = LocalRunClient(ITEMS, RECORDS, duration_secs=0.2)
+    assert (await run.get() or {})['status'] == 'RUNNING'
+    assert [item async for item in run.dataset().iterate_items()] == []
+
+    assert (await run.wait_for_finish(wait_secs=1) or {})['status'] == 'SUCCEEDED'
+    assert [item async for item in run.dataset().iterate_items(offset=1)] == ITEMS[1:]
+    assert run.api_calls == 2
+
+
+async def test_local_run_client_queued_and_aborting() -> None:
+    run = LocalRunClient(ITEMS * 10, RECORDS, duration_secs=0.2, queued_secs=0.1, aborting_secs=0.1)
+    assert (await run.get() or {})['status'] == 'READY'
+
+    assert (await run.wait_for_finish(wait_secs=0.15) or {})['status'] == 'RUNNING'  # type: ignore[arg-type]
+    assert (await run.abort(gracefully=True))['status'] == 'ABORTING'
+    pushed_at_abort = run.visible_items_count()
+    assert (await run.wait_for_finish() or {})['status'] == 'ABORTED'
+    # the items of the pages in progress are pushed while aborting
+    assert pushed_at_abort < run.visible_items_count() == len(run.items) < len(ITEMS) * 10
+
+
+async def test_run_actor_locally(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    client = LocalApifyClient(LocalRunClient(ITEMS, RECORDS))
+
+    await run_actor_locally({'startUrl': 'https://example.com/docs', 'htmlParserExecutor': 'inline'}, client)
+
+    store_dir = tmp_path / 'key_value_stores' / 'default'
+    assert (store_dir / 'llms.txt').read_text() == EXPECTED_OUTPUT
+    metrics = json.loads((store_dir / 'METRICS.json').read_text())
+    assert set(metrics['stageSecs']) == {'crawler', 'processing', 'clean', 'render'}
+    assert metrics['counters']['datasetItems'] == len(ITEMS)
+    assert metrics['histograms']['kvFetchMs']['count'] == len(ITEMS)
+    assert client.actor_client.run_inputs[0]['startUrls'] == [{'url': 'https://example.com/docs', 'method': 'GET'}]
+
+
+async def test_run_actor_locally_metadata_only(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    items = [
+        {'url': 'https://example.com/docs', 'metadata': {'title': 'Docs', 'description': 'Docs description'}},
+        {'url': 'https://example.com/docs/a', 'metadata': {'title': 'Page A', 'description': 'About A'}},
+        {'url': 'https://example.com/docs/b', 'metadata': {'title': 'Page B'}},
+    ]
+    client = LocalApifyClient(LocalRunClient(items, {}))
+
+    await run_actor_locally({'startUrl': 'https://example.com/docs', 'extractionPolicy': 'metadata-only'}, client)
+
+    assert (tmp_path / 'key_value_stores' / 'default' / 'llms.txt').read_text() == EXPECTED_OUTPUT
+    assert client.actor_client.run_inputs[0]['saveHtmlAsFile'] is False
+    assert client.run_client.key_value_store().requests_count == 0
+
+
+async def test_run_actor_locally_waits_for_queued_run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MIN_SECS', 0.01)
+    # the run waits for the memory longer than the first status poll
+    client = LocalApifyClient(LocalRunClient(ITEMS, RECORDS, queued_secs=0.2))
+
+    await run_actor_locally({'startUrl': 'https://example.com/docs', 'htmlParserExecutor': 'inline'}, client)
+
+    assert (tmp_path / 'key_value_stores' / 'default' / 'llms.txt').read_text() == EXPECTED_OUTPUT
+
+
+async def test_run_actor_locally_batch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MIN_SECS', 0.01)
+    urls = ['https://example.com/docs', 'https://example.org/docs', 'https://example.net/docs']
+    runs = [
+        LocalRunClient(
+            [{**item, 'url': str(item['url']).replace('example.com', url.split('/')[2])} for item in ITEMS],
+            RECORDS,
+            duration_secs=0.2,
+            run_id=f'run-{i}',
+            start_url=url,
+        )
+        for i, url in enumerate(urls)
+    ]
+    # the last site fails, the other ones are still saved
+    runs[2].items = []
+    client = LocalApifyClient(*runs)
+
+    await run_actor_locally(
+        {
+            'startUrls': [{'url': url} for url in urls],
+            'crawlerMemoryBudgetMbytes': 4096,
+            'htmlParserExecutor': 'inline',
+        },
+        client,
+    )
+
+    store_dir = tmp_path / 'key_value_stores' / 'default'
+    assert (store_dir / 'llms-example.com-docs.txt').read_text() == EXPECTED_OUTPUT
+    assert (store_dir / 'llms-example.org-docs.txt').read_text() == EXPECTED_OUTPUT.replace(
+        'example.com', 'example.org'
+    )
+    assert (store_dir / 'METRICS-example.org-docs.json').exists()
+    assert not (store_dir / 'llms-example.net-docs.txt').exists()
+    dataset_items = [json.loads(path.read_text()) for path in (tmp_path / 'datasets' / 'default').glob('0*.json')]
+    assert sorted(item['url'] for item in dataset_items if 'error' in item) == ['https://example.net/docs']
+    # two crawlers fit into the memory budget
+    assert client.actor_client.max_running == 2
+    assert len(client.actor_client.started_runs) == 3
+
+
+async def test_run_actor_locally_batch_releases_crawler_slot(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MIN_SECS', 0.01)
+    urls = ['https://example.com/docs', 'https://example.org/docs']
+    # the crawlers are fast, the processing of their results is slow
+    runs = [
+        LocalRunClient(ITEMS, RECORDS, duration_secs=0.05, latency_secs=0.3, run_id=f'run-{i}', start_url=url)
+        for i, url in enumerate(urls)
+    ]
+    client = LocalApifyClient(*runs)
+
+    await run_actor_locally(
+        {
+            'startUrls': [{'url': url} for url in urls],
+            'crawlerMemoryBudgetMbytes': 2048,
+            'htmlParserExecutor': 'inline',
+        },
+        client,
+    )
+
+    assert client.actor_client.max_running == 1
+    # the second crawler starts once the first one finishes, before its results are processed
+    assert runs[1].started_at - runs[0].started_at < 0.3
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from benchmarks.local_client import LocalRunClient
+from src import main
+from src.main import wait_for_crawler_run
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+STATUS_MESSAGES = ['Crawled 0 pages', 'Crawled 10 pages', 'Crawled 20 pages', 'Finished']
+
+
+@pytest.fixture
+def short_waits(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, 'CRAWLER_WAIT_MIN_SECS', 0.01)
+    monkeypatch.setattr(main, 'CRAWLER_WAIT_MAX_SECS', 0.08)
+
+
+@pytest.fixture
+def set_status_message() -> Iterator[AsyncMock]:
+    with patch.object(main.Actor, 'set_status_message', AsyncMock()) as mock:
+        yield mock
+
+
+@pytest.mark.usefixtures('short_waits')
+async def test_wait_for_crawler_run_propagates_status(set_status_message: AsyncMock) -> None:
+    run_client = LocalRunClient([], {}, duration_secs=0.4, status_messages=STATUS_MESSAGES)
+
+    run = await wait_for_crawler_run(run_client)  # type: ignore[arg-type]
+
+    assert run['status'] == 'SUCCEEDED'
+    propagated = [call.args[0] for call in set_status_message.call_args_list]
+    assert propagated == STATUS_MESSAGES[: len(propagated)]
+    assert len(propagated) >= len(STATUS_MESSAGES) - 1
+    # polling every CRAWLER_WAIT_MIN_SECS would take 40 calls
+    assert run_client.api_calls < 20
+
+
+@pytest.mark.usefixtures('short_waits', 'set_status_message')
+async def test_wait_for_crawler_run_backs_off() -> None:
+    run_client = LocalRunClient([], {}, duration_secs=0.5, status_messages=['Crawling'])
+    on_poll = AsyncMock(return_value=0)
+
+    await wait_for_crawler_run(run_client, on_poll)  # type: ignore[arg-type]
+
+    # waits of 0.01, 0.02, 0.04 and then 0.08 seconds until the run finishes
+    assert run_client.api_calls <= 10
+    assert on_poll.await_count == run_client.api_calls - 1
+
+
+@pytest.mark.usefixtures('short_waits', 'set_status_message')
+async def test_wait_for_crawler_run_waits_for_terminal_status() -> None:
+    run_client = LocalRunClient([], {}, duration_secs=1, queued_secs=0.1, aborting_secs=0.1)
+    statuses: list[str] = []
+
+    async def on_poll() -> bool:
+        statuses.append(run_client.get_status())
+        if statuses[-1] == 'RUNNING':
+            await run_client.abort(gracefully=True)
+        return False
+
+    run = await wait_for_crawler_run(run_client, on_poll)  # type: ignore[arg-type]
+
+    assert run['status'] == 'ABORTED'
+    # neither the queued nor the aborting run is considered finished
+    assert statuses[0] == 'READY'
+    assert statuses[-1] == 'ABORTING'
+
+
+@pytest.mark.usefixtures('short_waits', 'set_status_message')
+async def test_wait_for_crawler_run_api_calls_limit() -> None:
+    run_client = LocalRunClient([], {}, duration_secs=0.3)
+
+    run = await wait_for_crawler_run(run_client, max_api_calls=3)  # type: ignore[arg-type]
+
+    assert run['status'] == 'SUCCEEDED'
+    assert run_client.api_calls == 3
+
+
+async def test_wait_for_crawler_run_invalid_api_calls_limit() -> None:
+    with pytest.raises(ValueError, match='at least 1'):
+        await wait_for_crawler_run(LocalRunClient([], {}), max_api_calls=0)  # type: ignore[arg-type]
+
+
+def test_get_site_key_suffixes() -> None:
+    urls = ['https://example.com/docs/', 'https://example.com/docs', 'https://example.com/a b?q=1']
+    assert main.get_site_key_suffixes(urls) == ['-example.com-docs', '-example.com-docs-2', '-example.com-a-b']
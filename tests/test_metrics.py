@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+
+from src.metrics import RunMetrics
+
+
+def test_run_metrics() -> None:
+    metrics = RunMetrics()
+    with metrics.stage('processing'):
+        for _ in range(3):
+            with metrics.timer('parseMs'):
+                pass
+    with metrics.stage('processing'):
+        metrics.increment('htmlBytes', 100)
+    metrics.increment('htmlBytes', 20)
+
+    result = metrics.to_dict()
+    assert list(result['stageSecs']) == ['processing']
+    assert result['counters'] == {'htmlBytes': 120}
+    assert result['histograms']['parseMs']['count'] == 3
+    assert result['histograms']['parseMs']['buckets']['le_1ms'] == 3
+    assert sum(result['histograms']['parseMs']['buckets'].values()) == 3
+    # the record is saved as JSON
+    assert json.loads(json.dumps(result)) == result
+    assert 'htmlBytes 120' in metrics.summary()
+
+
+def test_run_metrics_empty() -> None:
+    metrics = RunMetrics()
+    assert metrics.to_dict() == {'stageSecs': {}, 'counters': {}, 'histograms': {}}
+    assert metrics.summary() == ''
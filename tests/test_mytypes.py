@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import tracemalloc
+from typing import TYPE_CHECKING
+
+from src.helpers import clean_llms_data
+from src.mytypes import LinkRecord, SectionRecord, split_url_origin
+from src.renderer import render_llms_txt
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from src.mytypes import LLMSData
+
+LINKS_COUNT = 100_000
+LINKS_PER_SECTION = 100
+
+
+def test_split_url_origin() -> None:
+    assert split_url_origin('https://example.com/dir/page?q=1') == ('https://example.com', '/dir/page?q=1')
+    assert split_url_origin('https://example.com') == ('https://example.com', '')
+    assert split_url_origin('example.com/page') == ('example.com', '/page')
+
+
+def test_link_record_item_access() -> None:
+    link = LinkRecord('https://example.com/page', 'Page', None)
+
+    assert link['url'] == 'https://example.com/page'
+    assert link['title'] == 'Page'
+    assert link.get('description') is None
+    assert link.get('origin', 'missing') == 'missing'
+    assert link.to_dict() == {'url': 'https://example.com/page', 'title': 'Page', 'description': None}
+
+
+def test_records_render_and_clean_like_dicts() -> None:
+    links = [('https://example.com/guides/a', 'A', 'First'), ('https://example.com/api/b', 'B', None)]
+    data_dicts: LLMSData = {
+        'title': 'example.com',
+        'description': None,
+        'details': None,
+        'sections': {
+            '/guides': {'title': 'Guides', 'links': [{'url': u, 'title': t, 'description': d} for u, t, d in links]},
+            '/api': {'title': 'API', 'links': [{'url': links[1][0], 'title': 'B', 'description': None}]},
+        },
+    }
+    data_records: LLMSData = {
+        'title': 'example.com',
+        'description': None,
+        'details': None,
+        'sections': {
+            '/guides': SectionRecord('Guides', [LinkRecord(*link) for link in links]),
+            '/api': SectionRecord('API', [LinkRecord(*links[1])]),
+        },
+    }
+
+    clean_llms_data(data_dicts)
+    clean_llms_data(data_records)
+
+    assert render_llms_txt(data_records) == render_llms_txt(data_dicts)
+
+
+def build_dict_sections() -> dict:
+    sections: dict = {}
+    for i in range(LINKS_COUNT):
+        section_dir = f'/docs/section-{i // LINKS_PER_SECTION}'
+        if section_dir not in sections:
+            sections[section_dir] = {'title': section_dir, 'links': []}
+        url = f'https://docs.example.com{section_dir}/page-{i}'
+        sections[section_dir]['links'].append({'url': url, 'title': f'Page {i}', 'description': None})
+    return sections
+
+
+def build_record_sections() -> dict:
+    sections: dict = {}
+    for i in range(LINKS_COUNT):
+        section_dir = f'/docs/section-{i // LINKS_PER_SECTION}'
+        if section_dir not in sections:
+            sections[section_dir] = SectionRecord(section_dir)
+        url = f'https://docs.example.com{section_dir}/page-{i}'
+        sections[section_dir].links.append(LinkRecord(url, f'Page {i}', None))
+    return sections
+
+
+def measure_peak_memory(build: Callable[[], dict]) -> int:
+    tracemalloc.start()
+    try:
+        sections = build()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(sections) == LINKS_COUNT // LINKS_PER_SECTION
+    return peak
+
+
+def test_records_peak_memory_per_100k_links() -> None:
+    dict_peak = measure_peak_memory(build_dict_sections)
+    record_peak = measure_peak_memory(build_record_sections)
+    print(
+        f'peak memory per {LINKS_COUNT} links: dicts {dict_peak / 2**20:.1f} MiB, records {record_peak / 2**20:.1f} MiB'
+    )
+
+    assert record_peak < dict_peak * 0.7
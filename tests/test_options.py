@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pytest
+
+from src.options import GeneratorOptions, get_start_urls
+
+
+def test_get_start_urls() -> None:
+    actor_input = {
+        'startUrl': 'https://example.com/docs',
+        'startUrls': [{'url': 'https://example.org'}, 'https://example.com/docs', {'requestsFromUrl': 'x'}],
+    }
+    assert get_start_urls(actor_input) == ['https://example.com/docs', 'https://example.org']
+    assert get_start_urls({}) == []
+
+
+def test_generator_options_from_input() -> None:
+    assert GeneratorOptions.from_input({}) == GeneratorOptions()
+
+    options = GeneratorOptions.from_input(
+        {'crawlerMemoryBudgetMbytes': 7000, 'htmlParserWorkers': 0, 'extractionPolicy': 'metadata-only'}
+    )
+    assert options.max_concurrent_crawlers == 3
+    assert options.parser_workers is None
+    assert options.save_html is False
+
+
+def test_generator_options_llms_full_max_file_size() -> None:
+    # the file is always split, so that its whole content is never held in memory
+    assert GeneratorOptions.from_input({'llmsFullMaxFileMbytes': 0}).llms_full_max_file_bytes == 8 * 1024 * 1024
+    assert GeneratorOptions.from_input({'llmsFullMaxFileMbytes': 2}).llms_full_max_file_bytes == 2 * 1024 * 1024
+    with pytest.raises(ValueError, match='llmsFullMaxFileMbytes'):
+        GeneratorOptions.from_input({'llmsFullMaxFileMbytes': -1})
+
+
+def test_generator_options_invalid_policy() -> None:
+    with pytest.raises(ValueError, match='extractionPolicy'):
+        GeneratorOptions.from_input({'extractionPolicy': 'html-only'})
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import pytest
+
+from src import parsers
+from src.extractor import HtmlMetadata, extract_html_metadata
+from src.parsers import (
+    PARSER_CONFORMANCE_CORPUS,
+    WELL_FORMED_CORPUS,
+    check_parser_backend,
+    get_available_parser_backends,
+    get_parser_backend,
+    make_benchmark_pages,
+    resolve_parser_backend,
+    select_parser_backend,
+)
+from src.pipeline import ItemProcessor
+
+BACKENDS = ['stdlib', 'bs4', 'bs4-lxml', 'lexbor']
+
+
+def require_backend(backend: str) -> None:
+    if backend not in get_available_parser_backends():
+        pytest.skip(f'the package of the "{backend}" backend is not installed')
+
+
+@pytest.mark.parametrize('html', WELL_FORMED_CORPUS)
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_parser_backend_conformance(backend: str, html: str) -> None:
+    require_backend(backend)
+    assert get_parser_backend(backend)(html) == extract_html_metadata(html)
+
+
+@pytest.mark.parametrize('html', PARSER_CONFORMANCE_CORPUS)
+def test_bs4_backend_broken_markup(html: str) -> None:
+    # both parse with the html.parser tokenizer, so they agree even on the broken markup
+    assert get_parser_backend('bs4')(html) == extract_html_metadata(html)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_parser_backend_benchmark_pages(backend: str) -> None:
+    require_backend(backend)
+    with_description, without_description = make_benchmark_pages(10)
+    extract = get_parser_backend(backend)
+    assert extract(with_description) == HtmlMetadata(title='Page title', description='Page description')
+    assert extract(without_description) == HtmlMetadata(title='Page title', description=None)
+
+
+def test_auto_parser_backend_conforms_on_broken_markup() -> None:
+    select_parser_backend.cache_clear()
+    try:
+        backend = resolve_parser_backend('auto')
+    finally:
+        select_parser_backend.cache_clear()
+    # the same site gets the same titles whatever backends are installed
+    assert not check_parser_backend(backend)
+
+
+def test_resolve_parser_backend_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    with pytest.raises(ValueError, match='Invalid HTML parser backend'):
+        resolve_parser_backend('html5lib')
+    monkeypatch.setitem(parsers.PARSER_BACKEND_PACKAGES, 'lexbor', 'not-installed-package')
+    assert 'lexbor' not in get_available_parser_backends()
+    with pytest.raises(ValueError, match='needs the "not-installed-package" package'):
+        resolve_parser_backend('lexbor')
+
+
+def test_select_parser_backend_skips_nonconforming(monkeypatch: pytest.MonkeyPatch) -> None:
+    def extract_nothing(_html: str) -> HtmlMetadata:
+        return HtmlMetadata(title=None, description=None)
+
+    monkeypatch.setitem(parsers._BACKEND_FUNCTIONS, 'bs4', extract_nothing)
+    select_parser_backend.cache_clear()
+    try:
+        assert check_parser_backend('bs4')
+        backend = resolve_parser_backend('auto')
+    finally:
+        select_parser_backend.cache_clear()
+    assert backend in get_available_parser_backends()
+    assert backend != 'bs4'
+    assert not check_parser_backend(backend)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+async def test_item_processor_parser_backend(backend: str) -> None:
+    require_backend(backend)
+    processor = ItemProcessor(parser_backend=backend)
+    html = '<meta name="description" content="About"><h1>Title</h1>'
+    assert await processor.parse(html) == HtmlMetadata(title='Title', description='About')
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import re
+from contextlib import suppress
+from typing import TYPE_CHECKING, ClassVar
+
+import httpx
+import pytest
+
+from src.extractor import HtmlMetadata, extract_html_metadata
+from src.parsers import PARSER_CONFORMANCE_CORPUS
+from src.partial_fetch import PartialHtmlFetcher
+from src.pipeline import ItemProcessor
+from tests.fixtures import QuietRequestHandler
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from http.server import ThreadingHTTPServer
+
+FILLER = '<p>' + 'x' * 1000 + '</p>'
+PAGES = {
+    'top': '<html><head><meta name="description" content="Top"></head><body><h1>Top</h1>' + FILLER * 1000,
+    'deep': '<html><body>'
+    + FILLER * 100
+    + '<h1>Deep</h1><meta name="description" content="Deep page">'
+    + FILLER * 1000,
+    # the multi-byte characters are split between the windows
+    'unicode': '<h1>' + 'ř' * 5000 + '</h1><meta name="description" content="Čeština">' + FILLER * 10,
+    # the uppercase name is not a description, the parser is never complete
+    'uppercase': '<h1>Upper</h1><meta name="DESCRIPTION" content="Upper page">' + FILLER * 1000,
+    'capitalized': '<h1>Capitalized</h1><meta name="Description" content="Capitalized page">' + FILLER * 1000,
+    'empty': '',
+}
+
+
+class RecordsHandler(QuietRequestHandler):
+    pages: ClassVar[dict[str, str]] = {}
+    # range requests are ignored and the whole record is sent
+    ignore_range = False
+    ranges: ClassVar[list[str | None]] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        key = self.path.rsplit('/', 1)[-1]
+        if key not in self.pages:
+            self.send_error(404)
+            return
+        body = self.pages[key].encode()
+        range_header = self.headers.get('Range')
+        self.ranges.append(range_header)
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', range_header or '')
+        if self.ignore_range or match is None:
+            self.send_response(200)
+        else:
+            start, end = int(match[1]), min(int(match[2] or len(body) - 1), len(body) - 1)
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(body)}')
+            body = body[start : end + 1]
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        # the client stops reading once it has the metadata
+        with suppress(BrokenPipeError, ConnectionResetError):
+            self.wfile.write(body)
+
+
+@pytest.fixture(scope='module')
+def http_handler() -> type[RecordsHandler]:
+    RecordsHandler.pages = {**PAGES, **{f'corpus-{i}': html for i, html in enumerate(PARSER_CONFORMANCE_CORPUS)}}
+    return RecordsHandler
+
+
+@pytest.fixture
+def server_url(http_server: ThreadingHTTPServer) -> Iterator[str]:
+    RecordsHandler.ranges = []
+    yield f'http://127.0.0.1:{http_server.server_port}/records/'
+    RecordsHandler.ignore_range = False
+
+
+async def test_partial_fetch_reads_only_leading_window(server_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        fetcher = PartialHtmlFetcher(client, initial_window=4096)
+        assert await fetcher.fetch_metadata(f'{server_url}top') == HtmlMetadata(title='Top', description='Top')
+
+    assert RecordsHandler.ranges == ['bytes=0-4095']
+    assert fetcher.bytes_downloaded == 4096
+
+
+async def test_partial_fetch_widens_window(server_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        fetcher = PartialHtmlFetcher(client, initial_window=4096)
+        assert await fetcher.fetch_metadata(f'{server_url}deep') == HtmlMetadata(title='Deep', description='Deep page')
+
+    assert RecordsHandler.ranges[:3] == ['bytes=0-4095', 'bytes=4096-12287', 'bytes=12288-28671']
+    assert fetcher.bytes_downloaded < len(PAGES['deep']) // 5
+
+
+async def test_partial_fetch_reads_rest_after_max_windows(server_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        fetcher = PartialHtmlFetcher(client, initial_window=4096, max_windows=3)
+        metadata = await fetcher.fetch_metadata(f'{server_url}uppercase')
+
+    assert metadata == HtmlMetadata(title='Upper', description=None)
+    assert RecordsHandler.ranges == ['bytes=0-4095', 'bytes=4096-12287', 'bytes=12288-28671', 'bytes=28672-']
+    assert fetcher.requests_count == 4
+    assert fetcher.range_ignored_count == 0
+    assert fetcher.bytes_downloaded == len(PAGES['uppercase'])
+
+
+async def test_partial_fetch_stops_at_capitalized_description(server_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        fetcher = PartialHtmlFetcher(client, initial_window=4096)
+        metadata = await fetcher.fetch_metadata(f'{server_url}capitalized')
+
+    assert metadata == HtmlMetadata(title='Capitalized', description='Capitalized page')
+    assert fetcher.requests_count == 1
+
+
+@pytest.mark.parametrize('ignore_range', [False, True])
+@pytest.mark.parametrize('key', ['top', 'deep', 'unicode', 'uppercase', 'capitalized', 'empty'])
+async def test_partial_fetch_matches_full_parse(server_url: str, key: str, *, ignore_range: bool) -> None:
+    RecordsHandler.ignore_range = ignore_range
+    async with httpx.AsyncClient() as client:
+        fetcher = PartialHtmlFetcher(client, initial_window=1000)
+        assert await fetcher.fetch_metadata(f'{server_url}{key}') == extract_html_metadata(PAGES[key])
+
+    assert fetcher.range_ignored_count == int(ignore_range)
+
+
+async def test_partial_fetch_corpus(server_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        # tiny window splits the tags and the attributes between the requests
+        fetcher = PartialHtmlFetcher(client, initial_window=7, max_window=7, max_windows=1000)
+        for i, html in enumerate(PARSER_CONFORMANCE_CORPUS):
+            assert await fetcher.fetch_metadata(f'{server_url}corpus-{i}') == extract_html_metadata(html), html
+
+
+async def test_partial_fetch_range_ignored_stops_reading(server_url: str) -> None:
+    RecordsHandler.ignore_range = True
+    async with httpx.AsyncClient() as client:
+        fetcher = PartialHtmlFetcher(client)
+        assert await fetcher.fetch_metadata(f'{server_url}top') == HtmlMetadata(title='Top', description='Top')
+
+    assert fetcher.bytes_downloaded < len(PAGES['top']) // 10
+
+
+async def test_partial_fetch_missing_record(server_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        assert await PartialHtmlFetcher(client).fetch_metadata(f'{server_url}missing') is None
+
+
+async def test_item_processor_partial_fetch(server_url: str) -> None:
+    item = {'url': 'https://example.com/top', 'htmlUrl': f'{server_url}top'}
+    async with httpx.AsyncClient() as client:
+        processor = ItemProcessor(None, partial_fetcher=PartialHtmlFetcher(client, initial_window=4096))
+        assert await processor(item) == HtmlMetadata(title='Top', description='Top')
+        assert await processor({'url': 'https://example.com/no-html'}) is None
+
+    assert processor.metrics.histograms['kvFetchMs'].count == 1
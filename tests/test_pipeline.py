@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from functools import partial
+from typing import TYPE_CHECKING
+
+import pytest
+
+from src.builder import LLMSDataBuilder
+from src.extractor import HtmlMetadata
+from src.pipeline import (
+    DEFAULT_PARSER_WORKERS,
+    EXTRACTION_POLICIES,
+    PARSER_EXECUTOR_MODES,
+    ItemProcessor,
+    create_parser_executor,
+    fetch_item_html,
+    get_default_parser_workers,
+    iter_ordered,
+    process_dataset_items,
+)
+from tests.fixtures import BASE, FakeKeyValueStore, make_dataset
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from src.mytypes import LinkDict, LinkRecord
+
+
+async def iterate(items: list[dict]) -> AsyncIterator[dict]:
+    for item in items:
+        yield item
+
+
+@pytest.mark.parametrize('concurrency', [1, 4, 100])
+async def test_iter_ordered_fetch_html_keeps_order(concurrency: int) -> None:
+    items, records = make_dataset(50)
+    kvstore = FakeKeyValueStore(records)
+
+    fetch = partial(fetch_item_html, kvstore)  # type: ignore[arg-type]
+    result = [x async for x in iter_ordered(iterate(items), fetch, concurrency)]
+
+    assert result == [(item, f'<h1>Page {i}</h1>') for i, item in enumerate(items)]
+    assert kvstore.max_in_flight <= concurrency
+
+
+async def test_iter_ordered_fetch_html_invalid_items() -> None:
+    items, records = make_dataset(2)
+    del records['page-1']
+    items.append({'url': 'https://example.com/no-html'})
+    items.append({'htmlUrl': 'https://api.apify.com/v2/records/page-0'})
+
+    fetch = partial(fetch_item_html, FakeKeyValueStore(records))  # type: ignore[arg-type]
+    result = [html async for _, html in iter_ordered(iterate(items), fetch, 2)]
+
+    assert result == ['<h1>Page 0</h1>', None, None, None]
+
+
+async def test_iter_ordered_invalid_concurrency() -> None:
+    fetch = partial(fetch_item_html, FakeKeyValueStore({}))  # type: ignore[arg-type]
+    with pytest.raises(ValueError, match='at least 1'):
+        await iter_ordered(iterate([]), fetch, 0).__anext__()
+
+
+@pytest.mark.parametrize('mode', PARSER_EXECUTOR_MODES)
+async def test_item_processor_executor_modes(mode: str) -> None:
+    items, records = make_dataset(20)
+    executor = create_parser_executor(mode, workers=2)
+    processor = ItemProcessor(FakeKeyValueStore(records), executor)  # type: ignore[arg-type]
+    try:
+        result = [metadata async for _, metadata in iter_ordered(iterate(items), processor, 4)]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    assert result == [HtmlMetadata(title=f'Page {i}', description=None) for i in range(20)]
+
+
+@pytest.mark.parametrize(
+    ('memory_mbytes', 'expected'), [(None, DEFAULT_PARSER_WORKERS), (1024, 1), (4096, 1), (8192, 2), (10**6, 4)]
+)
+def test_get_default_parser_workers(monkeypatch: pytest.MonkeyPatch, memory_mbytes: int | None, expected: int) -> None:
+    # the CPU count of the host does not raise the CPU share of the actor
+    monkeypatch.setattr('os.cpu_count', lambda: 4)
+    assert get_default_parser_workers(memory_mbytes) == expected
+
+
+def test_create_parser_executor_invalid_mode() -> None:
+    with pytest.raises(ValueError, match='Invalid HTML parser executor mode'):
+        create_parser_executor('gpu')
+
+
+class FakeDataset:
+    def __init__(self, items: list[dict]) -> None:
+        self.items = items
+
+    async def iterate_items(self, offset: int = 0, limit: int | None = None) -> AsyncIterator[dict]:
+        end = len(self.items) if limit is None else offset + limit
+        for item in self.items[offset:end]:
+            yield item
+
+
+def get_links(builder: LLMSDataBuilder, items: list[dict]) -> list[LinkDict | LinkRecord]:
+    links = {link['url']: link for section in builder.build()['sections'].values() for link in section['links']}
+    return [links[item['url']] for item in items]
+
+
+async def test_process_dataset_items_incrementally() -> None:
+    items, records = make_dataset(10)
+    dataset = FakeDataset(items[:3])
+    processor = ItemProcessor(FakeKeyValueStore(records))  # type: ignore[arg-type]
+    builder = LLMSDataBuilder(f'{BASE}/')
+
+    # crawler is still running, the dataset grows between the calls
+    assert await process_dataset_items(builder, dataset, processor, limit=2) == 2  # type: ignore[arg-type]
+    assert await process_dataset_items(builder, dataset, processor, limit=2) == 1  # type: ignore[arg-type]
+    dataset.items = items
+    assert await process_dataset_items(builder, dataset, processor) == 7  # type: ignore[arg-type]
+    assert await process_dataset_items(builder, dataset, processor) == 0  # type: ignore[arg-type]
+
+    assert [link['title'] for link in get_links(builder, items)] == [f'Page {i}' for i in range(10)]
+
+
+@pytest.mark.parametrize(
+    ('policy', 'expected_downloads'),
+    [('html-first', 3), ('metadata-first', 2), ('metadata-only', 0)],
+)
+async def test_item_processor_extraction_policy(policy: str, expected_downloads: int) -> None:
+    items, records = make_dataset(3)
+    items[0]['metadata'] = {'title': 'Page 0 | Docs', 'description': 'About page 0'}
+    # multiline description is not suitable
+    items[1]['metadata'] = {'title': 'Page 1 | Docs', 'description': 'About\npage 1'}
+    kvstore = FakeKeyValueStore(records)
+    processor = ItemProcessor(kvstore, policy=policy)  # type: ignore[arg-type]
+    builder = LLMSDataBuilder(f'{BASE}/', require_html=policy != 'metadata-only')
+
+    assert await process_dataset_items(builder, FakeDataset(items), processor) == 3  # type: ignore[arg-type]
+
+    assert processor.metrics.counters['htmlSkipped'] == 3 - expected_downloads
+    links = get_links(builder, items)
+    assert [link['title'] for link in links] == [
+        'Page 0' if policy == 'html-first' else 'Page 0 | Docs',
+        'Page 1 | Docs' if policy == 'metadata-only' else 'Page 1',
+        None if policy == 'metadata-only' else 'Page 2',
+    ]
+    assert links[0]['description'] == 'About page 0'
+
+
+def test_item_processor_invalid_policy() -> None:
+    with pytest.raises(ValueError, match='Invalid extraction policy'):
+        ItemProcessor(FakeKeyValueStore({}), policy='fastest')  # type: ignore[arg-type]
+    assert 'html-first' in EXTRACTION_POLICIES
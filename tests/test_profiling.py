@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import pstats
+import sys
+import tracemalloc
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.profiling import (
+    CPU_PROFILE_RECORD_KEY,
+    MEMORY_PROFILE_RECORD_KEY,
+    MEMORY_PROFILE_TOP_LINES,
+    MEMORY_SNAPSHOT_RECORD_KEY,
+    create_run_profiler,
+)
+from tests.fixtures import BASE, FakeKeyValueStore, make_dataset, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def allocate_and_sum(count: int) -> int:
+    return sum(len(str(i)) for i in range(count))
+
+
+async def test_run_profiler_off() -> None:
+    store = FakeKeyValueStore()
+    profiler = create_run_profiler(store)  # type: ignore[arg-type]
+    assert isinstance(profiler, nullcontext)
+    async with profiler:
+        assert sys.getprofile() is None
+        assert not tracemalloc.is_tracing()
+    assert store.values == {}
+
+
+async def test_run_profiler_cpu(tmp_path: Path) -> None:
+    store = FakeKeyValueStore()
+    async with create_run_profiler(store, cpu=True):  # type: ignore[arg-type]
+        allocate_and_sum(10_000)
+    assert set(store.values) == {CPU_PROFILE_RECORD_KEY}
+    assert not tracemalloc.is_tracing()
+
+    # the dump is in the standard pstats format
+    path = tmp_path / 'profile'
+    path.write_bytes(store.values[CPU_PROFILE_RECORD_KEY])
+    stats = pstats.Stats(str(path))
+    assert any(function == 'allocate_and_sum' for _, _, function in stats.stats)  # type: ignore[attr-defined]
+
+
+async def test_run_profiler_memory(tmp_path: Path) -> None:
+    store = FakeKeyValueStore()
+    async with create_run_profiler(store, memory=True, memory_interval_secs=0.01):  # type: ignore[arg-type]
+        kept = [str(i) * 10 for i in range(10_000)]
+        await asyncio.sleep(0.05)
+    assert kept
+    assert set(store.values) == {MEMORY_PROFILE_RECORD_KEY, MEMORY_SNAPSHOT_RECORD_KEY}
+    assert not tracemalloc.is_tracing()
+
+    snapshots = store.values[MEMORY_PROFILE_RECORD_KEY]['snapshots']
+    assert len(snapshots) >= 2
+    assert all(0 < len(snapshot['top']) <= MEMORY_PROFILE_TOP_LINES for snapshot in snapshots)
+    assert snapshots[-1]['peakBytes'] >= snapshots[-1]['tracedBytes'] > 0
+    assert __file__ in snapshots[-1]['top'][0]['line']
+
+    path = tmp_path / 'snapshot'
+    path.write_bytes(store.values[MEMORY_SNAPSHOT_RECORD_KEY])
+    assert tracemalloc.Snapshot.load(str(path)).traces
+
+
+async def test_run_profiler_saves_on_error() -> None:
+    store = FakeKeyValueStore()
+    with pytest.raises(RuntimeError, match='failed'):
+        async with create_run_profiler(store, cpu=True, memory=True):  # type: ignore[arg-type]
+            raise RuntimeError('failed')
+    assert set(store.values) == {CPU_PROFILE_RECORD_KEY, MEMORY_PROFILE_RECORD_KEY, MEMORY_SNAPSHOT_RECORD_KEY}
+    assert sys.getprofile() is None
+    assert not tracemalloc.is_tracing()
+
+
+async def test_run_actor_locally_profiled(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    items, records = make_dataset(10)
+    client = LocalApifyClient(LocalRunClient(items, records))
+
+    await run_actor_locally(
+        {'startUrl': f'{BASE}/', 'htmlParserExecutor': 'inline', 'profileCpu': True, 'profileMemory': True}, client
+    )
+
+    store_path = tmp_path / 'key_value_stores' / 'default'
+    assert (store_path / 'llms.txt').exists()
+    profile_paths = [path for path in store_path.glob(f'{CPU_PROFILE_RECORD_KEY}*') if 'metadata' not in path.name]
+    assert len(profile_paths) == 1
+    stats = pstats.Stats(str(profile_paths[0]))
+    assert any(function == 'generate_llms_txt' for _, _, function in stats.stats)  # type: ignore[attr-defined]
+    memory_profile = json.loads((store_path / f'{MEMORY_PROFILE_RECORD_KEY}.json').read_text())
+    assert memory_profile['snapshots']
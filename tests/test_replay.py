@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import zipfile
+from typing import TYPE_CHECKING
+
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from benchmarks.replay import (
+    ARCHIVE_ITEMS_MEMBER,
+    ARCHIVE_RUN_MEMBER,
+    CRAWLER_INPUT_KEY,
+    ArchiveRecords,
+    check_replay_input,
+    load_recorded_run,
+    record_crawler_run,
+    replay_crawler_run,
+)
+from tests.fixtures import BASE, fresh_actor_storage, make_dataset, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class CrawlerRecords(dict):
+    """HTML records of the crawler run with its INPUT record, which is JSON unlike the HTML records."""
+
+    def get(self, key: str, default: object = None) -> object:
+        if key == CRAWLER_INPUT_KEY:
+            return {'startUrls': [{'url': f'{BASE}/'}]}
+        return super().get(key, default)
+
+
+async def record_run(path: Path, items: list[dict], records: dict[str, str]) -> dict:
+    client = LocalApifyClient(LocalRunClient(items, CrawlerRecords(records), run_id='run-1'))
+    return await record_crawler_run(client, 'run-1', str(path), concurrency=4)  # type: ignore[arg-type]
+
+
+async def test_record_crawler_run(tmp_path: Path) -> None:
+    path = tmp_path / 'run.zip'
+    items, records = make_dataset(10)
+    # an item without the HTML record is recorded as well
+    items.append({'url': f'{BASE}/missing', 'htmlUrl': 'https://api.apify.com/v2/records/missing'})
+    summary = await record_run(path, items, records)
+    assert summary['startUrl'] == f'{BASE}/'
+    assert summary['itemsCount'] == 11
+    assert summary['recordsCount'] == 10
+
+    with zipfile.ZipFile(path) as archive:
+        assert json.loads(archive.read(ARCHIVE_RUN_MEMBER)) == summary
+        # the items keep the order of the dataset
+        assert [json.loads(line) for line in archive.read(ARCHIVE_ITEMS_MEMBER).splitlines()] == items
+        run, loaded_summary = load_recorded_run(archive)
+        assert loaded_summary == summary
+        assert run.items == items
+        archive_records = ArchiveRecords(archive)
+        assert len(archive_records) == 10
+        assert archive_records['page-3'] == records['page-3']
+        assert 'missing' not in archive_records
+        record = await run.key_value_store().get_record('page-3')
+        assert record is not None
+        assert record['value'] == records['page-3']
+
+
+async def test_load_recorded_run_unsupported_version(tmp_path: Path) -> None:
+    path = tmp_path / 'run.zip'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr(ARCHIVE_RUN_MEMBER, json.dumps({'version': 99}))
+    with zipfile.ZipFile(path) as archive, pytest.raises(ValueError, match='Unsupported version 99'):
+        load_recorded_run(archive)
+
+
+@pytest.mark.parametrize(
+    'actor_input',
+    [
+        {'startUrls': [{'url': f'{BASE}/'}]},
+        {'startUrl': f'{BASE}/', 'discoveryMode': 'sitemap'},
+        {'startUrl': f'{BASE}/', 'partialHtmlFetch': True},
+    ],
+)
+def test_check_replay_input_needs_network(actor_input: dict) -> None:
+    with pytest.raises(ValueError, match='replay|network'):
+        check_replay_input(actor_input)
+
+
+async def test_replay_equals_direct_run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / 'run.zip'
+    items, records = make_dataset(30)
+    await record_run(path, items, records)
+    actor_input = {'htmlParserExecutor': 'inline'}
+
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path / 'direct'))
+    await run_actor_locally({'startUrl': f'{BASE}/', **actor_input}, LocalApifyClient(LocalRunClient(items, records)))
+
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path / 'replay'))
+    with fresh_actor_storage():
+        summary = await replay_crawler_run(str(path), actor_input)
+    assert summary['runId'] == 'run-1'
+
+    output_path = 'key_value_stores/default/llms.txt'
+    expected_output = (tmp_path / 'direct' / output_path).read_bytes()
+    assert b'Page 29' in expected_output
+    assert (tmp_path / 'replay' / output_path).read_bytes() == expected_output
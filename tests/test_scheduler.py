@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock
+
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.builder import LLMSDataBuilder
+from src.pipeline import ItemProcessor, process_dataset_items
+from src.scheduler import (
+    DEFAULT_ITEM_PROCESSING_SECS,
+    MIN_MEASURED_ITEMS,
+    OUTPUT_RESERVE_SECS,
+    PROCESSING_SAFETY_FACTOR,
+    RunScheduler,
+    get_run_deadline_from_details,
+)
+from tests.fixtures import BASE, make_dataset, run_actor_locally
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_scheduler_without_deadline() -> None:
+    scheduler = RunScheduler(None)
+    assert scheduler.processing_deadline is None
+    assert scheduler.get_crawler_deadline(1_000_000) is None
+    assert not scheduler.is_crawler_overdue(1_000_000)
+
+
+def test_scheduler_crawler_deadline() -> None:
+    run_deadline = time.monotonic() + 3600
+    scheduler = RunScheduler(run_deadline)
+    processing_deadline = run_deadline - OUTPUT_RESERVE_SECS
+    assert scheduler.processing_deadline == processing_deadline
+
+    estimate = 1000 * DEFAULT_ITEM_PROCESSING_SECS * PROCESSING_SAFETY_FACTOR
+    assert scheduler.get_crawler_deadline(1000) == pytest.approx(processing_deadline - estimate)
+    # the crawler always gets at least half of the time, even if the processing does not fit
+    assert scheduler.get_crawler_deadline(10**9) == pytest.approx((scheduler.started_at + processing_deadline) / 2)
+    assert not scheduler.is_crawler_overdue(1000)
+
+
+def test_scheduler_measured_throughput() -> None:
+    scheduler = RunScheduler(time.monotonic() + 3600)
+    scheduler.record_processing(MIN_MEASURED_ITEMS - 1, 100.0)
+    assert scheduler.item_processing_secs == DEFAULT_ITEM_PROCESSING_SECS
+
+    scheduler.record_processing(1, 0.0)
+    assert scheduler.item_processing_secs == pytest.approx(100.0 / MIN_MEASURED_ITEMS)
+    processing_deadline = scheduler.processing_deadline
+    assert processing_deadline is not None
+    assert scheduler.get_crawler_deadline(100) == pytest.approx(
+        processing_deadline - 100 * 2 * PROCESSING_SAFETY_FACTOR
+    )
+    # two seconds per item do not leave enough time for 10 000 items, the crawler gets its minimum time
+    assert scheduler.get_crawler_deadline(10_000) == pytest.approx((scheduler.started_at + processing_deadline) / 2)
+
+
+def test_scheduler_splits_crawler_time_between_sites() -> None:
+    scheduler = RunScheduler(time.monotonic() + 3600, sites=['a', 'b', 'c', 'd'], max_concurrent_crawlers=2)
+    crawler_deadline = scheduler.get_crawler_deadline(100)
+    assert crawler_deadline is not None
+
+    # four sites crawled two at a time, the first two crawlers get half of the time
+    for site in ('a', 'b'):
+        started_at = time.monotonic()
+        assert scheduler.start_crawler(site, 100) == pytest.approx(started_at + (crawler_deadline - started_at) / 2)
+    # the last wave gets the rest of the time
+    assert scheduler.start_crawler('c', 100) == pytest.approx(crawler_deadline)
+    scheduler.finish_site('d')
+    assert scheduler.pending_sites == set()
+    assert RunScheduler(None, sites=['a']).start_crawler('a', 100) is None
+
+
+async def test_process_dataset_items_deadline() -> None:
+    items, records = make_dataset(20)
+    run = LocalRunClient(items, records, latency_secs=0.05)
+    builder = LLMSDataBuilder(f'{BASE}/')
+    processor = ItemProcessor(run.key_value_store(), deadline=time.monotonic() + 0.12)  # type: ignore[arg-type]
+
+    processed = await process_dataset_items(builder, run.dataset(), processor, concurrency=1)  # type: ignore[arg-type]
+    assert 0 < processed < len(items)
+    assert processor.deadline_reached
+    # no more items are processed once the deadline has passed
+    assert await process_dataset_items(builder, run.dataset(), processor) == 0  # type: ignore[arg-type]
+
+
+async def test_run_actor_locally_aborts_overdue_crawler(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MIN_SECS', 0.01)
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MAX_SECS', 0.05)
+    # the crawler gets at least half of the time before the processing deadline, i.e. one second
+    monkeypatch.setattr('src.main.get_run_deadline', AsyncMock(return_value=time.monotonic() + OUTPUT_RESERVE_SECS + 2))
+    items, records = make_dataset(50)
+    # the aborted crawler keeps pushing the items of the pages in progress for a while
+    run = LocalRunClient(items, records, duration_secs=4, aborting_secs=0.3)
+    client = LocalApifyClient(run)
+
+    started_at = time.monotonic()
+    await run_actor_locally({'startUrl': f'{BASE}/', 'maxCrawlPages': 50, 'htmlParserExecutor': 'inline'}, client)
+
+    assert run.is_aborted
+    assert time.monotonic() - started_at < 3
+    output = (tmp_path / 'key_value_stores' / 'default' / 'llms.txt').read_text()
+    assert 0 < output.count('- [Page') == len(run.items) < len(items)
+    dataset_items = [json.loads(path.read_text()) for path in (tmp_path / 'datasets' / 'default').glob('0*.json')]
+    assert dataset_items[0]['partial'] is False
+
+
+async def test_run_actor_locally_partial_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr(
+        'src.main.get_run_deadline', AsyncMock(return_value=time.monotonic() + OUTPUT_RESERVE_SECS + 0.5)
+    )
+    items, records = make_dataset(50)
+    client = LocalApifyClient(LocalRunClient(items, records, latency_secs=0.1))
+
+    await run_actor_locally(
+        {'startUrl': f'{BASE}/', 'htmlFetchConcurrency': 1, 'htmlParserExecutor': 'inline'},
+        client,
+    )
+
+    store_path = tmp_path / 'key_value_stores' / 'default'
+    assert 0 < (store_path / 'llms.txt').read_text().count('- [Page') < len(items)
+    dataset_items = [json.loads(path.read_text()) for path in (tmp_path / 'datasets' / 'default').glob('0*.json')]
+    assert dataset_items[0]['partial'] is True
+    metrics = json.loads((store_path / 'METRICS.json').read_text())
+    assert metrics['counters']['partialOutput'] == 1
+
+
+@pytest.mark.parametrize('as_string', [False, True])
+def test_run_deadline_from_details(*, as_string: bool) -> None:
+    started_at = datetime.now(timezone.utc) - timedelta(seconds=100)
+    run = {
+        'startedAt': started_at.isoformat().replace('+00:00', 'Z') if as_string else started_at,
+        'options': {'timeoutSecs': 300},
+    }
+    # the time elapsed before the deadline was computed, e.g. by the run before a migration, is not available again
+    assert get_run_deadline_from_details(run) - time.monotonic() == pytest.approx(200, abs=1)
+
+
+def test_run_deadline_from_details_missing() -> None:
+    with pytest.raises(ValueError, match='timeoutSecs'):
+        get_run_deadline_from_details({'startedAt': datetime.now(timezone.utc), 'options': {}})
+    with pytest.raises(ValueError, match='startedAt'):
+        get_run_deadline_from_details({'options': {'timeoutSecs': 300}})
+
+
+async def test_run_actor_locally_batch_leaves_time_for_pending_sites(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MIN_SECS', 0.01)
+    monkeypatch.setattr('src.main.CRAWLER_WAIT_MAX_SECS', 0.05)
+    monkeypatch.setattr('src.main.get_run_deadline', AsyncMock(return_value=time.monotonic() + OUTPUT_RESERVE_SECS + 3))
+    urls = ['https://example.com/docs', 'https://example.org/docs', 'https://example.net/docs']
+    items, records = make_dataset(50)
+    # each crawler would take the whole run, they run one after another
+    runs = [
+        LocalRunClient(
+            [{**item, 'url': item['url'].replace('example.com', url.split('/')[2])} for item in items],
+            records,
+            duration_secs=10,
+            run_id=f'run-{i}',
+            start_url=url,
+        )
+        for i, url in enumerate(urls)
+    ]
+
+    await run_actor_locally(
+        {'startUrls': [{'url': url} for url in urls], 'maxCrawlPages': 50, 'htmlParserExecutor': 'inline'},
+        LocalApifyClient(*runs),
+    )
+
+    assert all(run.is_aborted for run in runs)
+    store_dir = tmp_path / 'key_value_stores' / 'default'
+    assert all((store_dir / f'llms-{url.split("/")[2]}-docs.txt').exists() for url in urls)
+    dataset_items = [json.loads(path.read_text()) for path in (tmp_path / 'datasets' / 'default').glob('0*.json')]
+    assert not [item for item in dataset_items if 'error' in item]
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import gzip
+from typing import TYPE_CHECKING, ClassVar
+
+import httpx
+import pytest
+
+from benchmarks.local_client import LocalApifyClient, LocalRunClient
+from src.builder import LLMSDataBuilder
+from src.sitemap import (
+    SitemapState,
+    SitemapUrl,
+    _SitemapParser,
+    add_unchanged_sitemap_pages,
+    discover_sitemap_pages,
+    get_sitemap_state,
+    is_url_in_scope,
+    iter_sitemap_urls,
+)
+from tests.fixtures import QuietRequestHandler, run_actor_locally
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+    from pathlib import Path
+
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>{base}/sitemap-docs.xml</loc></sitemap>
+  <sitemap><loc>{base}/sitemap-blog.xml.gz</loc><lastmod>2024-01-01</lastmod></sitemap>
+  <sitemap><loc>{base}/sitemap-index.xml</loc></sitemap>
+  <sitemap><loc>{base}/missing.xml</loc></sitemap>
+</sitemapindex>
+"""
+SITEMAP_DOCS = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>{base}/docs</loc><lastmod>2024-01-01</lastmod></url>
+  <url><loc>{base}/docs/a</loc><lastmod>2024-01-02</lastmod><priority>0.5</priority></url>
+  <url><loc> {base}/docs/b/ </loc><lastmod>{lastmod_b}</lastmod></url>
+  <url><loc>{base}/docs/c</loc></url>
+  <url><loc>{base}/docsearch</loc><lastmod>2024-01-01</lastmod></url>
+</urlset>
+"""
+SITEMAP_BLOG = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>{base}/blog/post</loc><lastmod>2024-01-01</lastmod></url>
+</urlset>
+"""
+
+
+class SiteHandler(QuietRequestHandler):
+    files: ClassVar[dict[str, bytes]] = {}
+    requested: ClassVar[list[str]] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.requested.append(self.path)
+        if (body := self.files.get(self.path)) is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope='module')
+def http_handler() -> type[SiteHandler]:
+    return SiteHandler
+
+
+def serve_site(base: str, lastmod_b: str = '2024-01-03', *, robots: bool = True) -> None:
+    SiteHandler.requested = []
+    SiteHandler.files = {
+        '/sitemap-main.xml': SITEMAP_INDEX.format(base=base).encode(),
+        '/sitemap-index.xml': SITEMAP_INDEX.format(base=base).encode(),
+        '/sitemap-docs.xml': SITEMAP_DOCS.format(base=base, lastmod_b=lastmod_b).encode(),
+        '/sitemap-blog.xml.gz': gzip.compress(SITEMAP_BLOG.format(base=base).encode()),
+    }
+    if robots:
+        SiteHandler.files['/robots.txt'] = (
+            f'User-agent: *\nDisallow: /private\nSitemap: {base}/sitemap-main.xml\n'.encode()
+        )
+
+
+@pytest.fixture
+def base_url(http_server: ThreadingHTTPServer) -> str:
+    base = f'http://127.0.0.1:{http_server.server_port}'
+    serve_site(base)
+    return base
+
+
+def test_sitemap_parser_chunks() -> None:
+    document = SITEMAP_DOCS.format(base='https://example.com', lastmod_b='2024-01-03').encode()
+    parser = _SitemapParser()
+    entries = []
+    for i in range(0, len(document), 7):
+        entries.extend(parser.feed(document[i : i + 7]))
+
+    assert entries[:3] == [
+        ('url', 'https://example.com/docs', '2024-01-01'),
+        ('url', 'https://example.com/docs/a', '2024-01-02'),
+        ('url', 'https://example.com/docs/b/', '2024-01-03'),
+    ]
+    assert entries[3] == ('url', 'https://example.com/docs/c', None)
+    assert len(entries) == 5
+
+
+async def test_iter_sitemap_urls(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        urls = [url async for url in iter_sitemap_urls(client, [f'{base_url}/sitemap-main.xml'])]
+
+    assert SitemapUrl(f'{base_url}/blog/post', '2024-01-01') in urls
+    # the index listing itself is read only once
+    assert len(urls) == 6
+    assert SiteHandler.requested.count('/sitemap-index.xml') == 1
+    assert '/missing.xml' in SiteHandler.requested
+
+
+async def test_iter_sitemap_urls_max_sitemaps(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        urls = [url async for url in iter_sitemap_urls(client, [f'{base_url}/sitemap-main.xml'], max_sitemaps=2)]
+
+    assert len(urls) == 5
+
+
+async def test_discover_sitemap_pages(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        pages = await discover_sitemap_pages(client, f'{base_url}/docs/')
+
+    assert pages == {
+        f'{base_url}/docs': '2024-01-01',
+        f'{base_url}/docs/a': '2024-01-02',
+        f'{base_url}/docs/b': '2024-01-03',
+        f'{base_url}/docs/c': None,
+    }
+
+
+async def test_discover_sitemap_pages_default_location(http_server: ThreadingHTTPServer) -> None:
+    base = f'http://127.0.0.1:{http_server.server_port}'
+    serve_site(base, robots=False)
+    SiteHandler.files['/sitemap.xml'] = SiteHandler.files['/sitemap-docs.xml']
+
+    async with httpx.AsyncClient() as client:
+        assert len(await discover_sitemap_pages(client, f'{base}/docs')) == 4
+
+
+def test_is_url_in_scope() -> None:
+    assert is_url_in_scope('https://example.com/docs', 'https://example.com/docs/')
+    assert is_url_in_scope('https://example.com/docs/a/b', 'https://example.com/docs')
+    assert is_url_in_scope('https://example.com/anything', 'https://example.com')
+    assert not is_url_in_scope('https://example.com/docsearch', 'https://example.com/docs')
+    assert not is_url_in_scope('https://other.com/docs', 'https://example.com/docs')
+
+
+def test_sitemap_state_roundtrip() -> None:
+    pages = {
+        'https://example.com/docs': '1',
+        'https://example.com/docs/a': '1',
+        'https://example.com/docs/b': None,
+    }
+    builder = LLMSDataBuilder('https://example.com/docs')
+    assert add_unchanged_sitemap_pages(builder, pages, SitemapState()) == list(pages)
+    builder.add_page('https://example.com/docs', 'Docs', 'Docs description')
+    builder.add_page('https://example.com/docs/a/', 'Page A', 'About A')
+    builder.add_page('https://example.com/docs/b', 'Page B', None)
+
+    state = get_sitemap_state(builder, pages)
+    assert state.entries == {
+        'https://example.com/docs': ['1', 'Docs', 'Docs description'],
+        'https://example.com/docs/a': ['1', 'Page A', 'About A'],
+    }
+
+    # the page A has changed since, the page B has no lastmod
+    pages['https://example.com/docs/a'] = '2'
+    builder = LLMSDataBuilder('https://example.com/docs')
+    changed = add_unchanged_sitemap_pages(builder, pages, state)
+    assert changed == ['https://example.com/docs/a', 'https://example.com/docs/b']
+    assert builder.data['description'] == 'Docs description'
+
+
+async def test_run_actor_locally_sitemap(base_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('CRAWLEE_STORAGE_DIR', str(tmp_path))
+    start_url = f'{base_url}/docs'
+    items = [
+        {'url': f'{base_url}/docs/a', 'metadata': {'title': 'Page A', 'description': 'About A'}},
+        {'url': f'{base_url}/docs/b/', 'metadata': {'title': 'Page B'}},
+        {'url': f'{base_url}/docs', 'metadata': {'title': 'Docs', 'description': 'Docs description'}},
+        {'url': f'{base_url}/docs/c', 'metadata': {'title': 'Page C'}},
+    ]
+    actor_input = {
+        'startUrl': start_url,
+        'discoveryMode': 'sitemap',
+        'extractionPolicy': 'metadata-only',
+        'cacheStoreName': 'llms-cache',
+    }
+    output_path = tmp_path / 'key_value_stores' / 'default' / 'llms.txt'
+
+    client = LocalApifyClient(LocalRunClient(items, {}))
+    await run_actor_locally(actor_input, client)
+    first_output = output_path.read_text()
+    run_input = client.actor_client.run_inputs[0]
+    assert [start_url['url'] for start_url in run_input['startUrls']] == [
+        f'{base_url}/docs',
+        f'{base_url}/docs/a',
+        f'{base_url}/docs/b',
+        f'{base_url}/docs/c',
+    ]
+    assert run_input['maxCrawlDepth'] == 0
+
+    # only the page B has changed and the page C has no lastmod, the rest is taken from the sitemap state
+    serve_site(base_url, lastmod_b='2024-02-01')
+    client = LocalApifyClient(LocalRunClient([items[1], items[3]], {}))
+    await run_actor_locally(actor_input, client)
+    assert [start_url['url'] for start_url in client.actor_client.run_inputs[0]['startUrls']] == [
+        f'{base_url}/docs/b',
+        f'{base_url}/docs/c',
+    ]
+    assert sorted(output_path.read_text().splitlines()) == sorted(first_output.splitlines())
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import random
+from typing import TYPE_CHECKING
+
+import pytest
+
+from src.builder import LLMSDataBuilder
+from src.helpers import clean_llms_data, collapse_sparse_sections
+from src.main import render_site
+from src.metrics import RunMetrics
+from src.options import GeneratorOptions
+from src.renderer import render_llms_txt
+from src.sitemap import get_sitemap_state
+from tests.fixtures import BASE
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+def iter_pages(count: int, seed: int) -> Iterator[tuple[str, str, str | None]]:
+    """Yields pages of sections of various sizes in a random order, children often come before their parents."""
+    rng = random.Random(seed)
+    paths = ['', '/', '/guide', '/api', '/api/v1', '/api/v1/old', '/blog/2024/01', '/misc', '/a b/ř']
+    for i in range(count):
+        section = rng.choice(paths)
+        path = f'{section}/page-{i}' if rng.random() < 0.9 else section
+        description = rng.choice([f'About page {i}', None, 'Multi\nline'])
+        yield f'{BASE}{path}', f'Page {i}', description
+
+
+def build(count: int, seed: int, spill_threshold: int | None) -> LLMSDataBuilder:
+    builder = LLMSDataBuilder(BASE, spill_threshold=spill_threshold)
+    for url, title, description in iter_pages(count, seed):
+        builder.add_page(url, title, description)
+    return builder
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('spill_threshold', [0, 7, 150])
+@pytest.mark.parametrize('nested_sections', [False, True])
+def test_spilled_output_equals_memory(seed: int, spill_threshold: int, *, nested_sections: bool) -> None:
+    options = GeneratorOptions(nested_sections=nested_sections)
+    expected = render_site(build(200, seed, None), options, RunMetrics())
+    builder = build(200, seed, spill_threshold)
+    assert builder.spilled is not None
+    path = builder.spilled.path
+
+    assert render_site(builder, options, RunMetrics()) == expected
+    assert not os.path.exists(path)
+
+
+def test_spill_threshold_not_reached() -> None:
+    builder = build(20, 0, 100)
+    assert builder.spilled is None
+    assert builder.links_count == sum(len(section['links']) for section in builder.data['sections'].values())
+
+
+def test_spilled_sitemap_state() -> None:
+    pages: dict[str, str | None] = {url.rstrip('/'): '1' for url, _, _ in iter_pages(50, 1)}
+    expected = get_sitemap_state(build(50, 1, None), pages).entries
+    assert len(expected) > 10
+    builder = build(50, 1, 10)
+
+    assert get_sitemap_state(builder, pages).entries == expected
+    builder.close()
+
+
+def test_clean_llms_data_keeps_section_order() -> None:
+    data = LLMSDataBuilder(BASE).data
+    # section names with different hashes, the index links must follow the order of the sections
+    for i in range(20):
+        data['sections'][f'/section-{i}'] = {
+            'title': f'S{i}',
+            'links': [{'url': f'u{i}', 'title': 't', 'description': None}],
+        }
+    clean_llms_data(data)
+    assert [link['url'] for link in data['sections']['/']['links']] == [f'u{i}' for i in range(20)]
+
+
+def test_spilled_render_without_clean() -> None:
+    memory_builder = build(100, 2, None)
+    spilled_builder = build(100, 2, 0)
+    assert spilled_builder.spilled is not None
+
+    assert spilled_builder.spilled.render(spilled_builder.build()) == render_llms_txt(memory_builder.build())
+    data = memory_builder.build()
+    collapse_sparse_sections(data)
+    spilled_builder.spilled.collapse_sparse_sections()
+    assert spilled_builder.spilled.render(spilled_builder.build()) == render_llms_txt(data)
+    spilled_builder.close()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from src.helpers import clean_llms_data, collapse_sparse_sections, get_section_dir_title
+from src.trie import PathTrie, get_section_dir_title_from_trie, split_path
+
+if TYPE_CHECKING:
+    from src.mytypes import LLMSData
+
+
+def test_split_path() -> None:
+    assert split_path('/') == []
+    assert split_path('') == []
+    assert split_path('/dir/page') == ['dir', 'page']
+
+
+def test_path_trie() -> None:
+    trie: PathTrie[str] = PathTrie()
+    trie['/'] = 'Root'
+    trie['/dir'] = 'Directory'
+    trie['/dir/subdir/page'] = 'Page'
+
+    assert len(trie) == 3
+    assert trie.get('/dir') == 'Directory'
+    assert trie.get('/dir/subdir') is None
+    assert trie.get('/unknown/path') is None
+    assert trie.get_nearest('/dir/subdir') == 'Directory'
+    assert trie.get_nearest('/other') is None
+    assert trie.get_nearest('/other', include_root=True) == 'Root'
+    assert list(trie.items()) == [('/', 'Root'), ('/dir', 'Directory'), ('/dir/subdir/page', 'Page')]
+
+    trie['/dir'] = None
+    assert len(trie) == 2
+    assert trie.get_nearest('/dir/subdir') is None
+
+
+@pytest.mark.parametrize(
+    'section_dir', ['/dir/subdir', '/dir/subdir/page/subpage', '/unknown/path', '/dir', '', '/', '/dir/empty']
+)
+def test_get_section_dir_title_from_trie_parity(section_dir: str) -> None:
+    path_titles = {
+        '/': 'Root',
+        '/dir': 'Directory',
+        '/dir/subdir': 'Subdirectory',
+        '/dir/subdir/page': 'Page',
+        '/dir/empty': '',
+    }
+    trie: PathTrie[str] = PathTrie()
+    for path, title in path_titles.items():
+        trie[path] = title
+
+    assert get_section_dir_title_from_trie(section_dir, trie) == get_section_dir_title(section_dir, path_titles)
+
+
+def make_data(sections: dict[str, int]) -> LLMSData:
+    return {
+        'title': 'example.com',
+        'description': None,
+        'details': None,
+        'sections': {
+            section_dir: {
+                'title': section_dir,
+                'links': [
+                    {'url': f'https://example.com{section_dir}/{i}', 'title': str(i), 'description': None}
+                    for i in range(count)
+                ],
+            }
+            for section_dir, count in sections.items()
+        },
+    }
+
+
+def test_collapse_sparse_sections() -> None:
+    data = make_data(
+        {'/docs': 1, '/docs/api': 1, '/docs/api/v1': 1, '/docs/misc/old': 1, '/docs/guides': 3, '/blog': 1}
+    )
+
+    collapse_sparse_sections(data, section_min_links=2)
+
+    # /docs/api/v1 is collapsed into /docs/api, /docs/misc/old into /docs, both then have enough links
+    sections = data['sections']
+    assert sorted(sections) == ['/', '/docs', '/docs/api', '/docs/guides']
+    assert [link['url'] for link in sections['/docs/api']['links']] == [
+        'https://example.com/docs/api/0',
+        'https://example.com/docs/api/v1/0',
+    ]
+    assert [link['url'] for link in sections['/docs']['links']] == [
+        'https://example.com/docs/0',
+        'https://example.com/docs/misc/old/0',
+    ]
+    assert [link['url'] for link in sections['/']['links']] == ['https://example.com/blog/0']
+
+
+def test_collapse_sparse_sections_flat_equals_clean() -> None:
+    sections = {'/': 1, '/a': 1, '/b': 2, '/c/d': 1}
+    data = make_data(sections)
+    data_clean = make_data(sections)
+
+    collapse_sparse_sections(data, section_min_links=2)
+    clean_llms_data(data_clean, section_min_links=2)
+
+    assert sorted(data['sections']) == sorted(data_clean['sections'])
+    assert len(data['sections']['/']['links']) == len(data_clean['sections']['/']['links']) == 3